@@ -0,0 +1,6 @@
+"""
+Benchmarks del organizador de archivos
+Ejecutar desde la carpeta downloads-mcp, por ejemplo:
+    python -m benchmarks.bench_scanner --files 100000
+    python -m benchmarks.bench_tools --files 1000,10000,100000
+"""
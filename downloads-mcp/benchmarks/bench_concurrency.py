@@ -0,0 +1,87 @@
+"""
+Prueba de concurrencia del servidor: latencia de get_file_info mientras
+organize_files mueve un lote grande de archivos
+
+Termina con código 1 si el p95 supera el presupuesto (--budget-ms)
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def sample_latency(server, stop: asyncio.Event, samples: list, interval: float):
+    """Llama a get_file_info en bucle hasta que se activa `stop`"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await server.get_file_info("sonda.xyz")
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def run(files: int, budget_ms: float) -> bool:
+    import file_organizer_server as server
+    from benchmarks.bench_scanner import create_flat_folder
+
+    downloads = Path(os.environ["FILE_ORGANIZER_DOWNLOADS"])
+    print(f"[BENCH] Creando {files} archivos en {downloads}...")
+    create_flat_folder(downloads, files)
+    (downloads / "sonda.xyz").write_text("sonda")
+
+    idle = []
+    idle_stop = asyncio.Event()
+    idle_task = asyncio.create_task(sample_latency(server, idle_stop, idle, 0.005))
+    await asyncio.sleep(1)
+    idle_stop.set()
+    await idle_task
+
+    busy = []
+    busy_stop = asyncio.Event()
+    busy_task = asyncio.create_task(sample_latency(server, busy_stop, busy, 0.005))
+    start = time.perf_counter()
+    await server.organize_files(dry_run=False)
+    organize_seconds = time.perf_counter() - start
+    busy_stop.set()
+    await busy_task
+
+    print(f"organize_files: {files} archivos en {organize_seconds:.2f} s")
+    for label, samples in (("reposo", idle), ("durante organize", busy)):
+        print(
+            f"get_file_info ({label:<16}) n={len(samples):>5}  "
+            f"p50={statistics.median(samples):6.2f} ms  "
+            f"p95={percentile(samples, 0.95):6.2f} ms  max={max(samples):7.2f} ms"
+        )
+    p95 = percentile(busy, 0.95)
+    if p95 > budget_ms:
+        print(f"[ERROR] p95 durante organize_files ({p95:.2f} ms) supera {budget_ms} ms")
+        return False
+    print(f"[OK] p95 durante organize_files por debajo de {budget_ms} ms")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # La configuración se lee al importar: el entorno se prepara antes
+        os.environ["FILE_ORGANIZER_DOWNLOADS"] = str(Path(tmp) / "Downloads")
+        os.environ["HOME"] = tmp
+        ok = asyncio.run(run(args.files, args.budget_ms))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Prueba de carga del servidor en modo HTTP (--transport http)
+Arranca un servidor local sobre una carpeta sintética (o usa uno ya en marcha
+con --url) y, para cada número de clientes simultáneos, mide:
+
+- el tiempo de conexión (abrir la sesión e inicializarla) y las conexiones fallidas
+- las peticiones por segundo y la latencia p50/p95/p99 de una mezcla de
+  herramientas de solo lectura, durante --duration segundos
+
+Todos los clientes comparten el mismo proceso, así que desde la segunda
+petición las herramientas se sirven con el índice y las cachés ya calientes
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.bench_tools import RESULTS_FOLDER, git_commit
+
+# Mezcla de llamadas que hace cada cliente, en bucle
+CALLS = [
+    ("analyze_downloads", {}),
+    ("analyze_downloads", {"recursive": True, "format": "json", "page_size": 50}),
+    ("get_file_info", {"patterns": ["*.pdf"]}),
+    ("server_stats", {"format": "json"}),
+]
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    """Espera a que el servidor acepte conexiones"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run_client(url: str, stop_at: float, offset: int, stats: dict):
+    """Un cliente: abre su sesión y hace llamadas hasta `stop_at`"""
+    from mcp import ClientSession
+    try:
+        from mcp.client.streamable_http import streamable_http_client
+    except ImportError:
+        # mcp < 1.24 solo tiene el nombre antiguo
+        from mcp.client.streamable_http import streamablehttp_client as streamable_http_client
+
+    start = time.perf_counter()
+    try:
+        async with streamable_http_client(url) as (read_stream, write_stream, _):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                stats["connect"].append(time.perf_counter() - start)
+                i = offset
+                while time.monotonic() < stop_at:
+                    tool, arguments = CALLS[i % len(CALLS)]
+                    i += 1
+                    call_start = time.perf_counter()
+                    try:
+                        result = await session.call_tool(tool, arguments)
+                    except Exception:
+                        stats["errors"] += 1
+                        continue
+                    stats["latency"].append(time.perf_counter() - call_start)
+                    if result.isError or result.content[0].text.startswith("[ERROR]"):
+                        stats["errors"] += 1
+    except Exception as e:
+        stats["failed_connections"] += 1
+        print(f"[ERROR] Cliente {offset}: {e}", file=sys.stderr)
+
+
+async def run_level(url: str, clients: int, duration: float) -> dict:
+    """Lanza `clients` clientes a la vez durante `duration` segundos"""
+    stats = {"connect": [], "latency": [], "errors": 0, "failed_connections": 0}
+    start = time.perf_counter()
+    stop_at = time.monotonic() + duration
+    await asyncio.gather(*(run_client(url, stop_at, i, stats) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    requests = len(stats["latency"])
+    result = {
+        "clients": clients,
+        "requests": requests,
+        "requests_per_second": round(requests / elapsed, 1),
+        "errors": stats["errors"],
+        "failed_connections": stats["failed_connections"],
+        "connect_p50_ms": round(percentile(stats["connect"], 0.50) * 1000, 2),
+        "connect_p95_ms": round(percentile(stats["connect"], 0.95) * 1000, 2),
+        "latency_p50_ms": round(percentile(stats["latency"], 0.50) * 1000, 2),
+        "latency_p95_ms": round(percentile(stats["latency"], 0.95) * 1000, 2),
+        "latency_p99_ms": round(percentile(stats["latency"], 0.99) * 1000, 2),
+    }
+    print(
+        f"[BENCH] {clients:>4} clientes  {result['requests_per_second']:8.1f} pet/s  "
+        f"p50 {result['latency_p50_ms']:8.2f} ms  p95 {result['latency_p95_ms']:8.2f} ms  "
+        f"conexión p50 {result['connect_p50_ms']:7.2f} ms  "
+        f"errores {result['errors']}  conexiones fallidas {result['failed_connections']}",
+        file=sys.stderr,
+    )
+    return result
+
+
+async def run_levels(url: str, levels, duration: float) -> list:
+    return [await run_level(url, clients, duration) for clients in levels]
+
+
+def start_server(tmp: Path, files: int, seed: int, port: int) -> subprocess.Popen:
+    """Genera la carpeta sintética y arranca el servidor HTTP sobre ella"""
+    from benchmarks.synthetic import generate_tree
+
+    downloads = tmp / "Downloads"
+    generate_tree(downloads, files, seed=seed)
+    environment = dict(os.environ, HOME=str(tmp), FILE_ORGANIZER_DOWNLOADS=str(downloads))
+    return subprocess.Popen(
+        [sys.executable, "file_organizer_server.py", "--transport", "http", "--port", str(port)],
+        cwd=Path(__file__).parent.parent, env=environment,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Servidor ya en marcha (por ejemplo, http://127.0.0.1:8765/mcp)")
+    parser.add_argument("--clients", default="1,8,32", help="Clientes simultáneos de cada ronda, separados por comas")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de cada ronda")
+    parser.add_argument("--files", type=int, default=10000, help="Archivos de la carpeta sintética")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Fichero JSON de resultados (por defecto en ~/.file_organizer/benchmarks)")
+    args = parser.parse_args()
+    levels = [int(clients) for clients in args.clients.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        url = args.url
+        if url is None:
+            port = free_port()
+            process = start_server(Path(tmp), args.files, args.seed, port)
+            url = f"http://127.0.0.1:{port}/mcp"
+            asyncio.run(wait_for_port("127.0.0.1", port))
+        try:
+            levels_results = asyncio.run(run_levels(url, levels, args.duration))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "url": args.url or "local",
+        "files": None if args.url else args.files,
+        "duration": args.duration,
+        "levels": levels_results,
+    }
+    output = args.output or RESULTS_FOLDER / f"bench_http-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[OK] Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Creación de las carpetas de destino de organize_files
+Planifica un lote sobre una carpeta sintética y crea sus carpetas de destino de
+dos formas, contando las llamadas reales a os.mkdir y os.stat:
+
+1. Por archivo: Path.mkdir(parents=True, exist_ok=True) antes de cada movimiento
+   (como se hacía antes; con la carpeta ya creada cuesta un mkdir y un stat)
+2. De antemano: mover.create_folders, una vez por carpeta distinta y en paralelo
+
+Cada forma se mide con las carpetas sin crear (primer lote) y ya creadas
+(lotes siguientes). Termina con código 1 si la creación de antemano hace más
+llamadas que la creación por archivo
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class SyscallCounter:
+    """Cuenta las llamadas a os.mkdir y os.stat mientras está activo (también desde otros hilos)"""
+
+    def __init__(self):
+        self.counts = {"mkdir": 0, "stat": 0}
+        self._lock = threading.Lock()
+
+    def _wrap(self, name: str, function):
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.counts[name] += 1
+            return function(*args, **kwargs)
+        return counted
+
+    @contextmanager
+    def active(self):
+        original = os.mkdir, os.stat
+        os.mkdir = self._wrap("mkdir", original[0])
+        os.stat = self._wrap("stat", original[1])
+        try:
+            yield self
+        finally:
+            os.mkdir, os.stat = original
+
+
+def per_file(targets):
+    for target in targets:
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+
+
+def up_front(targets, workers: int):
+    from mover import create_folders
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        create_folders((os.path.dirname(target) for target in targets), executor)
+
+
+def measure(label: str, function, targets, organized: Path) -> dict:
+    results = {}
+    for state in ("sin crear", "ya creadas"):
+        if state == "sin crear":
+            shutil.rmtree(organized, ignore_errors=True)
+        counter = SyscallCounter()
+        start = time.perf_counter()
+        with counter.active():
+            function(targets)
+        elapsed = time.perf_counter() - start
+        results[state] = dict(counter.counts, seconds=elapsed)
+        print(
+            f"[BENCH] {label:<12} {state:<11} mkdir {counter.counts['mkdir']:7d}  "
+            f"stat {counter.counts['stat']:7d}  {elapsed * 1000:9.1f} ms"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="Archivos de la carpeta sintética")
+    parser.add_argument("--workers", type=int, default=8, help="Hilos para crear las carpetas de antemano")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # La configuración se lee al importar: el entorno se prepara antes
+        downloads = Path(tmp) / "Downloads"
+        os.environ["FILE_ORGANIZER_DOWNLOADS"] = str(downloads)
+        os.environ["HOME"] = tmp
+
+        from benchmarks.synthetic import generate_tree
+        from config import ORGANIZED_FOLDER_NAME
+        from file_organizer_server import _plan_moves
+
+        generate_tree(downloads, args.files, seed=args.seed)
+        found, planned, errors = _plan_moves(downloads, None)
+        targets = [task.target for task in planned]
+        folders = len({os.path.dirname(target) for target in targets})
+        print(f"[BENCH] {len(targets)} movimientos planificados en {folders} carpetas de destino distintas")
+
+        organized = downloads / ORGANIZED_FOLDER_NAME
+        before = measure("por archivo", per_file, targets, organized)
+        after = measure("de antemano", lambda targets: up_front(targets, args.workers), targets, organized)
+
+    ok = True
+    for state in ("sin crear", "ya creadas"):
+        calls_before = before[state]["mkdir"] + before[state]["stat"]
+        calls_after = after[state]["mkdir"] + after[state]["stat"]
+        print(f"[BENCH] {state}: {calls_before} -> {calls_after} llamadas (mkdir + stat)")
+        ok = ok and calls_after <= calls_before
+    if not ok:
+        print("[ERROR] Crear las carpetas de antemano hizo más llamadas que crearlas por archivo")
+        sys.exit(1)
+    print("[OK] Una llamada por carpeta distinta en lugar de una o dos por archivo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Coste de clasificar con reglas ordenadas según crece el número de reglas
+Compara el motor compilado (rule_engine.RuleMatcher: diccionarios por extensión y
+por prefijo del patrón, y una expresión regular combinada) con evaluar las reglas
+una a una en orden, sobre nombres, tamaños y fechas como los de una carpeta de descargas
+
+Comprueba además que los dos dan la misma categoría para cada archivo. Termina
+con código 1 si no coinciden o si el coste por archivo con más reglas supera
+--max-growth veces el coste con menos reglas
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from benchmarks.synthetic import EXTENSION_PROFILE, NAME_PREFIXES, _pick_size
+from rule_engine import RuleMatcher
+
+DAY = 86400
+
+
+def make_rules(count: int) -> List[dict]:
+    """Juego de reglas realista: casi todas con patrón o extensión, pocas solo por tamaño o edad"""
+    rules = [
+        {"category": "Documentos/Facturas", "name": ["factura_*", "invoice_*"]},
+        {"category": "Comprimidos/Grandes", "extensions": [".zip", ".7z"], "min_size": "1 GB"},
+    ]
+    for i in range(len(rules), count - 2):
+        kind = i % 3
+        if kind == 0:
+            rules.append({"category": f"Proyectos/P{i}", "name": f"proyecto{i}_*"})
+        elif kind == 1:
+            rules.append({"category": f"Formatos/F{i}", "extensions": [f".f{i}"], "max_size": "10 MB"})
+        else:
+            rules.append({"category": f"Clientes/C{i}", "name": f"cliente{i}-*", "extensions": [".pdf"]})
+    rules += [
+        {"category": "Enormes", "min_size": "4 GB"},
+        {"category": "Antiguos", "min_age_days": 365},
+    ]
+    return rules[:count]
+
+
+def make_files(count: int, seed: int, now: float) -> List[Tuple[str, int, float]]:
+    """(nombre, tamaño, mtime) con la mezcla de extensiones de las carpetas sintéticas"""
+    rng = random.Random(seed)
+    extensions = [extension for extension, _, _ in EXTENSION_PROFILE]
+    weights = [weight for _, weight, _ in EXTENSION_PROFILE]
+    medians = {extension: median for extension, _, median in EXTENSION_PROFILE}
+    files = []
+    for i in range(count):
+        extension = rng.choices(extensions, weights)[0]
+        name = f"{rng.choice(NAME_PREFIXES)}_{i}{extension}"
+        if i % 50 == 0:
+            # Algunos nombres que sí encajan con reglas del final de la lista
+            name = f"proyecto{rng.randrange(1000)}_{i}{extension}"
+        files.append((name, _pick_size(rng, medians[extension]), now - rng.uniform(0, 730) * DAY))
+    return files
+
+
+def naive_match(rules, filename: str, size: int, mtime: float, now: float) -> Optional[str]:
+    """Referencia: cada regla se prueba entera, en orden"""
+    lowered = filename.lower()
+    age = now - mtime
+    for rule in rules:
+        if rule.extensions is not None and not any(lowered.endswith(extension) for extension in rule.extensions):
+            continue
+        if rule.pattern is not None and not rule.pattern.match(filename):
+            continue
+        if rule.accepts(size, age):
+            return rule.category
+    return None
+
+
+def measure(function, files, repeats: int) -> float:
+    """Mediana de nanosegundos por archivo"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        for name, size, mtime in files:
+            function(name, size, mtime)
+        timings.append((time.perf_counter_ns() - start) / len(files))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", default="10,100,500,1000", help="Números de reglas a medir")
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-growth", type=float, default=3.0,
+                        help="Máximo coste por archivo con más reglas / coste con menos reglas")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    now = time.time()
+    files = make_files(args.files, args.seed, now)
+    counts = [int(count) for count in args.rules.split(",")]
+    ok = True
+    engine_costs = []
+    for count in counts:
+        matcher = RuleMatcher(make_rules(count))
+        engine = lambda name, size, mtime: matcher.match(name, size, mtime, now)
+        naive = lambda name, size, mtime: naive_match(matcher.rules, name, size, mtime, now)
+
+        mismatches = sum(
+            1 for name, size, mtime in files if engine(name, size, mtime) != naive(name, size, mtime)
+        )
+        engine_cost = measure(engine, files, args.repeats)
+        naive_cost = measure(naive, files, args.repeats)
+        engine_costs.append(engine_cost)
+        print(
+            f"[BENCH] {count:5d} reglas  motor {engine_cost:9.0f} ns/archivo  "
+            f"una a una {naive_cost:9.0f} ns/archivo  ({naive_cost / engine_cost:5.1f}x)  "
+            f"diferencias {mismatches}"
+        )
+        if mismatches:
+            ok = False
+
+    growth = engine_costs[-1] / engine_costs[0]
+    print(f"\n[BENCH] Crecimiento del coste del motor de {counts[0]} a {counts[-1]} reglas: {growth:.2f}x")
+    if growth > args.max_growth:
+        print(f"[ERROR] El coste crece más de {args.max_growth}x")
+        ok = False
+    if not ok:
+        sys.exit(1)
+    print("[OK] Mismas categorías que evaluando regla a regla, con coste casi constante")
+
+
+if __name__ == "__main__":
+    main()
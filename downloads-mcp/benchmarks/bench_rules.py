@@ -0,0 +1,195 @@
+"""
+Recarga en caliente del fichero de reglas
+Mide dos cosas:
+
+1. El coste de una recarga (leer, validar, compilar y sustituir) con un fichero
+   de reglas grande (--categories x --extensions-per-category)
+2. El efecto en las llamadas en curso: varios clientes llaman a las herramientas
+   sobre una carpeta sintética, primero sin recargas y después recargando cada
+   --reload-ms dos juegos de reglas que solo se diferencian en el nombre de una
+   categoría. Cuenta los errores y los resultados que mezclan los dos juegos
+
+Termina con código 1 si alguna llamada falla o mezcla reglas
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Los dos juegos de reglas de la segunda prueba: "Documentos" cambia de nombre
+RENAMED_CATEGORY = ("Documentos", "Textos")
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def write_rules(path: Path, organization: dict):
+    """Escribe un fichero de reglas TOML de forma atómica (como lo guardaría un editor)"""
+    lines = []
+    for category, config in organization.items():
+        extensions = ", ".join(json.dumps(extension) for extension in config["extensions"])
+        lines.append(f"[categories.{json.dumps(category, ensure_ascii=False)}]")
+        lines.append(f"extensions = [{extensions}]")
+        lines.append(f"description = {json.dumps(config.get('description', ''), ensure_ascii=False)}")
+        lines.append("")
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text("\n".join(lines), encoding="utf-8")
+    os.replace(temporary, path)
+
+
+def measure_reload_cost(tmp: Path, categories: int, per_category: int, repeats: int):
+    """Coste de check() con un fichero grande que cambia en cada repetición"""
+    from config import DEFAULT_RULES
+    from rules_file import RulesFile, apply_rules
+
+    organization = {
+        f"Categoria_{i}": {"extensions": [f".e{i}x{j}" for j in range(per_category)]}
+        for i in range(categories)
+    }
+    path = tmp / "grandes.toml"
+    rules_file = RulesFile(path)
+    timings = []
+    for repeat in range(repeats):
+        # Un cambio real en cada vuelta (otra extensión en la primera categoría)
+        organization["Categoria_0"]["extensions"][0] = f".cambio{repeat}"
+        write_rules(path, organization)
+        start = time.perf_counter()
+        reloaded = rules_file.check()
+        timings.append(time.perf_counter() - start)
+        assert reloaded, rules_file.last_error
+    apply_rules(DEFAULT_RULES)
+
+    values = [value * 1000 for value in timings]
+    print(
+        f"[BENCH] Recarga de {categories * per_category} extensiones: "
+        f"mediana {statistics.median(values):.2f} ms, p95 {percentile(values, 0.95):.2f} ms, "
+        f"máx {max(values):.2f} ms"
+    )
+
+
+async def client_loop(server, stop_at: float, stats: dict):
+    """Llama a las herramientas en bucle y comprueba cada resultado"""
+    old, new = RENAMED_CATEGORY
+    calls = [
+        ("analyze_downloads", {"recursive": True, "format": "json", "page_size": 1}),
+        ("analyze_downloads", {}),
+        ("get_file_info", {"patterns": ["*.pdf", "*.txt"]}),
+    ]
+    i = 0
+    while time.monotonic() < stop_at:
+        tool, arguments = calls[i % len(calls)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            result = await server.handle_call_tool(tool, arguments)
+        except Exception:
+            stats["errors"] += 1
+            continue
+        stats["latency"].append(time.perf_counter() - start)
+        text = result[0].text
+        if text.startswith("[ERROR]"):
+            stats["errors"] += 1
+        elif arguments.get("format") == "json":
+            categories = json.loads(text)["categories"]
+            # Un análisis hecho con una sola versión de las reglas nunca tiene las dos categorías
+            if old in categories and new in categories:
+                stats["mixed"] += 1
+
+
+async def reload_loop(server, rules_path: Path, organizations, interval: float, stop_at: float, stats: dict):
+    """Alterna los dos juegos de reglas cada `interval` segundos"""
+    i = 0
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(interval)
+        i += 1
+        write_rules(rules_path, organizations[i % 2])
+        start = time.perf_counter()
+        if await server.run_blocking(server._rules_file.check):
+            stats["reloads"] += 1
+            stats["reload_latency"].append(time.perf_counter() - start)
+
+
+async def run_phase(server, clients: int, duration: float, reload=None) -> dict:
+    stats = {"latency": [], "errors": 0, "mixed": 0, "reloads": 0, "reload_latency": []}
+    stop_at = time.monotonic() + duration
+    tasks = [client_loop(server, stop_at, stats) for _ in range(clients)]
+    if reload is not None:
+        tasks.append(reload_loop(server, *reload, stop_at, stats))
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def report(label: str, stats: dict):
+    values = [value * 1000 for value in stats["latency"]]
+    line = (
+        f"[BENCH] {label:<14} {len(values):6d} llamadas  p50 {percentile(values, 0.50):8.2f} ms  "
+        f"p95 {percentile(values, 0.95):8.2f} ms  errores {stats['errors']}  mezcladas {stats['mixed']}"
+    )
+    if stats["reloads"]:
+        reloads = [value * 1000 for value in stats["reload_latency"]]
+        line += f"  recargas {stats['reloads']} (mediana {statistics.median(reloads):.2f} ms)"
+    print(line)
+
+
+async def measure_in_flight(files: int, clients: int, duration: float, reload_ms: float, seed: int) -> bool:
+    import file_organizer_server as server
+    from benchmarks.synthetic import generate_tree
+    from config import FILE_ORGANIZATION
+
+    downloads = Path(os.environ["FILE_ORGANIZER_DOWNLOADS"])
+    rules_path = Path(os.environ["FILE_ORGANIZER_RULES"])
+    generate_tree(downloads, files, seed=seed)
+
+    old, new = RENAMED_CATEGORY
+    original = {category: dict(config) for category, config in FILE_ORGANIZATION.items()}
+    renamed = {(new if category == old else category): config for category, config in original.items()}
+
+    # Índice caliente antes de medir
+    await server.handle_call_tool("analyze_downloads", {"recursive": True})
+    quiet = await run_phase(server, clients, duration)
+    report("sin recargas", quiet)
+    busy = await run_phase(server, clients, duration, (rules_path, [original, renamed], reload_ms / 1000))
+    report("con recargas", busy)
+
+    ok = not (quiet["errors"] or busy["errors"] or quiet["mixed"] or busy["mixed"])
+    if ok:
+        print("[OK] Ninguna llamada falló ni mezcló dos versiones de las reglas")
+    else:
+        print("[ERROR] Hubo llamadas con error o con reglas mezcladas")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--extensions-per-category", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=20, help="Recargas a medir con el fichero grande")
+    parser.add_argument("--files", type=int, default=5000, help="Archivos de la carpeta sintética")
+    parser.add_argument("--clients", type=int, default=4, help="Llamadas simultáneas")
+    parser.add_argument("--duration", type=float, default=5.0, help="Segundos de cada fase")
+    parser.add_argument("--reload-ms", type=float, default=250.0, help="Intervalo entre recargas")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # La configuración se lee al importar: el entorno se prepara antes
+        os.environ["FILE_ORGANIZER_DOWNLOADS"] = str(Path(tmp) / "Downloads")
+        os.environ["FILE_ORGANIZER_RULES"] = str(Path(tmp) / "rules.toml")
+        os.environ["HOME"] = tmp
+        measure_reload_cost(Path(tmp), args.categories, args.extensions_per_category, args.repeats)
+        ok = asyncio.run(measure_in_flight(args.files, args.clients, args.duration, args.reload_ms, args.seed))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
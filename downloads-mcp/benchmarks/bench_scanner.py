@@ -0,0 +1,118 @@
+"""
+Compara el recorrido antiguo (iterdir + is_file + 2 stat) con el escáner os.scandir
+Mide tiempo y número de llamadas stat por archivo sobre una carpeta sintética
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from scanner import scan_files
+
+
+def create_flat_folder(folder: Path, count: int):
+    """Crea `count` archivos vacíos con extensiones variadas"""
+    extensions = [".pdf", ".jpg", ".mp4", ".mp3", ".py", ".zip", ".exe", ".csv", ".xyz"]
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        (folder / f"archivo_{i:07d}{extensions[i % len(extensions)]}").touch()
+
+
+def legacy_scan(folder: Path) -> int:
+    """Recorrido de las versiones anteriores de analyze_downloads"""
+    total = 0
+    files = [f for f in folder.iterdir() if f.is_file()]
+    for file_path in files:
+        total += file_path.stat().st_size
+        file_path.stat().st_mtime
+    return total
+
+
+def scanner_scan(folder: Path) -> int:
+    """Recorrido con el escáner compartido"""
+    return sum(record.size for record in scan_files(folder))
+
+
+class _CountingEntry:
+    """Envuelve un DirEntry para contar las llamadas a stat()"""
+
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+
+    def stat(self, *args, **kwargs):
+        self._counter[0] += 1
+        return self._entry.stat(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+
+class _CountingScandir:
+    def __init__(self, iterator, counter):
+        self._iterator = iterator
+        self._counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._iterator.close()
+
+    def __iter__(self):
+        for entry in self._iterator:
+            yield _CountingEntry(entry, self._counter)
+
+
+def count_stats(func, folder: Path) -> int:
+    """Cuenta las llamadas a os.stat y DirEntry.stat que hace `func`"""
+    counter = [0]
+    real_stat, real_scandir = os.stat, os.scandir
+
+    def counting_stat(*args, **kwargs):
+        counter[0] += 1
+        return real_stat(*args, **kwargs)
+
+    os.stat = counting_stat
+    os.scandir = lambda path=".": _CountingScandir(real_scandir(path), counter)
+    try:
+        func(folder)
+    finally:
+        os.stat, os.scandir = real_stat, real_scandir
+    return counter[0]
+
+
+def timed(func, folder: Path, repeat: int) -> float:
+    """Mejor tiempo de `repeat` ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(folder)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "Downloads"
+        print(f"[BENCH] Creando {args.files} archivos en {folder}...")
+        create_flat_folder(folder, args.files)
+
+        for label, func in (("iterdir + stat", legacy_scan), ("scanner (scandir)", scanner_scan)):
+            seconds = timed(func, folder, args.repeat)
+            stats = count_stats(func, folder)
+            print(
+                f"{label:<20} {seconds * 1000:9.1f} ms  "
+                f"{stats:>9} stat  ({stats / args.files:.2f} por archivo)"
+            )
+
+
+if __name__ == "__main__":
+    main()
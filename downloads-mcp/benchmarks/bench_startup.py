@@ -0,0 +1,143 @@
+"""
+Tiempo de arranque del servidor en modo stdio
+Lanza el servidor varias veces como lo haría un cliente MCP y mide el tiempo
+hasta la respuesta a initialize y hasta la primera respuesta a tools/list.
+Después desglosa las importaciones con `python -X importtime`
+
+Termina con código 1 si la mediana hasta tools/list supera el presupuesto (--budget-ms)
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SERVER_FOLDER = Path(__file__).parent.parent
+
+# Mensajes JSON-RPC que envía un cliente al conectarse
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-06-18",
+        "capabilities": {},
+        "clientInfo": {"name": "bench_startup", "version": "0"},
+    },
+}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+LIST_TOOLS = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _send(process: subprocess.Popen, message: dict):
+    process.stdin.write(json.dumps(message) + "\n")
+    process.stdin.flush()
+
+
+def _wait_response(process: subprocess.Popen, request_id: int) -> dict:
+    """Lee la salida del servidor hasta la respuesta a `request_id`"""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("El servidor terminó sin responder")
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            raise RuntimeError(f"Salida que no es JSON-RPC en stdout: {line.strip()}")
+        if message.get("id") == request_id:
+            return message
+
+
+def measure_once(entry: str, environment: dict) -> dict:
+    """Un arranque: segundos hasta initialize y hasta tools/list"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, entry],
+        cwd=SERVER_FOLDER, env=environment, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _send(process, INITIALIZE)
+        _wait_response(process, 1)
+        initialized = time.perf_counter() - start
+        _send(process, INITIALIZED)
+        _send(process, LIST_TOOLS)
+        tools = _wait_response(process, 2)["result"]["tools"]
+        first_list = time.perf_counter() - start
+        # Una segunda lista mide el coste de list_tools ya en caliente
+        list_start = time.perf_counter()
+        _send(process, dict(LIST_TOOLS, id=3))
+        _wait_response(process, 3)
+        second_list = time.perf_counter() - list_start
+    finally:
+        process.kill()
+        process.wait()
+    return {
+        "initialize": initialized,
+        "first_tools_list": first_list,
+        "second_tools_list": second_list,
+        "tools": len(tools),
+    }
+
+
+def import_breakdown(environment: dict, top: int) -> list:
+    """Importaciones más lentas (tiempo acumulado) al importar el servidor"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import file_organizer_server"],
+        cwd=SERVER_FOLDER, env=environment, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append((module, int(cumulative) / 1000, int(own) / 1000, len(indent) // 2))
+    # Solo las importaciones directas de primer nivel, para no contar dos veces
+    top_level = [entry for entry in imports if entry[3] <= 1]
+    return sorted(top_level, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Arranques a medir")
+    parser.add_argument("--entry", default="main.py",
+                        help="Script a lanzar: main.py (arranque rápido) o file_organizer_server.py")
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="Presupuesto para la mediana hasta la primera respuesta a tools/list")
+    parser.add_argument("--top", type=int, default=12, help="Importaciones a mostrar")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        environment = dict(os.environ, HOME=tmp, FILE_ORGANIZER_DOWNLOADS=str(Path(tmp) / "Downloads"))
+        # Con bytecode en caché, como en una instalación normal
+        environment.pop("PYTHONDONTWRITEBYTECODE", None)
+        Path(tmp, "Downloads").mkdir()
+
+        # Un arranque previo, sin medir, para que existan los .pyc
+        measure_once(args.entry, environment)
+        runs = [measure_once(args.entry, environment) for _ in range(args.runs)]
+        imports = import_breakdown(environment, args.top)
+
+    for label in ("initialize", "first_tools_list", "second_tools_list"):
+        values = [run[label] * 1000 for run in runs]
+        print(f"[BENCH] {label:<18} mediana {statistics.median(values):9.2f} ms  máx {max(values):9.2f} ms")
+    print(f"[BENCH] Herramientas listadas: {runs[0]['tools']}")
+    print("\n[BENCH] Importaciones más lentas (acumulado / propio):")
+    for module, cumulative, own, _ in imports:
+        print(f"  {module:<40} {cumulative:9.2f} ms  {own:9.2f} ms")
+
+    median = statistics.median(run["first_tools_list"] for run in runs) * 1000
+    if median > args.budget_ms:
+        print(f"\n[ERROR] Primera respuesta a tools/list ({median:.2f} ms) supera {args.budget_ms} ms")
+        sys.exit(1)
+    print(f"\n[OK] Primera respuesta a tools/list por debajo de {args.budget_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
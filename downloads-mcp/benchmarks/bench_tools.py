@@ -0,0 +1,150 @@
+"""
+Benchmark de las herramientas del servidor sobre carpetas sintéticas de 1k a 1M archivos
+Mide analyze_downloads, organize_files (simulado y real), get_file_info y
+cleanup_empty_folders, y guarda los resultados en JSON para comparar commits
+
+Cada tamaño se mide en un proceso aparte: la configuración se lee al importar
+y así cada ejecución parte de un índice y un diario vacíos
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Fuera del repositorio: medir no deja archivos sin seguimiento en el árbol de trabajo
+RESULTS_FOLDER = Path.home() / ".file_organizer" / "benchmarks"
+
+# (nombre en los resultados, herramienta, argumentos), en el orden en que se ejecutan
+STEPS = [
+    ("analyze_cold", "analyze_downloads", {"recursive": True}),
+    ("analyze_warm", "analyze_downloads", {"recursive": True}),
+    ("analyze_details", "analyze_downloads", {"recursive": True, "show_details": True}),
+    ("get_file_info_one", "get_file_info", {"filename": "__primer_archivo__"}),
+    ("get_file_info_glob", "get_file_info", {"patterns": ["*.pdf", "IMG_*"]}),
+    ("organize_dry_run", "organize_files", {"dry_run": True}),
+    ("organize", "organize_files", {"dry_run": False}),
+    ("cleanup_dry_run", "cleanup_empty_folders", {"dry_run": True}),
+    ("cleanup", "cleanup_empty_folders", {"dry_run": False}),
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+async def run_steps(files: int, seed: int) -> dict:
+    """Genera el árbol y mide cada herramienta (en el proceso hijo)"""
+    import file_organizer_server as server
+    from benchmarks.synthetic import generate_tree
+    from scan_index import RACY_WINDOW_NS
+
+    downloads = Path(os.environ["FILE_ORGANIZER_DOWNLOADS"])
+    tree = generate_tree(downloads, files, seed=seed)
+    first_file = min(entry.name for entry in os.scandir(downloads) if entry.is_file())
+    # Las carpetas recién creadas caen dentro de la ventana en la que su mtime no
+    # es fiable: el índice no las daría por vistas y la pasada "warm" las volvería
+    # a leer todas. Se espera a que salgan de ella antes de medir
+    time.sleep(RACY_WINDOW_NS / 1e9)
+
+    timings = {}
+    for label, tool, arguments in STEPS:
+        if arguments.get("filename") == "__primer_archivo__":
+            arguments = {"filename": first_file}
+        start = time.perf_counter()
+        result = await server.handle_call_tool(tool, arguments)
+        elapsed = time.perf_counter() - start
+        text = result[0].text
+        timings[label] = {"seconds": round(elapsed, 4), "ok": not text.startswith("[ERROR]")}
+        print(f"[BENCH] {files:>8} archivos  {label:<20} {elapsed * 1000:10.1f} ms", file=sys.stderr)
+    return {"tree": tree, "timings": timings}
+
+
+def run_child(files: int, seed: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        # La configuración se lee al importar: el entorno se prepara antes
+        os.environ["FILE_ORGANIZER_DOWNLOADS"] = str(Path(tmp) / "Downloads")
+        os.environ["HOME"] = tmp
+        result = asyncio.run(run_steps(files, seed))
+    print(json.dumps(result))
+
+
+def run_size(files: int, seed: int) -> dict:
+    """Lanza un proceso hijo para un tamaño y devuelve sus resultados"""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_tools", "--child", str(files), "--seed", str(seed)],
+        stdout=subprocess.PIPE, check=True, text=True, cwd=Path(__file__).parent.parent
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(old_path: Path, new_path: Path):
+    """Muestra la relación de tiempos entre dos ficheros de resultados"""
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+    print(f"{old['commit']} -> {new['commit']}")
+    for size, new_run in new["runs"].items():
+        old_run = old["runs"].get(size)
+        if old_run is None:
+            continue
+        print(f"\n{size} archivos")
+        for label, timing in new_run["timings"].items():
+            before = old_run["timings"].get(label)
+            if before is None or not before["seconds"]:
+                continue
+            ratio = timing["seconds"] / before["seconds"]
+            print(f"  {label:<20} {before['seconds']:9.4f} s -> {timing['seconds']:9.4f} s  (x{ratio:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", default="1000,10000,100000",
+                        help="Tamaños separados por comas (por ejemplo, 1000,10000,100000,1000000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Fichero JSON de resultados (por defecto en ~/.file_organizer/benchmarks)")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("ANTES", "DESPUES"),
+                        help="Compara dos ficheros de resultados en lugar de medir")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child is not None:
+        run_child(args.child, args.seed)
+        return
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "runs": {},
+    }
+    for files in (int(size) for size in args.files.split(",")):
+        results["runs"][str(files)] = run_size(files, args.seed)
+
+    output = args.output or RESULTS_FOLDER / f"bench_tools-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[OK] Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Movimientos entre dispositivos (organizados en otro montaje que Descargas)
+Mueve un archivo grande de una carpeta temporal a --target-dir (por defecto
+/dev/shm, que es tmpfs y por tanto otro dispositivo) de dos formas:
+
+1. shutil.move: copia en espacio de usuario directamente sobre el nombre final
+2. transfer.copy_move: copia en el kernel por bloques a un temporal, verificada
+   y con rename atómico
+
+Después simula un corte: un proceso hijo empieza la copia y se mata con SIGKILL
+a mitad; la copia se reanuda y se comprueba que el destino es idéntico al
+original y cuántos bytes hubo que volver a copiar. Termina con código 1 si la
+copia reanudada no coincide, si repite más de un bloque de lo ya copiado o si
+copy_move tarda más de --max-slowdown veces lo que shutil.move
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_ROOT = Path(__file__).resolve().parent.parent
+
+
+def make_file(path: Path, size_mb: int):
+    """Archivo de datos aleatorios (sin huecos: se copia todo el tamaño)"""
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+
+def checksum(path: Path) -> str:
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def timed_move(function, source: Path, target: Path) -> float:
+    start = time.perf_counter()
+    function(str(source), str(target))
+    return time.perf_counter() - start
+
+
+def child(source: str, target: str, chunk_mb: int):
+    """Proceso que copia y al que el padre mata a mitad de la copia"""
+    from config import SETTINGS
+    from transfer import copy_move
+
+    SETTINGS["copy_chunk_mb"] = chunk_mb
+    copy_move(source, target)
+
+
+def interrupted_copy(source: Path, target: Path, chunk_mb: int, size: int) -> int:
+    """Lanza la copia en un hijo y lo mata al pasar de la mitad; devuelve el offset guardado"""
+    from transfer import _load_checkpoint, part_paths
+
+    _, checkpoint_path = part_paths(str(target))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_transfer", "--child", str(source), str(target), str(chunk_mb)],
+        cwd=BENCH_ROOT,
+    )
+    offset = 0
+    while process.poll() is None:
+        checkpoint = _load_checkpoint(checkpoint_path) or {}
+        offset = checkpoint.get("offset", 0)
+        if offset >= size // 2:
+            process.send_signal(signal.SIGKILL)
+            break
+        time.sleep(0.001)
+    process.wait()
+    return offset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256, help="Tamaño del archivo a mover")
+    parser.add_argument("--chunk-mb", type=int, default=16, help="Bloque de copia (SETTINGS['copy_chunk_mb'])")
+    parser.add_argument("--target-dir", default="/dev/shm", help="Carpeta en otro dispositivo")
+    parser.add_argument("--max-slowdown", type=float, default=1.5,
+                        help="Máximo tiempo de copy_move / tiempo de shutil.move")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        source, target, chunk_mb = args.child
+        child(source, target, int(chunk_mb))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory(dir=args.target_dir) as other:
+        # La configuración se lee al importar: el entorno se prepara antes
+        os.environ["HOME"] = tmp
+        os.environ["FILE_ORGANIZER_DOWNLOADS"] = str(Path(tmp) / "Downloads")
+
+        from config import SETTINGS
+        from metrics import METRICS
+        from transfer import copy_move, has_checkpoint
+
+        SETTINGS["copy_chunk_mb"] = args.chunk_mb
+        source = Path(tmp) / "video.mkv"
+        target = Path(other) / "video.mkv"
+        if os.stat(tmp).st_dev == os.stat(other).st_dev:
+            print(f"[AVISO] {args.target_dir} está en el mismo dispositivo: no se mide una copia entre dispositivos")
+
+        make_file(source, args.size_mb)
+        expected = checksum(source)
+        size = source.stat().st_size
+        print(f"[BENCH] {args.size_mb} MB de {tmp} a {other}, bloques de {args.chunk_mb} MB")
+
+        timings = {}
+        for label, function in (("shutil.move", shutil.move), ("copy_move", copy_move)):
+            runs = []
+            for _ in range(3):
+                runs.append(timed_move(function, source, target))
+                shutil.move(str(target), str(source))
+            timings[label] = min(runs)
+            print(f"[BENCH] {label:<12} {timings[label] * 1000:8.1f} ms  "
+                  f"{args.size_mb / timings[label]:8.1f} MB/s")
+
+        ok = True
+        saved = interrupted_copy(source, target, args.chunk_mb, size)
+        print(f"[BENCH] Copia cortada con SIGKILL tras guardar {saved / (1024 * 1024):.0f} MB "
+              f"(destino final presente: {target.exists()})")
+        if target.exists():
+            print("[ERROR] El corte dejó un archivo en el nombre final")
+            ok = False
+
+        copied_before = METRICS.snapshot()["counters"].get("bytes_copied", 0)
+        elapsed = timed_move(copy_move, source, target)
+        recopied = METRICS.snapshot()["counters"].get("bytes_copied", 0) - copied_before
+        print(f"[BENCH] Reanudada en {elapsed * 1000:.1f} ms, "
+              f"{recopied / (1024 * 1024):.0f} MB copiados de nuevo de {size / (1024 * 1024):.0f} MB")
+
+        if source.exists() or has_checkpoint(str(target)) or checksum(target) != expected:
+            print("[ERROR] La copia reanudada no coincide con el original")
+            ok = False
+        if recopied > size - saved + args.chunk_mb * 1024 * 1024:
+            print("[ERROR] Al reanudar se copió de nuevo más de un bloque de lo ya guardado")
+            ok = False
+        slowdown = timings["copy_move"] / timings["shutil.move"]
+        print(f"[BENCH] copy_move / shutil.move: {slowdown:.2f}x")
+        if slowdown > args.max_slowdown:
+            print(f"[ERROR] copy_move es más de {args.max_slowdown}x más lento que shutil.move")
+            ok = False
+
+    if not ok:
+        sys.exit(1)
+    print("[OK] Copia verificada con rename atómico, reanudada desde el último punto de control")
+
+
+if __name__ == "__main__":
+    main()
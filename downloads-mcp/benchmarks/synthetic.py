@@ -0,0 +1,130 @@
+"""
+Generador de carpetas de descargas sintéticas y reproducibles
+Los archivos son dispersos (truncate): un árbol de varios TB apenas ocupa disco
+"""
+
+import os
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from config import ORGANIZED_FOLDER_NAME
+
+MB = 1024 * 1024
+
+# Fecha de referencia de las mtimes (2024-06-01 00:00 UTC): fija para que el
+# mismo árbol caiga en las mismas carpetas AAAA-MM sea cual sea el día de la medida
+REFERENCE_EPOCH = 1717200000.0
+
+# (extensión, peso relativo, tamaño mediano en bytes): una carpeta de descargas típica
+# está dominada por documentos e imágenes, con pocos archivos grandes (vídeo, instaladores)
+EXTENSION_PROFILE: List[Tuple[str, float, int]] = [
+    (".pdf", 18, 400 * 1024),
+    (".docx", 5, 60 * 1024),
+    (".txt", 4, 4 * 1024),
+    (".jpg", 14, 2 * MB),
+    (".png", 10, 300 * 1024),
+    (".webp", 2, 150 * 1024),
+    (".mp4", 4, 80 * MB),
+    (".mkv", 1, 700 * MB),
+    (".mp3", 3, 5 * MB),
+    (".wav", 1, 30 * MB),
+    (".zip", 8, 25 * MB),
+    (".tar.gz", 2, 40 * MB),
+    (".7z", 1, 60 * MB),
+    (".exe", 4, 50 * MB),
+    (".msi", 1, 80 * MB),
+    (".dmg", 1, 120 * MB),
+    (".xlsx", 3, 80 * 1024),
+    (".csv", 2, 500 * 1024),
+    (".py", 2, 8 * 1024),
+    (".html", 1, 40 * 1024),
+    (".json", 2, 20 * 1024),
+    ("", 2, 100 * 1024),
+    (".torrent", 1, 30 * 1024),
+    (".iso", 1, 3 * 1024 * MB),
+]
+
+# Dispersión de los tamaños alrededor de la mediana (desviación del logaritmo)
+SIZE_SIGMA = 1.2
+
+# Prefijos de nombre habituales en descargas
+NAME_PREFIXES = ["factura", "IMG", "Screenshot", "informe", "setup", "video", "backup", "doc", "scan", "descarga"]
+
+
+def _pick_size(rng: random.Random, median: int) -> int:
+    size = int(rng.lognormvariate(0, SIZE_SIGMA) * median)
+    return max(0, min(size, 64 * 1024 * MB))
+
+
+def generate_tree(
+    root: Path,
+    files: int,
+    seed: int = 42,
+    subfolder_ratio: float = 0.3,
+    max_depth: int = 3,
+    empty_chains: int = 50,
+    reference_time: float = REFERENCE_EPOCH
+) -> Dict[str, int]:
+    """
+    Crea una carpeta de descargas sintética
+
+    Con la misma semilla se obtiene siempre el mismo árbol (nombres, tamaños y fechas)
+
+    Args:
+        root (Path): Carpeta de descargas a crear
+        files (int): Número de archivos
+        seed (int): Semilla del generador
+        subfolder_ratio (float): Fracción de archivos dentro de subcarpetas
+        max_depth (int): Profundidad máxima de las subcarpetas
+        empty_chains (int): Cadenas de carpetas vacías dentro de la carpeta organizada
+        reference_time (float): Timestamp desde el que se reparten las fechas hacia atrás
+
+    Returns:
+        dict: Archivos, bytes (aparentes), carpetas y segundos empleados
+    """
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    extensions = [extension for extension, _, _ in EXTENSION_PROFILE]
+    weights = [weight for _, weight, _ in EXTENSION_PROFILE]
+    medians = {extension: median for extension, _, median in EXTENSION_PROFILE}
+
+    # Unas pocas subcarpetas por cada mil archivos, a distinta profundidad
+    folders = [root]
+    for i in range(max(1, files // 1000)):
+        depth = rng.randint(1, max_depth)
+        folders.append(root.joinpath(*(f"carpeta_{i}_{level}" for level in range(depth))))
+    for folder in folders[1:]:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    total_bytes = 0
+    for i in range(files):
+        extension = rng.choices(extensions, weights)[0]
+        size = _pick_size(rng, medians[extension])
+        folder = rng.choice(folders[1:]) if rng.random() < subfolder_ratio else root
+        path = folder / f"{rng.choice(NAME_PREFIXES)}_{i:07d}{extension}"
+        with open(path, "wb") as f:
+            # Archivo disperso: tamaño aparente sin escribir datos
+            f.truncate(size)
+        # Fechas repartidas en los dos años anteriores a la referencia
+        mtime = reference_time - rng.uniform(0, 2 * 365 * 86400)
+        os.utime(path, (mtime, mtime))
+        total_bytes += size
+
+    organized = root / ORGANIZED_FOLDER_NAME
+    for i in range(empty_chains):
+        organized.joinpath(f"vacia_{i}", *(f"nivel_{level}" for level in range(rng.randint(1, 4)))).mkdir(
+            parents=True, exist_ok=True
+        )
+
+    return {
+        "files": files,
+        "bytes": total_bytes,
+        "folders": len(folders),
+        "reference_time": reference_time,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
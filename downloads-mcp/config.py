@@ -1,5 +1,17 @@
+import hashlib
+import json
 import os 
+import time
+from collections import ChainMap
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+from typing import Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from rule_engine import RuleMatcher
 
 """
 Configuración para el organizador de archivos MCP
@@ -7,7 +19,32 @@ Define las reglas de organizacíon por tipo de archivo
 """
 
 #Ruta de carpetas de descargas (Windows)
-DOWNLOADS_FOLDER = Path.home() / "Downloads"
+# Carpetas de entrada a organizar (descargas del navegador, salida del escáner,
+# adjuntos del correo...). Con la variable de entorno FILE_ORGANIZER_DOWNLOADS se
+# pueden indicar una o varias, separadas por os.pathsep (":" en Linux, ";" en Windows)
+DOWNLOADS_FOLDERS: List[Path] = [
+    Path(folder)
+    for folder in os.environ.get("FILE_ORGANIZER_DOWNLOADS", str(Path.home() / "Downloads")).split(os.pathsep)
+    if folder
+]
+
+# La primera es la carpeta de descargas por defecto
+DOWNLOADS_FOLDER = DOWNLOADS_FOLDERS[0]
+
+# Carpeta donde quedan los archivos organizados, dentro de la carpeta base
+# (la usan organize_files, create_folder_structure y cleanup_empty_folders)
+ORGANIZED_FOLDER_NAME = "organizados"
+ORGANIZED_FOLDER = DOWNLOADS_FOLDER / ORGANIZED_FOLDER_NAME
+
+# Índice persistente del escaneo (SQLite), fuera de la carpeta de descargas
+INDEX_PATH = Path.home() / ".file_organizer" / "scan_index.sqlite3"
+
+# Diarios de organize_files (para reanudar lotes interrumpidos y deshacerlos)
+JOURNAL_FOLDER = Path.home() / ".file_organizer" / "journal"
+
+# Fichero de reglas (TOML o JSON) que sustituye a FILE_ORGANIZATION, MIME_CATEGORIES
+# y a parte de SETTINGS sin reiniciar el servidor (ver rules_file.py)
+RULES_PATH = Path(os.environ.get("FILE_ORGANIZER_RULES", Path.home() / ".file_organizer" / "rules.toml"))
 
 
 # Diccionario de organización por extensiones
@@ -29,11 +66,11 @@ FILE_ORGANIZATION = {
         "description": "Archivos de audio"
     },
     "Programación": {
-        "extensions": [".py", ".js", ".html", ".css", ".java", ".cpp", ".c", ".sql"],
+        "extensions": [".py", ".js", ".user.js", ".html", ".css", ".java", ".cpp", ".c", ".sql"],
         "description": "Archivos de código fuente"
     },
     "Comprimidos": {
-        "extensions": [".zip", ".rar", ".7z", ".tar", ".gz"],
+        "extensions": [".zip", ".rar", ".7z", ".tar", ".gz", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"],
         "description": "Archivos comprimidos"
     },
     "Ejecutables": {
@@ -47,14 +84,317 @@ FILE_ORGANIZATION = {
 }
 
 
+# Reglas ordenadas que se aplican antes que las extensiones: gana la primera que
+# cumple el archivo. Cada una combina extensión, tamaño, antigüedad y patrón de
+# nombre, y puede mandar a una subcarpeta de categoría (ver rule_engine.py). Ejemplo:
+#   {"category": "Comprimidos/Grandes", "extensions": [".zip", ".7z"], "min_size": "1 GB"},
+#   {"category": "Documentos/Facturas", "name": ["factura_*", "invoice_*"]},
+CLASSIFICATION_RULES: List[dict] = []
+
+
 # Configuración adicionales
 SETTINGS = {
     "create_date_folders": True, # Creamos subcarpetas por fechas
+    "date_folder_source": "mtime", # Fecha de esas subcarpetas: "mtime", "created", "exif" o "today" (ver dates.py)
     "backup_before_move": False, # Crear copia de seguridad antes
     "dry_run": False, # Modo simulación (No mueve los archivos realmente )
-    "log_operations": True, # Registrar las operaciones
+    "log_operations": True, # Registrar las operaciones en un diario (reanudar y deshacer)
+    "journal_sync_every": 1000, # fsync del diario cada N movimientos...
+    "journal_sync_seconds": 1.0, # ...o cada N segundos
+    "journal_keep_runs": 100, # Diarios de lotes terminados que se conservan (para deshacer); 0 = todos
+    "use_scan_index": True, # Usar el índice persistente en analyze_downloads
+    "io_workers": 8, # Hilos del servidor para el trabajo con el sistema de archivos
+    "move_workers": 8, # Hilos para mover archivos en organize_files
+    "copy_chunk_mb": 64, # Bloque de las copias entre dispositivos (punto de control tras cada uno, ver transfer.py)
+    "verify_copies": "size", # Verificación de esas copias: "size" o "checksum" (lee origen y copia enteros)
+    "hash_workers": 4, # Hilos para calcular hashes en find_duplicates
+    "scan_workers": 8, # Carpetas analizadas a la vez en modo recursivo
+    "watch_debounce_seconds": 2.0, # Tiempo sin cambios antes de mover un archivo vigilado
+    "watch_ignore_suffixes": [".part", ".crdownload", ".download", ".partial", ".opdownload", ".tmp"],
+    "sniff_content": False, # Mirar el contenido (magic bytes) de los archivos que caen en 'Otros'
+    "sniff_cache_size": 50000, # Resultados del análisis de contenido guardados en memoria
+    "metrics_file": None, # Ruta del fichero de métricas para Prometheus (textfile collector), None = no se escribe
+    "metrics_interval_seconds": 15.0, # Cada cuánto se reescribe ese fichero
+    "result_cache_entries": 128, # Resultados de herramientas de solo lectura guardados en caché
+    "result_cache_bytes": 8 * 1024 * 1024, # Tamaño máximo aproximado de esa caché
+    "http_host": "127.0.0.1", # Dirección del servidor con --transport http (solo local por defecto)
+    "http_port": 8765, # Puerto del servidor con --transport http
+    "http_json_response": False, # Responder con JSON en lugar de streams SSE en modo HTTP
+    "http_allowed_hosts": [], # Nombres o IPs extra aceptados en la cabecera Host (además de localhost y http_host)
+    "rules_reload_seconds": 2.0, # Cada cuánto se comprueba si cambió el fichero de reglas (0 = nunca)
 }
 
+# Tipos MIME detectados por contenido -> categoría ("image/" vale para todo el tipo)
+MIME_CATEGORIES = {
+    "application/pdf": "Documentos",
+    "application/rtf": "Documentos",
+    "text/rtf": "Documentos",
+    "application/msword": "Documentos",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "Documentos",
+    "application/vnd.oasis.opendocument.text": "Documentos",
+    "text/plain": "Documentos",
+    "image/": "Imágenes",
+    "video/": "Videos",
+    "audio/": "Audio",
+    "text/x-python": "Programación",
+    "text/x-script.python": "Programación",
+    "text/html": "Programación",
+    "text/css": "Programación",
+    "text/javascript": "Programación",
+    "application/javascript": "Programación",
+    "text/x-c": "Programación",
+    "text/x-c++": "Programación",
+    "text/x-java": "Programación",
+    "application/zip": "Comprimidos",
+    "application/x-rar": "Comprimidos",
+    "application/vnd.rar": "Comprimidos",
+    "application/x-7z-compressed": "Comprimidos",
+    "application/gzip": "Comprimidos",
+    "application/x-gzip": "Comprimidos",
+    "application/x-tar": "Comprimidos",
+    "application/x-bzip2": "Comprimidos",
+    "application/x-xz": "Comprimidos",
+    "application/x-dosexec": "Ejecutables",
+    "application/x-msdownload": "Ejecutables",
+    "application/x-msi": "Ejecutables",
+    "application/x-executable": "Ejecutables",
+    "application/x-pie-executable": "Ejecutables",
+    "application/vnd.debian.binary-package": "Ejecutables",
+    "application/x-rpm": "Ejecutables",
+    "application/x-apple-diskimage": "Ejecutables",
+    "application/vnd.ms-excel": "Hojas de cálculo",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "Hojas de cálculo",
+    "application/vnd.oasis.opendocument.spreadsheet": "Hojas de cálculo",
+    "text/csv": "Hojas de cálculo",
+}
+
+def compile_suffix_map(organization: dict) -> Mapping[str, str]:
+    """
+    Compila las reglas de organización en un mapa extensión -> categoría
+
+    Args:
+        organization (dict): Reglas con el formato de FILE_ORGANIZATION
+
+    Returns:
+        Mapping[str, str]: Mapa inmutable con las extensiones en minúsculas
+    """
+    suffix_map = {}
+    for category, config in organization.items():
+        for extension in config["extensions"]:
+            # Si una extensión aparece en dos categorías, gana la primera
+            suffix_map.setdefault(extension.lower(), category)
+    return MappingProxyType(suffix_map)
+
+
+class Rules:
+    """
+    Reglas de clasificación compiladas (no se modifican una vez creadas)
+
+    Al recargar el fichero de reglas se crea un objeto nuevo y se sustituye el
+    anterior en una sola asignación: quien ya tenía las reglas viejas las sigue
+    usando enteras, nunca ve una mezcla de las dos. Lo mismo vale para las
+    opciones: `settings` son las del fichero por encima de las de SETTINGS, y se
+    leen con current_settings()
+    """
+
+    def __init__(
+        self,
+        organization: dict,
+        mime_categories: dict,
+        settings: Optional[dict] = None,
+        source: str = "",
+        rules: Iterable[dict] = ()
+    ):
+        self.organization = MappingProxyType({
+            category: MappingProxyType({
+                "extensions": tuple(config["extensions"]),
+                "description": config.get("description", ""),
+            })
+            for category, config in organization.items()
+        })
+        self.mime_categories = MappingProxyType(dict(mime_categories))
+        # Opciones del fichero y vista de solo lectura de todas las opciones
+        # (las del fichero por encima de las de config.py)
+        self.overrides = MappingProxyType(dict(settings or {}))
+        self.settings = MappingProxyType(ChainMap(self.overrides, SETTINGS))
+        self.source = source
+        self.suffix_map = compile_suffix_map(organization)
+        # Número máximo de partes de una extensión compuesta (".tar.gz" -> 2)
+        self.max_suffix_parts = max((extension.count(".") for extension in self.suffix_map), default=1)
+        rules = list(rules)
+        self.matcher = RuleMatcher(rules)
+        # Categorías de destino: las de extensión y después las que solo salen de reglas
+        self.target_categories = tuple(dict.fromkeys(
+            [*self.organization, *(rule.category for rule in self.matcher.rules)]
+        ))
+        data = json.dumps(
+            [organization, self.mime_categories.copy(), rules], sort_keys=True, ensure_ascii=False
+        )
+        # Huella de lo que decide las categorías (el índice de escaneo solo depende de esto)...
+        self.classification = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        # ...y de todo, opciones incluidas (la caché de resultados depende también de ellas)
+        data = json.dumps([self.classification, self.overrides.copy()], sort_keys=True, ensure_ascii=False)
+        self.fingerprint = hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def _dated(self, fingerprint: str) -> str:
+        """
+        Con reglas de antigüedad un archivo cambia de categoría solo con el paso del
+        tiempo: la huella incluye el día para que el índice y la caché de resultados
+        se renueven (como mucho) una vez al día
+        """
+        if self.matcher.uses_age:
+            return f"{fingerprint}@{date.today().isoformat()}"
+        return fingerprint
+
+    def version(self) -> str:
+        """Huella de los resultados que producen estas reglas y opciones"""
+        return self._dated(self.fingerprint)
+
+    def classification_version(self) -> str:
+        """Huella de las categorías que producen estas reglas (sin las opciones)"""
+        return self._dated(self.classification)
+
+    def classify(self, filename: str) -> Tuple[str, str]:
+        """Igual que classify_filename, con estas reglas"""
+        lowered = filename.lower()
+        category = "Otros"
+        suffix_start = None
+        start = len(filename)
+        for _ in range(self.max_suffix_parts):
+            # Un punto inicial (".bashrc") no marca una extensión
+            start = lowered.rfind(".", 1, start)
+            if start <= 0:
+                break
+            if suffix_start is None:
+                suffix_start = start
+            found = self.suffix_map.get(lowered[start:])
+            if found is not None:
+                category = found
+                suffix_start = start
+        if suffix_start is None:
+            return category, ""
+        return category, filename[suffix_start:]
+
+
+# Reglas de config.py, compiladas una sola vez al importar el módulo
+DEFAULT_RULES = Rules(FILE_ORGANIZATION, MIME_CATEGORIES, source="config.py", rules=CLASSIFICATION_RULES)
+
+# Reglas en vigor (las sustituye set_rules) y reglas fijadas para la llamada en curso
+_active_rules = DEFAULT_RULES
+_pinned_rules: ContextVar[Optional[Rules]] = ContextVar("pinned_rules", default=None)
+
+
+def active_rules() -> Rules:
+    """Últimas reglas cargadas"""
+    return _active_rules
+
+
+def current_rules() -> Rules:
+    """Reglas de la llamada en curso (las fijadas con pinned_rules) o, si no hay, las últimas cargadas"""
+    return _pinned_rules.get() or _active_rules
+
+
+def current_settings() -> Mapping:
+    """
+    Opciones de la llamada en curso: las de las reglas fijadas con pinned_rules
+
+    Las opciones que se pueden recargar se leen siempre así y no de SETTINGS:
+    una recarga a mitad de organize_files no cambia, por ejemplo,
+    create_date_folders entre dos archivos del mismo lote
+    """
+    return current_rules().settings
+
+
+def set_rules(rules: Rules):
+    """Sustituye las reglas en vigor (una sola asignación: atómica para el resto de hilos)"""
+    global _active_rules
+    _active_rules = rules
+
+
+@contextmanager
+def pinned_rules() -> Iterator[Rules]:
+    """
+    Fija las reglas actuales mientras dura el bloque
+
+    Todo lo que se clasifique dentro (también en los hilos lanzados con
+    run_blocking, que copian el contexto) usa las mismas reglas aunque el
+    fichero se recargue a mitad de la llamada
+    """
+    rules = current_rules()
+    token = _pinned_rules.set(rules)
+    try:
+        yield rules
+    finally:
+        _pinned_rules.reset(token)
+
+
+def resolve_roots(requested: Optional[Iterable[str]] = None) -> List[Path]:
+    """
+    Traduce el argumento `roots` de una herramienta a carpetas de DOWNLOADS_FOLDERS
+
+    Cada elemento puede ser la ruta de una carpeta configurada o solo su nombre
+    ("Downloads"); no se aceptan carpetas fuera de la configuración
+
+    Args:
+        requested (list): Carpetas pedidas (por defecto todas las configuradas)
+
+    Returns:
+        List[Path]: Carpetas de entrada, en el orden de la configuración
+
+    Raises:
+        ValueError: Si alguna carpeta pedida no está configurada
+    """
+    if not requested:
+        return list(DOWNLOADS_FOLDERS)
+    by_key = {}
+    for folder in DOWNLOADS_FOLDERS:
+        by_key[os.path.normcase(os.path.abspath(folder))] = folder
+        by_key.setdefault(os.path.normcase(folder.name), folder)
+    selected = set()
+    for name in requested:
+        folder = by_key.get(os.path.normcase(os.path.abspath(os.path.expanduser(name))))
+        if folder is None:
+            folder = by_key.get(os.path.normcase(name))
+        if folder is None:
+            raise ValueError(f"Carpeta no configurada en DOWNLOADS_FOLDERS: {name}")
+        selected.add(folder)
+    return [folder for folder in DOWNLOADS_FOLDERS if folder in selected]
+
+
+def classify_filename(filename: str) -> Tuple[str, str]:
+    """
+    Determina la categoría de un archivo por la extensión conocida más larga
+
+    Así "copia.tar.gz" se reconoce por ".tar.gz" y "script.user.js" por ".user.js";
+    si no hay ninguna extensión conocida se usa la última, como Path.suffix
+
+    Args:
+        filename (str): Nombre del archivo, por ejemplo, copia.tar.gz
+
+    Returns:
+        tuple: (categoría u 'Otros', extensión tal y como aparece en el nombre)
+    """
+    return current_rules().classify(filename)
+
+
+def rule_category(filename: str, size: int, mtime: float) -> Optional[str]:
+    """
+    Categoría de la primera regla ordenada (CLASSIFICATION_RULES) que cumple el archivo
+
+    Args:
+        filename (str): Nombre del archivo
+        size (int): Tamaño en bytes, del stat que ya tiene quien llama
+        mtime (float): Fecha de modificación, del mismo stat
+
+    Returns:
+        str: Categoría (puede ser una subcarpeta, "Documentos/Facturas") o None si ninguna encaja
+    """
+    matcher = current_rules().matcher
+    if not matcher:
+        return None
+    return matcher.match(filename, size, mtime)
+
+
 def get_file_category(file_extension: str)-> str:
     """
     Determina la categoría de un archivo basado en su extensión
@@ -65,20 +405,43 @@ def get_file_category(file_extension: str)-> str:
     Returns:
         str: Nombre de la cateogír o 'Otros' si no coincide
     """
-    file_extension = file_extension.lower()
+    return current_rules().suffix_map.get(file_extension.lower(), "Otros")
+
+def date_folder_name(timestamp: Optional[float] = None) -> str:
+    """Nombre de la subcarpeta por fecha (AAAA-MM, hora local) de un timestamp; sin él, la de hoy"""
+    moment = time.localtime(timestamp)
+    return f"{moment.tm_year}-{moment.tm_mon:02d}"
+
+
+@lru_cache(maxsize=4096)
+def _resolve_target_folder(base_folder: Path, category: str, date_folder: Optional[str]) -> Path:
+    """
+    Carpeta de destino ya resuelta para (carpeta base, categoría, mes)
 
-    for category, config in FILE_ORGANIZATION.items():
-        if file_extension in config["extensions"]:
-            return category
-    return "Otros"
+    Un lote con miles de archivos repartidos en pocos meses construye cada ruta
+    una sola vez; las demás llamadas devuelven el mismo objeto Path
+    """
+    target_folder = base_folder / ORGANIZED_FOLDER_NAME / category
+    if date_folder is not None:
+        target_folder = target_folder / date_folder
+    return target_folder
 
-def get_target_folder(file_path:str, base_folder:str =None)-> str:
+
+def get_target_folder(
+    file_path: Path,
+    base_folder: Optional[Path] = None,
+    category: Optional[str] = None,
+    timestamp: Optional[float] = None
+) -> Path:
     """
         Calcula la carpeta ed desitno para un archivo
 
     Args: 
         file_path (Path): Ruta del archivo
         base_folder (Path): Carpeta base (Por defecto Descargas)
+        category (str): Categoría ya calculada, para no volver a clasificar
+        timestamp (float): Fecha que decide la subcarpeta AAAA-MM (dates.file_date);
+            por defecto, la de hoy
     
     Returns:
         Path: Ruta de la carpeta de destino
@@ -88,15 +451,11 @@ def get_target_folder(file_path:str, base_folder:str =None)-> str:
         base_folder = DOWNLOADS_FOLDER
 
     #Obtener categoría del archivo
-    category = get_file_category(file_path.suffix)
-
-    #Carpeta de categoría
-    target_folder = base_folder/"organizados"/category
-
-    #Si está habilitado, crear subcarpeta por fecha
-    if SETTINGS["create_date_folders"]:
-        import datetime
-        today = datetime.date.today()
-        date_folder = f"{today.year}-{today.month:02d}"
-        target_folder = target_folder/date_folder
-    return target_folder
\ No newline at end of file
+    if category is None:
+        category = classify_filename(file_path.name)[0]
+
+    #Si está habilitado, subcarpeta por fecha dentro de la de categoría
+    date_folder = None
+    if current_settings()["create_date_folders"]:
+        date_folder = date_folder_name(timestamp)
+    return _resolve_target_folder(Path(base_folder), category, date_folder)
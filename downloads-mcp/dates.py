@@ -0,0 +1,182 @@
+"""
+Fecha de cada archivo para las subcarpetas por fecha (organizados/Categoría/AAAA-MM)
+Según SETTINGS["date_folder_source"] se usa la fecha de modificación, la de
+creación o la fecha EXIF de las fotos. La fecha EXIF se lee con Pillow si está
+instalado o, si no, con un lector mínimo de cabeceras JPEG/TIFF, y se guarda
+por (dispositivo, inode, mtime, tamaño) para no releerla
+"""
+
+import struct
+import time
+from functools import lru_cache
+from typing import Optional
+
+from config import current_settings
+
+# Extensiones en las que se busca fecha EXIF
+EXIF_SUFFIXES = {".jpg", ".jpeg", ".tif", ".tiff", ".webp", ".png", ".heic"}
+
+# Bytes de cabecera que lee el lector propio (el bloque EXIF va al principio)
+EXIF_HEADER_BYTES = 64 * 1024
+
+# Etiquetas EXIF: puntero al bloque Exif, DateTimeOriginal, DateTimeDigitized y DateTime
+EXIF_IFD_POINTER = 0x8769
+DATE_TAGS = (0x9003, 0x9004)
+IFD0_DATE_TAG = 0x0132
+
+
+@lru_cache(maxsize=None)
+def _pillow():
+    """Módulo PIL.Image, o None si Pillow no está instalado (se importa la primera vez)"""
+    try:
+        from PIL import Image
+    except ImportError:  # pragma: no cover - depende de la instalación
+        return None
+    return Image
+
+
+def parse_exif_date(value) -> Optional[float]:
+    """Convierte "AAAA:MM:DD HH:MM:SS" (hora local de la cámara) en timestamp"""
+    if isinstance(value, bytes):
+        value = value.decode("ascii", "ignore")
+    if not isinstance(value, str):
+        return None
+    try:
+        return time.mktime(time.strptime(value.strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S"))
+    except (ValueError, OverflowError):
+        # Cámaras sin fecha configurada escriben "0000:00:00 00:00:00"
+        return None
+
+
+def _read_ifd(data: bytes, offset: int, endian: str) -> dict:
+    """Entradas de un IFD de TIFF como {etiqueta: (tipo, número, valor u offset)}"""
+    count, = struct.unpack_from(endian + "H", data, offset)
+    entries = {}
+    for i in range(count):
+        tag, kind, number, value = struct.unpack_from(endian + "HHII", data, offset + 2 + 12 * i)
+        entries[tag] = (kind, number, value)
+    return entries
+
+
+def _ascii_value(data: bytes, entry, endian: str) -> Optional[bytes]:
+    kind, number, value = entry
+    if kind != 2:
+        return None
+    if number <= 4:
+        # Los valores de hasta 4 bytes van dentro de la propia entrada
+        return struct.pack(endian + "I", value)[:number]
+    return data[value:value + number]
+
+
+def _tiff_date(data: bytes) -> Optional[float]:
+    """Fecha EXIF de un bloque TIFF (el contenido del segmento APP1 en un JPEG)"""
+    if data[:2] == b"II":
+        endian = "<"
+    elif data[:2] == b"MM":
+        endian = ">"
+    else:
+        return None
+    try:
+        ifd0 = _read_ifd(data, struct.unpack_from(endian + "I", data, 4)[0], endian)
+        if EXIF_IFD_POINTER in ifd0:
+            exif = _read_ifd(data, ifd0[EXIF_IFD_POINTER][2], endian)
+            for tag in DATE_TAGS:
+                if tag in exif:
+                    found = parse_exif_date(_ascii_value(data, exif[tag], endian))
+                    if found is not None:
+                        return found
+        if IFD0_DATE_TAG in ifd0:
+            return parse_exif_date(_ascii_value(data, ifd0[IFD0_DATE_TAG], endian))
+    except struct.error:
+        # Cabecera truncada o con offsets fuera de lo leído
+        return None
+    return None
+
+
+def _jpeg_date(header: bytes) -> Optional[float]:
+    """Busca el segmento APP1 con EXIF entre los primeros segmentos de un JPEG"""
+    position = 2
+    while position + 4 <= len(header) and header[position] == 0xFF:
+        marker = header[position + 1]
+        length, = struct.unpack_from(">H", header, position + 2)
+        if marker == 0xE1 and header[position + 4:position + 10] == b"Exif\x00\x00":
+            return _tiff_date(header[position + 10:position + 2 + length])
+        if marker == 0xDA:
+            # Empiezan los datos de la imagen: ya no hay más cabeceras
+            return None
+        position += 2 + length
+    return None
+
+
+def _builtin_exif_date(path: str) -> Optional[float]:
+    """Lector propio (sin Pillow) para JPEG y TIFF"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(EXIF_HEADER_BYTES)
+    except OSError:
+        return None
+    if header[:2] == b"\xff\xd8":
+        return _jpeg_date(header)
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return _tiff_date(header)
+    return None
+
+
+def _pillow_exif_date(image_module, path: str) -> Optional[float]:
+    try:
+        with image_module.open(path) as image:
+            exif = image.getexif()
+            details = exif.get_ifd(EXIF_IFD_POINTER)
+            for tag in DATE_TAGS:
+                if tag in details:
+                    found = parse_exif_date(details[tag])
+                    if found is not None:
+                        return found
+            return parse_exif_date(exif.get(IFD0_DATE_TAG))
+    except Exception:
+        # Pillow lanza errores variados con archivos dañados o formatos no soportados
+        return None
+
+
+@lru_cache(maxsize=16384)
+def _exif_date(path: str, device: int, inode: int, mtime: float, size: int) -> Optional[float]:
+    """Fecha EXIF de un archivo; (dispositivo, inode, mtime, tamaño) forman la clave de la caché"""
+    image_module = _pillow()
+    if image_module is not None:
+        return _pillow_exif_date(image_module, path)
+    return _builtin_exif_date(path)
+
+
+def exif_date(record) -> Optional[float]:
+    """Fecha EXIF (toma de la foto) de un FileRecord, o None si no es una imagen o no la tiene"""
+    if record.suffix.lower() not in EXIF_SUFFIXES:
+        return None
+    return _exif_date(record.path, record.device, record.inode, record.mtime, record.size)
+
+
+def file_date(record) -> Optional[float]:
+    """
+    Fecha que decide la subcarpeta AAAA-MM de un archivo, según SETTINGS["date_folder_source"]
+
+    - "mtime": fecha de modificación (la de la descarga en la mayoría de los casos)
+    - "created": fecha de creación donde el sistema la guarda (Windows, macOS);
+      en Linux, la de modificación
+    - "exif": fecha de la foto en imágenes con EXIF; en el resto, la de modificación
+    - "today": el mes en curso (el comportamiento anterior)
+
+    Args:
+        record (FileRecord): Registro del archivo, con su stat ya hecho
+
+    Returns:
+        float: Timestamp, o None para usar la fecha de hoy
+    """
+    source = current_settings()["date_folder_source"]
+    if source == "today":
+        return None
+    if source == "created":
+        return record.created
+    if source == "exif":
+        found = exif_date(record)
+        if found is not None:
+            return found
+    return record.mtime
@@ -0,0 +1,154 @@
+"""
+Búsqueda de archivos duplicados por contenido
+Agrupa primero por tamaño, después por un hash parcial (primer y último bloque)
+y solo calcula el hash completo de los candidatos que siguen empatados
+
+Un mismo archivo cuenta una sola vez por (dispositivo, inodo): si las carpetas
+de entrada se solapan no sale como duplicado de sí mismo, y los enlaces duros
+no se cuentan como espacio recuperable (borrar uno no libera nada)
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from config import current_settings
+from scanner import FileRecord
+
+# Tamaño del bloque que se lee al principio y al final en el hash parcial
+BLOCK_SIZE = 64 * 1024
+# Tamaño de cada lectura del hash completo
+CHUNK_SIZE = 1024 * 1024
+
+
+class DuplicateGroup(NamedTuple):
+    """Archivos con el mismo contenido; el primero es el que se conservaría"""
+    size: int
+    files: List[FileRecord]
+
+    @property
+    def reclaimable(self) -> int:
+        return self.size * (len(self.files) - 1)
+
+
+def partial_hash(record: FileRecord) -> bytes:
+    """Hash del primer y último bloque; para archivos pequeños es el hash completo"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(record.path, "rb") as f:
+        digest.update(f.read(BLOCK_SIZE))
+        if record.size > BLOCK_SIZE:
+            f.seek(max(BLOCK_SIZE, record.size - BLOCK_SIZE))
+            digest.update(f.read(BLOCK_SIZE))
+    return digest.digest()
+
+
+def full_hash(record: FileRecord) -> bytes:
+    """Hash de todo el contenido leyendo por trozos sobre un único buffer"""
+    digest = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(record.path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.digest()
+
+
+def unique_files(records: Iterable[FileRecord]) -> List[FileRecord]:
+    """Un registro por archivo físico (el primero que aparece de cada (dispositivo, inodo))"""
+    seen = set()
+    unique = []
+    for record in records:
+        # Donde el stat no da inodo (0, DirEntry en Windows) se distingue por la ruta
+        key = (record.device, record.inode) if record.inode else os.path.normcase(record.path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(record)
+    return unique
+
+
+def _regroup(
+    groups: Iterable[List[FileRecord]],
+    hasher: Callable[[FileRecord], bytes],
+    executor: ThreadPoolExecutor
+) -> List[List[FileRecord]]:
+    """Divide cada grupo por el hash dado y descarta los que quedan con un solo archivo"""
+    groups = list(groups)
+    candidates = [record for group in groups for record in group]
+
+    def safe_hash(record):
+        try:
+            return hasher(record)
+        except OSError:
+            # Archivo borrado o sin permisos: queda fuera de la comparación
+            return None
+
+    hashes = dict(zip(candidates, executor.map(safe_hash, candidates)))
+
+    result = []
+    for group in groups:
+        by_hash: Dict[bytes, List[FileRecord]] = {}
+        for record in group:
+            digest = hashes[record]
+            if digest is not None:
+                by_hash.setdefault(digest, []).append(record)
+        result.extend(same for same in by_hash.values() if len(same) > 1)
+    return result
+
+
+def find_duplicates(
+    records: Iterable[FileRecord],
+    min_size: int = 1,
+    max_workers: Optional[int] = None
+) -> List[DuplicateGroup]:
+    """
+    Encuentra grupos de archivos con contenido idéntico
+
+    Args:
+        records (Iterable[FileRecord]): Archivos a comparar (se admiten repetidos y enlaces duros)
+        min_size (int): Tamaño mínimo en bytes (por defecto se ignoran los vacíos)
+        max_workers (int): Hilos para calcular hashes (por defecto SETTINGS["hash_workers"])
+
+    Returns:
+        List[DuplicateGroup]: Grupos ordenados por bytes recuperables
+    """
+    by_size: Dict[int, List[FileRecord]] = {}
+    for record in unique_files(records):
+        if record.size >= max(min_size, 1):
+            by_size.setdefault(record.size, []).append(record)
+    groups = [group for group in by_size.values() if len(group) > 1]
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers or current_settings()["hash_workers"],
+        thread_name_prefix="hasher"
+    ) as executor:
+        groups = _regroup(groups, partial_hash, executor)
+        # Si el hash parcial ya cubrió todo el archivo no hace falta el completo
+        small = [group for group in groups if group[0].size <= 2 * BLOCK_SIZE]
+        large = [group for group in groups if group[0].size > 2 * BLOCK_SIZE]
+        groups = small + _regroup(large, full_hash, executor)
+
+    duplicates = [
+        DuplicateGroup(group[0].size, sorted(group, key=lambda r: (r.mtime, r.path)))
+        for group in groups
+    ]
+    duplicates.sort(key=lambda group: group.reclaimable, reverse=True)
+    return duplicates
+
+
+def reclaimable_by_category(groups: Iterable[DuplicateGroup]) -> Dict[str, int]:
+    """
+    Bytes recuperables por categoría, contando cada copia salvo la que se conserva
+
+    Las subcategorías de las reglas ordenadas ("Documentos/Facturas") suman en su
+    categoría principal ("Documentos")
+    """
+    totals: Dict[str, int] = {}
+    for group in groups:
+        for record in group.files[1:]:
+            category = record.category.split("/", 1)[0]
+            totals[category] = totals.get(category, 0) + group.size
+    return totals
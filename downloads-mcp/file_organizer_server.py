@@ -5,25 +5,49 @@ Version sin emojis - compatible con cualquier codificacion
 """
 
 import asyncio
+import contextvars
+import heapq
 import json
 import logging
-import shutil
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 # Importaciones MCP actualizadas
 import mcp.types as types
 from mcp.server import Server
-from pydantic import AnyUrl
 
 from config import (
     DOWNLOADS_FOLDER, 
-    FILE_ORGANIZATION, 
+    ORGANIZED_FOLDER_NAME,
     SETTINGS,
-    get_file_category,
-    get_target_folder
+    current_rules,
+    current_settings,
+    get_target_folder,
+    pinned_rules,
+    resolve_roots
 )
+from dates import file_date
+import journal
+from metrics import METRICS
+from mover import MoveTask, move_files
+from pagination import ResultStore, decode_cursor, encode_cursor, page_size
+from planner import DestinationPlanner
+from result_cache import ResultCache, folder_fingerprint
+from rules_file import RulesFile
+from scanner import (
+    entry_records, list_names, match_entries, scan_files, scan_folder, scan_tree, stat_file, walk
+)
+
+# Módulos que solo usan algunas herramientas (duplicates, watcher, scan_index y
+# http_transport) se importan dentro de ellas: así el arranque no paga hashlib,
+# ctypes, sqlite3 ni starlette hasta que hacen falta
+if TYPE_CHECKING:
+    from watcher import DownloadsWatcher
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -32,9 +56,56 @@ logger = logging.getLogger("file-organizer-mcp")
 # Crear servidor MCP
 server = Server("file-organizer")
 
+# Intervalo mínimo (segundos) entre notificaciones de progreso
+PROGRESS_INTERVAL = 0.25
+
+# Fichero de reglas: se lee antes de crear los pools y cachés, que dependen de SETTINGS,
+# y después se vuelve a comprobar cada rules_reload_seconds
+_rules_file = RulesFile()
+_rules_file.check()
+
+# Movimientos de los últimos lotes de organize_files (simulados o ejecutados), para paginarlos
+_stored_runs = ResultStore()
+
+# Errores incluidos en la respuesta JSON de organize_files (errors_total lleva la cuenta completa)
+MAX_JSON_ERRORS = 100
+
+# Resultados de analyze_downloads y get_file_info (por lotes) mientras no cambie la carpeta
+_result_cache = ResultCache(SETTINGS["result_cache_entries"], SETTINGS["result_cache_bytes"])
+
+# Todo el trabajo con el sistema de archivos se hace en este pool, nunca en el
+# bucle de eventos: así una llamada lenta no bloquea al resto ni a los pings
+IO_WORKERS = SETTINGS["io_workers"]
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="fs-io")
+
+async def run_blocking(func, *args):
+    """Ejecuta una función bloqueante en el pool de E/S y espera su resultado"""
+    loop = asyncio.get_running_loop()
+    # Con el contexto de la llamada: el hilo usa las mismas reglas fijadas con pinned_rules
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_io_executor, context.run, func, *args)
+
+# Argumento común de las herramientas que recorren las carpetas de entrada
+ROOTS_PROPERTY = {
+    "type": "array",
+    "items": {"type": "string"},
+    "description": "Carpetas de entrada a usar, por ruta o nombre (por defecto todas las de DOWNLOADS_FOLDERS)"
+}
+
+# Lista de herramientas: los types.Tool (y la validación de sus esquemas) se
+# construyen en la primera llamada a list_tools y se reutilizan en las siguientes
+_tools: Optional[List[types.Tool]] = None
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """Retorna la lista de herramientas disponibles"""
+    global _tools
+    if _tools is None:
+        _tools = _build_tools()
+    return _tools
+
+def _build_tools() -> list[types.Tool]:
+    """Construye la descripción y el esquema de cada herramienta"""
     return [
         types.Tool(
             name="analyze_downloads",
@@ -46,7 +117,35 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "boolean",
                         "description": "Mostrar detalles de cada archivo",
                         "default": False
-                    }
+                    },
+                    "recursive": {
+                        "type": "boolean",
+                        "description": "Analizar también las subcarpetas, enviando progreso por carpeta",
+                        "default": False
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "Niveles de subcarpetas a analizar en modo recursivo (sin límite si se omite)",
+                        "minimum": 0
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": ["text", "json"],
+                        "description": "Formato del resultado: texto legible o JSON con la lista de archivos paginada",
+                        "default": "text"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor de la página siguiente (campo next_cursor de la respuesta JSON)"
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": "Archivos por página en formato JSON",
+                        "minimum": 1,
+                        "maximum": 1000,
+                        "default": 100
+                    },
+                    "roots": ROOTS_PROPERTY
                 }
             }
         ),
@@ -65,7 +164,25 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "array",
                         "items": {"type": "string"},
                         "description": "Categorías específicas a organizar (opcional)"
-                    }
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": ["text", "json"],
+                        "description": "Formato del resultado: texto legible o JSON con la lista de archivos paginada",
+                        "default": "text"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor de la página siguiente (campo next_cursor de la respuesta JSON)"
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": "Archivos por página en formato JSON",
+                        "minimum": 1,
+                        "maximum": 1000,
+                        "default": 100
+                    },
+                    "roots": ROOTS_PROPERTY
                 }
             }
         ),
@@ -84,16 +201,26 @@ async def handle_list_tools() -> list[types.Tool]:
         ),
         types.Tool(
             name="get_file_info",
-            description="Obtiene información detallada de un archivo específico",
+            description="Obtiene información detallada de un archivo, o una tabla para varios nombres o patrones",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "filename": {
                         "type": "string",
                         "description": "Nombre del archivo a analizar"
-                    }
-                },
-                "required": ["filename"]
+                    },
+                    "filenames": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Varios nombres de archivo a analizar en una sola llamada"
+                    },
+                    "patterns": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Patrones glob (por ejemplo, *.pdf) de los archivos a analizar"
+                    },
+                    "roots": ROOTS_PROPERTY
+                }
             }
         ),
         types.Tool(
@@ -106,6 +233,90 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "boolean",
                         "description": "Simular la limpieza sin eliminar carpetas",
                         "default": True
+                    },
+                    "roots": ROOTS_PROPERTY
+                }
+            }
+        ),
+        types.Tool(
+            name="find_duplicates",
+            description="Busca archivos duplicados por contenido en la carpeta de descargas",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "recursive": {
+                        "type": "boolean",
+                        "description": "Incluir subcarpetas (también las organizadas)",
+                        "default": False
+                    },
+                    "min_size": {
+                        "type": "integer",
+                        "description": "Tamaño mínimo en bytes de los archivos a comparar",
+                        "default": 1
+                    },
+                    "show_details": {
+                        "type": "boolean",
+                        "description": "Mostrar los grupos de duplicados",
+                        "default": False
+                    },
+                    "roots": ROOTS_PROPERTY
+                }
+            }
+        ),
+        types.Tool(
+            name="undo_organize",
+            description="Deshace una ejecución de organize_files devolviendo los archivos a su sitio",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "run_id": {
+                        "type": "string",
+                        "description": "Lote a deshacer (por defecto el último)"
+                    },
+                    "dry_run": {
+                        "type": "boolean",
+                        "description": "Simular sin mover archivos",
+                        "default": True
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="watch_downloads_start",
+            description="Empieza a organizar automáticamente los archivos nuevos de descargas",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "debounce_seconds": {
+                        "type": "number",
+                        "description": "Segundos sin cambios antes de mover un archivo nuevo",
+                        "minimum": 0
+                    },
+                    "roots": ROOTS_PROPERTY
+                }
+            }
+        ),
+        types.Tool(
+            name="watch_downloads_stop",
+            description="Detiene la organización automática de descargas",
+            inputSchema={"type": "object", "properties": {}}
+        ),
+        types.Tool(
+            name="watch_downloads_status",
+            description="Muestra el estado de la organización automática de descargas",
+            inputSchema={"type": "object", "properties": {}}
+        ),
+        types.Tool(
+            name="server_stats",
+            description="Muestra llamadas y latencia (p50/p95/p99) por herramienta y los contadores de disco del servidor",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": ["text", "json"],
+                        "description": "Formato del resultado",
+                        "default": "text"
                     }
                 }
             }
@@ -114,15 +325,89 @@ async def handle_list_tools() -> list[types.Tool]:
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict[str, Any]) -> list[types.TextContent]:
-    """Maneja las llamadas a las herramientas"""
+    """Maneja las llamadas a las herramientas, midiendo su latencia"""
+    start = time.perf_counter()
+    # Los nombres desconocidos se agrupan para no crear una serie por cada uno
+    label = "desconocida"
+    error = True
+    try:
+        # Toda la llamada usa las mismas reglas aunque el fichero se recargue a mitad
+        with pinned_rules() as rules:
+            cache_key = None
+            folders = _cached_folders(name, arguments)
+            if folders is not None:
+                fingerprint = await run_blocking(folder_fingerprint, folders)
+                if fingerprint is not None:
+                    # Con la huella de las reglas: tras una recarga no se sirve nada clasificado con las viejas
+                    cache_key = ResultCache.key(name, arguments, (rules.version(), fingerprint))
+                    cached = _result_cache.get(cache_key)
+                    if cached is not None:
+                        label, error = name, False
+                        return cached
+            
+            result = await _dispatch_tool(name, arguments)
+            if result is None:
+                raise ValueError(f"Herramienta desconocida: {name}")
+            label = name
+            error = bool(result) and result[0].text.startswith("[ERROR]")
+            if cache_key is not None and not error:
+                _result_cache.put(cache_key, result)
+            if name in CACHE_INVALIDATING_TOOLS and not arguments.get("dry_run", True):
+                _result_cache.clear()
+            return result
+    finally:
+        METRICS.observe_tool(label, time.perf_counter() - start, error)
+
+# Herramientas que mueven o borran archivos: si no son simulación, vacían la caché de resultados
+CACHE_INVALIDATING_TOOLS = {"organize_files", "cleanup_empty_folders", "undo_organize"}
+
+def _cached_folders(name: str, arguments: dict[str, Any]) -> Optional[List[str]]:
+    """
+    Carpetas de las que depende el resultado de una llamada cacheable
+
+    Solo se cachean las llamadas cuyo resultado depende únicamente del listado de
+    esas carpetas: analyze_downloads sin recursión y get_file_info por lotes.
+    Un análisis recursivo depende de todo el árbol y un get_file_info de un solo
+    archivo cuesta lo mismo que comprobar la huella
+
+    Returns:
+        list: Carpetas a vigilar, o None si la llamada no se cachea
+    """
+    try:
+        roots = resolve_roots(arguments.get("roots"))
+    except ValueError:
+        return None
+    if name == "analyze_downloads" and not arguments.get("recursive"):
+        return [os.fspath(root) for root in roots]
+    if name == "get_file_info" and (arguments.get("filenames") or arguments.get("patterns")):
+        names = list(arguments.get("filenames") or []) + [arguments.get("filename") or ""]
+        return sorted({
+            os.fspath(root / os.path.dirname(file_name)) for root in roots for file_name in names
+        })
+    return None
+
+async def _dispatch_tool(name: str, arguments: dict[str, Any]) -> Optional[list[types.TextContent]]:
+    """Llama a la herramienta pedida con sus argumentos (None si no existe)"""
     
     if name == "analyze_downloads":
-        return await analyze_downloads(arguments.get("show_details", False))
+        return await analyze_downloads(
+            arguments.get("show_details", False),
+            arguments.get("recursive", False),
+            arguments.get("max_depth"),
+            arguments.get("format", "text"),
+            arguments.get("cursor"),
+            arguments.get("page_size"),
+            arguments.get("roots")
+        )
     
     elif name == "organize_files":
         return await organize_files(
             arguments.get("dry_run", True),
-            arguments.get("categories")
+            arguments.get("categories"),
+            arguments.get("format", "text"),
+            arguments.get("cursor"),
+            arguments.get("page_size"),
+            arguments.get("roots")
         )
     
     elif name == "create_folder_structure":
@@ -131,71 +416,399 @@ async def handle_call_tool(name: str, arguments: dict[str, Any]) -> list[types.T
         )
     
     elif name == "get_file_info":
-        return await get_file_info(arguments["filename"])
+        if not arguments.get("filenames") and not arguments.get("patterns"):
+            if not arguments.get("filename"):
+                return [types.TextContent(
+                    type="text",
+                    text="[ERROR] Indica 'filename', 'filenames' o 'patterns'"
+                )]
+            return await get_file_info(arguments["filename"], arguments.get("roots"))
+        names = list(arguments.get("filenames") or [])
+        if arguments.get("filename"):
+            names.append(arguments["filename"])
+        return await get_files_info(names, arguments.get("patterns") or [], arguments.get("roots"))
     
     elif name == "cleanup_empty_folders":
-        return await cleanup_empty_folders(arguments.get("dry_run", True))
+        return await cleanup_empty_folders(arguments.get("dry_run", True), arguments.get("roots"))
     
-    else:
-        raise ValueError(f"Herramienta desconocida: {name}")
+    elif name == "find_duplicates":
+        return await find_duplicates(
+            arguments.get("recursive", False),
+            arguments.get("min_size", 1),
+            arguments.get("show_details", False),
+            arguments.get("roots")
+        )
+    
+    elif name == "undo_organize":
+        return await undo_organize(
+            arguments.get("run_id"),
+            arguments.get("dry_run", True)
+        )
+    
+    elif name == "watch_downloads_start":
+        return await watch_downloads_start(
+            arguments.get("debounce_seconds"),
+            arguments.get("roots")
+        )
+    
+    elif name == "watch_downloads_stop":
+        return await watch_downloads_stop()
+    
+    elif name == "watch_downloads_status":
+        return await watch_downloads_status()
+    
+    elif name == "server_stats":
+        return await server_stats(arguments.get("format", "text"))
+    
+    return None
+
+def _scan_directory(folder: str, with_details: bool):
+    """
+    Totales de una carpeta (sin bajar a subcarpetas)
 
-async def analyze_downloads(show_details: bool) -> list[types.TextContent]:
-    """Analiza los archivos en la carpeta de descargas"""
+    Returns:
+        tuple: ({categoría: (archivos, bytes)}, {categoría: [(nombre, bytes)]}, subcarpetas)
+    """
+    if current_settings()["use_scan_index"]:
+        import sqlite3
+        from scan_index import StaleRules, get_scan_index
+        
+        index = get_scan_index()
+        try:
+            # Solo se relee la carpeta si cambió desde la última llamada
+            index.refresh_dir(folder)
+            totals = index.category_totals(folder)
+            largest = index.largest_by_category(folder, 5) if with_details else {}
+            return totals, largest, index.subdirs(folder)
+        except StaleRules:
+            # Las reglas se recargaron durante esta llamada: se lee la carpeta sin el índice
+            pass
+        except sqlite3.Error as e:
+            # El índice es compartido entre procesos ("database is locked"): se lee la carpeta sin él
+            logger.warning(f"Índice de análisis no disponible para {folder}: {e}")
+    
+    records, subdirs = scan_folder(folder)
+    files_by_category = {}
+    for record in records:
+        files_by_category.setdefault(record.category, []).append((record.name, record.size))
+    totals = {
+        category: (len(file_list), sum(size for _, size in file_list))
+        for category, file_list in files_by_category.items()
+    }
+    largest = {}
+    if with_details:
+        largest = {
+            category: heapq.nlargest(5, file_list, key=lambda x: x[1])
+            for category, file_list in files_by_category.items()
+        }
+    return totals, largest, subdirs
+
+def _format_totals(categories: dict) -> str:
+    """Resumen corto de totales por categoría para las notificaciones de progreso"""
+    return ", ".join(
+        f"{category}: {count} ({round(size / (1024 * 1024), 2)} MB)"
+        for category, (count, size) in sorted(categories.items())
+    )
+
+async def _send_progress(progress: float, message: str, total: Optional[float] = None):
+    """
+    Envía una notificación de progreso MCP si el cliente pidió progreso
+
+    `progress` tiene que crecer en cada notificación de la misma petición. Con
+    related_request_id, en HTTP la notificación va por el stream de la petición
+    (no por el stream GET general, que muchos clientes ignoran)
+    """
     try:
-        if not DOWNLOADS_FOLDER.exists():
-            return [types.TextContent(
-                type="text",
-                text=f"[ERROR] La carpeta de descargas no existe: {DOWNLOADS_FOLDER}"
-            )]
+        ctx = server.request_context
+    except LookupError:
+        # Llamada directa (demo, benchmarks) sin sesión MCP
+        return
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return
+    await ctx.session.send_progress_notification(
+        token, progress, total=total, message=message, related_request_id=ctx.request_id
+    )
+
+def _files_page(root: str, after: Optional[tuple], limit: int, max_depth: Optional[int]):
+    """
+    Una página del listado de archivos del análisis, ordenado por (carpeta, nombre)
+
+    Returns:
+        tuple: (lista de archivos como dict, clave de la última fila o None si no hay más)
+    """
+    rows = None
+    if current_settings()["use_scan_index"]:
+        import sqlite3
+        from scan_index import get_scan_index
         
-        # Obtener todos los archivos
-        files = [f for f in DOWNLOADS_FOLDER.iterdir() if f.is_file()]
+        index = get_scan_index()
+        try:
+            if index.has_rules(current_rules()):
+                # El análisis acaba de reconciliar cada carpeta: la página sale del índice
+                rows = index.files_page(root, after, limit + 1, max_depth)
+        except sqlite3.Error as e:
+            logger.warning(f"Índice de análisis no disponible para {root}: {e}")
+    if rows is None:
+        # Sin índice (o con reglas recargadas durante la llamada): montículo acotado con las `limit + 1` primeras claves tras el cursor
+        after = tuple(after) if after else ("", "")
+        rows = heapq.nsmallest(
+            limit + 1,
+            (
+                (os.path.dirname(r.path), r.name, r.size, int(r.mtime * 1e9), r.category)
+                for r in scan_tree(root, max_depth)
+                if (os.path.dirname(r.path), r.name) > after
+            ),
+            key=lambda row: (row[0], row[1])
+        )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    files = [
+        {
+            "path": os.path.relpath(os.path.join(folder, name), root),
+            "category": category,
+            "size": size,
+            "modified": datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec="seconds"),
+        }
+        for folder, name, size, mtime_ns, category in rows
+    ]
+    last = [rows[-1][0], rows[-1][1]] if has_more else None
+    return files, last
+
+async def _analysis_files_page(
+    folders: List[str],
+    root_index: int,
+    after: Optional[list],
+    limit: int,
+    max_depth: Optional[int]
+):
+    """
+    Página del listado de archivos recorriendo las carpetas de entrada en orden
+
+    Returns:
+        tuple: (archivos como dict, estado del cursor siguiente o None si no hay más)
+    """
+    files = []
+    while root_index < len(folders) and len(files) < limit:
+        root = folders[root_index]
+        page, last = await run_blocking(_files_page, root, after, limit - len(files), max_depth)
+        for entry in page:
+            entry["root"] = root
+        files.extend(page)
+        if last is not None:
+            return files, {"root": root_index, "after": last}
+        root_index, after = root_index + 1, None
+    if root_index < len(folders):
+        return files, {"root": root_index, "after": None}
+    return files, None
+
+def _analysis_cursor_state(cursor: Optional[str], folders: List[str]) -> dict:
+    """
+    Estado de la página pedida del listado de analyze_downloads
+
+    Raises:
+        ValueError: Si el cursor no es de este listado (otra herramienta, otras carpetas)
+    """
+    if not cursor:
+        return {"root": 0, "after": None}
+    state = decode_cursor(cursor)
+    root, after = state.get("root"), state.get("after", False)
+    if (
+        isinstance(root, bool) or not isinstance(root, int) or not 0 <= root < len(folders)
+        or not (after is None or (
+            isinstance(after, list) and len(after) == 2 and all(isinstance(part, str) for part in after)
+        ))
+    ):
+        raise ValueError(f"Cursor no válido: {cursor}")
+    return state
+
+def _json_content(payload: dict) -> list[types.TextContent]:
+    return [types.TextContent(type="text", text=json.dumps(payload, ensure_ascii=False))]
+
+async def _existing_roots(roots: Optional[List[str]]) -> List[Path]:
+    """Carpetas de entrada pedidas que existen (se comprueban a la vez)"""
+    folders = resolve_roots(roots)
+    exists = await asyncio.gather(*(run_blocking(folder.exists) for folder in folders))
+    return [folder for folder, ok in zip(folders, exists) if ok]
+
+def _missing_roots_error(roots: Optional[List[str]]) -> list[types.TextContent]:
+    folders = ", ".join(str(folder) for folder in resolve_roots(roots))
+    return [types.TextContent(
+        type="text",
+        text=f"[ERROR] La carpeta de descargas no existe: {folders}"
+    )]
+
+def _display_path(path: str, root: str, multiple_roots: bool) -> str:
+    """Ruta relativa a su carpeta de entrada, precedida del nombre de esta si hay varias"""
+    relative = os.path.relpath(path, root)
+    return os.path.join(os.path.basename(root), relative) if multiple_roots else relative
+
+def _root_of(path: str, roots: List[str]) -> str:
+    """Carpeta de entrada que contiene una ruta"""
+    for root in roots:
+        if path.startswith(root + os.sep):
+            return root
+    return roots[0]
+
+async def analyze_downloads(
+    show_details: bool,
+    recursive: bool = False,
+    max_depth: Optional[int] = None,
+    output_format: str = "text",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    roots: Optional[List[str]] = None
+) -> list[types.TextContent]:
+    """Analiza los archivos de las carpetas de descargas"""
+    try:
+        folders = [os.fspath(folder) for folder in await _existing_roots(roots)]
+        if not folders:
+            return _missing_roots_error(roots)
         
-        if not files:
-            return [types.TextContent(
-                type="text",
-                text="[INFO] La carpeta de descargas está vacía"
-            )]
+        if not recursive:
+            max_depth = 0
+        multiple = len(folders) > 1
+        # El cursor se comprueba antes de recorrer nada
+        state = _analysis_cursor_state(cursor, folders) if output_format == "json" else None
         
-        # Analizar por categorías
+        # Totales por categoría: {categoría: (archivos, bytes)}, del conjunto y de cada carpeta
         categories = {}
-        total_size = 0
+        per_root = {root: {"categories": {}, "folders": 0} for root in folders}
+        largest_by_category = {}
+        scanned_folders = 0
+        last_progress = 0.0
+        sent_progress = 0
         
-        for file_path in files:
-            category = get_file_category(file_path.suffix)
-            if category not in categories:
-                categories[category] = []
+        async def visit(root: str, folder: str, depth: int, semaphore: asyncio.Semaphore):
+            nonlocal scanned_folders, last_progress, sent_progress
+            try:
+                async with semaphore:
+                    totals, largest, subdirs = await run_blocking(
+                        _scan_directory, folder, show_details
+                    )
+            except OSError as e:
+                logger.warning(f"No se pudo analizar {folder}: {e}")
+                return
             
-            file_size = file_path.stat().st_size
-            file_info = {
-                "name": file_path.name,
-                "size": file_size,
-                "size_mb": round(file_size / (1024 * 1024), 2),
-                "modified": datetime.fromtimestamp(file_path.stat().st_mtime)
-            }
+            root_totals = per_root[root]
+            for category, (count, size) in totals.items():
+                for target in (categories, root_totals["categories"]):
+                    total_count, total_size = target.get(category, (0, 0))
+                    target[category] = (total_count + count, total_size + size)
+            for category, files in largest.items():
+                if folder != root or multiple:
+                    files = [
+                        (_display_path(os.path.join(folder, name), root, multiple), size)
+                        for name, size in files
+                    ]
+                largest_by_category[category] = heapq.nlargest(
+                    5, largest_by_category.get(category, []) + files, key=lambda x: x[1]
+                )
+            scanned_folders += 1
+            root_totals["folders"] += 1
+            
+            # Totales parciales mientras se recorre el árbol (como mucho cada PROGRESS_INTERVAL)
+            now = time.monotonic()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                sent_progress = scanned_folders
+                await _send_progress(
+                    scanned_folders,
+                    f"{scanned_folders} carpetas analizadas - {_format_totals(categories)}"
+                )
             
-            categories[category].append(file_info)
-            total_size += file_size
+            if max_depth is None or depth < max_depth:
+                await asyncio.gather(*(
+                    visit(root, os.path.join(folder, name), depth + 1, semaphore) for name in subdirs
+                ))
+        
+        # Cada carpeta de entrada se recorre a la vez y con su propio límite de
+        # concurrencia: el tiempo total se acerca al de la más lenta, no a la suma
+        await asyncio.gather(*(
+            visit(root, root, 0, asyncio.Semaphore(current_settings()["scan_workers"])) for root in folders
+        ))
+        if scanned_folders > sent_progress:
+            # El progreso no puede repetirse: si la última parcial ya era el total, no se envía otra
+            await _send_progress(
+                scanned_folders, f"Análisis completado - {_format_totals(categories)}", total=scanned_folders
+            )
+        largest_files = lambda category: largest_by_category.get(category, [])
+        root_total = lambda root: (
+            sum(count for count, _ in per_root[root]["categories"].values()),
+            sum(size for _, size in per_root[root]["categories"].values())
+        )
+        
+        total_files = sum(count for count, _ in categories.values())
+        total_size = sum(size for _, size in categories.values())
+        
+        if output_format == "json":
+            files, next_state = await _analysis_files_page(
+                folders, state["root"], state["after"], page_size(limit), max_depth
+            )
+            summary = {}
+            for category, (count, size) in sorted(categories.items()):
+                summary[category] = {"count": count, "size": size}
+                if show_details:
+                    summary[category]["largest"] = [
+                        {"path": name, "size": file_size} for name, file_size in largest_files(category)
+                    ]
+            roots_summary = {}
+            for root in folders:
+                count, size = root_total(root)
+                roots_summary[root] = {
+                    "scanned_folders": per_root[root]["folders"],
+                    "total_files": count,
+                    "total_size": size,
+                    "categories": {
+                        category: {"count": count, "size": size}
+                        for category, (count, size) in sorted(per_root[root]["categories"].items())
+                    },
+                }
+            return _json_content({
+                "roots": roots_summary,
+                "scanned_folders": scanned_folders,
+                "total_files": total_files,
+                "total_size": total_size,
+                "categories": summary,
+                "files": files,
+                "next_cursor": encode_cursor(next_state) if next_state else None,
+            })
+        
+        if not total_files:
+            return [types.TextContent(
+                type="text",
+                text="[INFO] La carpeta de descargas está vacía"
+            )]
         
         # Generar reporte
         report = f"[ANÁLISIS] Carpeta de descargas\n\n"
-        report += f"Carpeta: {DOWNLOADS_FOLDER}\n"
-        report += f"Total de archivos: {len(files)}\n"
+        if multiple:
+            report += f"Carpetas: {', '.join(folders)}\n"
+        else:
+            report += f"Carpeta: {folders[0]}\n"
+        if recursive:
+            report += f"Carpetas analizadas: {scanned_folders}\n"
+        report += f"Total de archivos: {total_files}\n"
         report += f"Tamaño total: {round(total_size / (1024 * 1024), 2)} MB\n\n"
         
+        if multiple:
+            report += "Por carpeta de entrada:\n"
+            for root in folders:
+                count, size = root_total(root)
+                report += f"• {root}: {count} archivos ({round(size / (1024 * 1024), 2)} MB)\n"
+            report += "\n"
+        
         report += "Distribución por categorías:\n"
-        for category, file_list in sorted(categories.items()):
-            count = len(file_list)
-            category_size = sum(f["size"] for f in file_list)
+        for category, (count, category_size) in sorted(categories.items()):
             category_size_mb = round(category_size / (1024 * 1024), 2)
             
             report += f"• {category}: {count} archivos ({category_size_mb} MB)\n"
             
             if show_details:
-                for file_info in sorted(file_list, key=lambda x: x["size"], reverse=True)[:5]:
-                    report += f"  - {file_info['name']} ({file_info['size_mb']} MB)\n"
-                if len(file_list) > 5:
-                    report += f"  ... y {len(file_list) - 5} archivos más\n"
+                for name, size in largest_files(category):
+                    report += f"  - {name} ({round(size / (1024 * 1024), 2)} MB)\n"
+                if count > 5:
+                    report += f"  ... y {count - 5} archivos más\n"
         
         return [types.TextContent(type="text", text=report)]
         
@@ -206,86 +819,224 @@ async def analyze_downloads(show_details: bool) -> list[types.TextContent]:
             text=f"[ERROR] Error al analizar: {str(e)}"
         )]
 
-async def organize_files(dry_run: bool, categories: Optional[List[str]] = None) -> list[types.TextContent]:
+def _plan_moves(root: Path, categories: Optional[List[str]]):
+    """
+    Calcula el destino de cada archivo de una carpeta de entrada (dentro de ella misma)
+
+    No toca el disco más allá de listar: las carpetas de destino las crea
+    move_files, una vez cada una, antes de mover
+
+    Returns:
+        tuple: (archivos encontrados, lista de MoveTask, errores)
+    """
+    # El filtro de categorías se aplica por nombre, antes de cualquier stat
+    files = list(scan_files(root, categories))
+    planned = []
+    errors = []
+    planner = DestinationPlanner()
+    
+    for record in files:
+        file_path = Path(record.path)
+        try:
+            category = record.category
+            target_folder = get_target_folder(
+                file_path, base_folder=root, category=category, timestamp=file_date(record)
+            )
+            # Nombre único frente a lo que ya hay en destino y a lo ya planificado
+            target_path = planner.reserve(target_folder, record.name, record.suffix)
+            
+            planned.append(MoveTask(
+                record.path, str(target_path), record.size, record.device, category
+            ))
+            
+        except Exception as e:
+            errors.append(f"Error con {file_path.name}: {str(e)}")
+    
+    return len(files), planned, errors
+
+def _task_page(tasks: List[MoveTask], start: int, limit: int):
+    """
+    Una página de movimientos de un lote, en el orden en que se planificaron
+
+    Args:
+        tasks (list): Movimientos del lote
+        start (int): Primer índice de la página
+        limit (int): Movimientos por página
+
+    Returns:
+        tuple: (lista de movimientos como dict, índice de la página siguiente o None)
+    """
+    page = [
+        {
+            "source": task.source,
+            "target": task.target,
+            "category": task.category,
+            "size": task.size,
+        }
+        for task in tasks[start:start + limit]
+    ]
+    return page, start + limit if start + limit < len(tasks) else None
+
+def _done_in_order(planned: List[MoveTask], moved: List[MoveTask]) -> List[MoveTask]:
+    """Movimientos completados en el orden del plan (move_files los da en orden de llegada)"""
+    moved = set(moved)
+    return [task for task in planned if task in moved]
+
+def _stored_run_page(run_id: str, start: int, limit: int):
+    """
+    Página de un lote simulado o ejecutado
+
+    Los movimientos del lote se guardan en memoria al ejecutarlo. Si ya se
+    descartaron, se lee su diario una sola vez y se vuelven a guardar para las
+    páginas siguientes
+    """
+    tasks = _stored_runs.get(run_id)
+    if tasks is None:
+        stored = journal.load_run(run_id)
+        if stored is None:
+            raise ValueError(f"El lote {run_id} ya no está disponible")
+        tasks = [task for i, task in enumerate(stored.tasks) if i in stored.done]
+        _stored_runs.put(tasks, result_id=run_id)
+    return _task_page(tasks, start, limit)
+
+async def organize_files(
+    dry_run: bool,
+    categories: Optional[List[str]] = None,
+    output_format: str = "text",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    roots: Optional[List[str]] = None
+) -> list[types.TextContent]:
     """Organiza los archivos en carpetas por categoría"""
     try:
-        if not DOWNLOADS_FOLDER.exists():
-            return [types.TextContent(
-                type="text",
-                text=f"[ERROR] La carpeta de descargas no existe: {DOWNLOADS_FOLDER}"
-            )]
+        if cursor:
+            # Página siguiente de un lote anterior: no se vuelve a planificar ni mover nada
+            state = decode_cursor(cursor)
+            if not isinstance(state.get("run"), str) or isinstance(state.get("i"), bool) or not isinstance(state.get("i"), int):
+                raise ValueError(f"Cursor no válido: {cursor}")
+            files, next_start = await run_blocking(
+                _stored_run_page, state["run"], state["i"], page_size(limit)
+            )
+            return _json_content({
+                "run_id": state["run"],
+                "files": files,
+                "next_cursor": encode_cursor({"run": state["run"], "i": next_start})
+                if next_start is not None else None,
+            })
+        
+        folders = await _existing_roots(roots)
+        if not folders:
+            return _missing_roots_error(roots)
+        if not dry_run:
+            await _wait_for_resume()
         
-        files = [f for f in DOWNLOADS_FOLDER.iterdir() if f.is_file()]
+        # Cada carpeta de entrada se planifica a la vez; los movimientos van en un solo lote
+        plans = await asyncio.gather(*(
+            run_blocking(_plan_moves, folder, categories) for folder in folders
+        ))
+        files_found = sum(found for found, _, _ in plans)
+        planned = [task for _, root_planned, _ in plans for task in root_planned]
+        errors = [error for _, _, root_errors in plans for error in root_errors]
         
-        if not files:
+        if not files_found:
             return [types.TextContent(
                 type="text",
                 text="[INFO] No hay archivos para organizar"
             )]
         
-        moved_files = []
-        errors = []
+        move_report = None
+        run_id = None
+        if dry_run:
+            moved_files = planned
+        elif current_settings()["log_operations"] and planned:
+            # Con diario: se puede reanudar si el servidor se cae y deshacer con undo_organize
+            move_report, run_id = await run_blocking(journal.run_journaled, planned)
+            moved_files = _done_in_order(planned, move_report.moved)
+            # Las páginas siguientes salen de memoria sin releer el diario
+            _stored_runs.put(moved_files, result_id=run_id)
+            errors.extend(move_report.errors)
+        else:
+            # Los movimientos van a un pool de hilos para no bloquear el servidor
+            move_report = await run_blocking(move_files, planned)
+            moved_files = move_report.moved
+            errors.extend(move_report.errors)
         
-        for file_path in files:
-            try:
-                category = get_file_category(file_path.suffix)
-                
-                # Filtrar por categorías si se especificaron
-                if categories and category not in categories:
-                    continue
-                
-                target_folder = get_target_folder(file_path)
-                target_path = target_folder / file_path.name
-                
-                # Verificar si el archivo ya existe en destino
-                if target_path.exists():
-                    # Generar nombre único
-                    counter = 1
-                    stem = file_path.stem
-                    suffix = file_path.suffix
-                    while target_path.exists():
-                        new_name = f"{stem}_{counter}{suffix}"
-                        target_path = target_folder / new_name
-                        counter += 1
-                
-                if not dry_run:
-                    # Crear carpeta si no existe
-                    target_folder.mkdir(parents=True, exist_ok=True)
-                    
-                    # Mover archivo
-                    shutil.move(str(file_path), str(target_path))
-                
-                moved_files.append({
-                    "original": str(file_path),
-                    "target": str(target_path),
-                    "category": category
-                })
-                
-            except Exception as e:
-                errors.append(f"Error con {file_path.name}: {str(e)}")
+        # Recuento por carpeta de entrada: {carpeta: [encontrados, procesados]}
+        root_names = [os.fspath(folder) for folder in folders]
+        by_root = {root: [found, 0] for root, (found, _, _) in zip(root_names, plans)}
+        for task in moved_files:
+            by_root[_root_of(task.source, root_names)][1] += 1
+        
+        if output_format == "json":
+            if run_id is None:
+                run_id = _stored_runs.put(moved_files)
+            files, next_start = _task_page(moved_files, 0, page_size(limit))
+            by_category = {}
+            for task in moved_files:
+                by_category[task.category] = by_category.get(task.category, 0) + 1
+            payload = {
+                "run_id": run_id,
+                "dry_run": dry_run,
+                "files_found": files_found,
+                "processed": len(moved_files),
+                "categories": by_category,
+                "roots": {
+                    root: {"files_found": found, "processed": processed}
+                    for root, (found, processed) in by_root.items()
+                },
+                "errors": errors[:MAX_JSON_ERRORS],
+                "errors_total": len(errors),
+                "files": files,
+                "next_cursor": encode_cursor({"run": run_id, "i": next_start})
+                if next_start is not None else None,
+            }
+            if move_report is not None:
+                payload["performance"] = {
+                    "files_per_second": round(move_report.files_per_second, 1),
+                    "mb_per_second": round(move_report.mb_per_second, 1),
+                    "renamed": move_report.renamed,
+                    "copied": move_report.copied,
+                    "folders": move_report.folders,
+                    "elapsed": round(move_report.elapsed, 3),
+                }
+            return _json_content(payload)
         
         # Generar reporte
         mode_text = "[SIMULACIÓN]" if dry_run else "[EJECUTADO]"
         report = f"[ORGANIZACIÓN] Archivos - {mode_text}\n\n"
         
         if moved_files:
-            report += f"Archivos procesados: {len(moved_files)}\n\n"
+            report += f"Archivos procesados: {len(moved_files)}\n"
+            if move_report is not None:
+                report += (
+                    f"Rendimiento: {move_report.files_per_second:.1f} archivos/s, "
+                    f"{move_report.mb_per_second:.1f} MB/s "
+                    f"({move_report.renamed} renombrados, {move_report.copied} copiados "
+                    f"en {move_report.elapsed:.2f} s, {move_report.folders} carpetas de destino)\n"
+                )
+            report += "\n"
             
-            # Agrupar por categoría
-            by_category = {}
-            for file_info in moved_files:
-                cat = file_info["category"]
-                if cat not in by_category:
-                    by_category[cat] = []
-                by_category[cat].append(file_info)
+            if len(by_root) > 1:
+                report += "Por carpeta de entrada:\n"
+                for root, (found, processed) in by_root.items():
+                    report += f"• {root}: {processed} de {found} archivos\n"
+                report += "\n"
+            
+            # Agrupar por categoría: solo el recuento y los 3 primeros nombres
+            counts = {}
+            examples = {}
+            for task in moved_files:
+                counts[task.category] = counts.get(task.category, 0) + 1
+                shown = examples.setdefault(task.category, [])
+                if len(shown) < 3:
+                    shown.append(os.path.basename(task.source))
             
-            for category, files_in_cat in by_category.items():
-                report += f"{category} ({len(files_in_cat)} archivos):\n"
-                for file_info in files_in_cat[:3]:  # Mostrar solo los primeros 3
-                    original_name = Path(file_info["original"]).name
-                    report += f"  • {original_name}\n"
-                if len(files_in_cat) > 3:
-                    report += f"  ... y {len(files_in_cat) - 3} archivos más\n"
+            for category, count in counts.items():
+                report += f"{category} ({count} archivos):\n"
+                for name in examples[category]:
+                    report += f"  • {name}\n"
+                if count > 3:
+                    report += f"  ... y {count - 3} archivos más\n"
                 report += "\n"
         
         if errors:
@@ -298,6 +1049,9 @@ async def organize_files(dry_run: bool, categories: Optional[List[str]] = None)
         if dry_run and moved_files:
             report += "\n[TIP] Para ejecutar realmente, usa dry_run: false"
         
+        if run_id is not None:
+            report += f"\n[TIP] Lote {run_id}: para deshacerlo, usa undo_organize"
+        
         return [types.TextContent(type="text", text=report)]
         
     except Exception as e:
@@ -307,18 +1061,29 @@ async def organize_files(dry_run: bool, categories: Optional[List[str]] = None)
             text=f"[ERROR] Error al organizar: {str(e)}"
         )]
 
+def _create_category_folders(organized_path: Path) -> List[str]:
+    """Crea una carpeta por categoría y devuelve la lista para el reporte"""
+    created_folders = []
+    existing = list_names(organized_path)
+    
+    for category in current_rules().target_categories:
+        # Las categorías de las reglas ordenadas pueden ser subcarpetas ("Documentos/Facturas")
+        if category in existing or ("/" in category and (organized_path / category).is_dir()):
+            created_folders.append(f"{category} (ya existía)")
+            continue
+        folder_path = organized_path / category
+        folder_path.mkdir(parents=True, exist_ok=True)
+        METRICS.incr("mkdir_calls")
+        created_folders.append(f"{category}")
+    return created_folders
+
 async def create_folder_structure(base_folder: str) -> list[types.TextContent]:
     """Crea la estructura de carpetas para organización"""
     try:
         base_path = Path(base_folder)
-        organized_path = base_path / "Organizados"
+        organized_path = base_path / ORGANIZED_FOLDER_NAME
         
-        created_folders = []
-        
-        for category, config in FILE_ORGANIZATION.items():
-            folder_path = organized_path / category
-            folder_path.mkdir(parents=True, exist_ok=True)
-            created_folders.append(f"{category}")
+        created_folders = await run_blocking(_create_category_folders, organized_path)
         
         report = f"[ESTRUCTURA] Carpetas creadas\n\n"
         report += f"Ubicación: {organized_path}\n\n"
@@ -336,27 +1101,34 @@ async def create_folder_structure(base_folder: str) -> list[types.TextContent]:
             text=f"[ERROR] Error al crear estructura: {str(e)}"
         )]
 
-async def get_file_info(filename: str) -> list[types.TextContent]:
-    """Obtiene información detallada de un archivo"""
+async def get_file_info(filename: str, roots: Optional[List[str]] = None) -> list[types.TextContent]:
+    """Obtiene información detallada de un archivo (el primero con ese nombre en las carpetas de entrada)"""
     try:
-        file_path = DOWNLOADS_FOLDER / filename
+        folders = resolve_roots(roots)
+        found = await asyncio.gather(*(run_blocking(stat_file, folder / filename) for folder in folders))
+        match = next(((folder, record) for folder, record in zip(folders, found) if record is not None), None)
         
-        if not file_path.exists():
+        if match is None:
             return [types.TextContent(
                 type="text",
                 text=f"[ERROR] Archivo no encontrado: {filename}"
             )]
         
-        stat = file_path.stat()
-        category = get_file_category(file_path.suffix)
-        target_folder = get_target_folder(file_path)
+        root, record = match
+        file_path = Path(record.path)
+        category = record.category
+        # Con date_folder_source="exif" se abre el archivo: fuera del bucle de eventos
+        timestamp = await run_blocking(file_date, record)
+        target_folder = get_target_folder(
+            file_path, base_folder=root, category=category, timestamp=timestamp
+        )
         
         report = f"[ARCHIVO] Información detallada\n\n"
         report += f"Nombre: {file_path.name}\n"
         report += f"Ubicación: {file_path.parent}\n"
         report += f"Categoría: {category}\n"
-        report += f"Tamaño: {round(stat.st_size / (1024 * 1024), 2)} MB\n"
-        report += f"Modificado: {datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}\n"
+        report += f"Tamaño: {round(record.size / (1024 * 1024), 2)} MB\n"
+        report += f"Modificado: {datetime.fromtimestamp(record.mtime).strftime('%Y-%m-%d %H:%M:%S')}\n"
         report += f"Destino sugerido: {target_folder}\n"
         
         return [types.TextContent(type="text", text=report)]
@@ -368,33 +1140,150 @@ async def get_file_info(filename: str) -> list[types.TextContent]:
             text=f"[ERROR] Error al obtener información: {str(e)}"
         )]
 
-async def cleanup_empty_folders(dry_run: bool) -> list[types.TextContent]:
+def _dated_records(entries) -> list:
+    """(FileRecord, fecha de la subcarpeta AAAA-MM) de cada entrada; la fecha puede leer el archivo (EXIF)"""
+    return [(record, file_date(record)) for record in entry_records(entries)]
+
+def _dated_file(path: Path):
+    record = stat_file(path)
+    return None if record is None else (record, file_date(record))
+
+async def _match_root(root: Path, filenames: List[str], patterns: List[str]):
+    """
+    Busca nombres y patrones en una carpeta de entrada
+
+    Returns:
+        tuple: ((FileRecord, fecha) encontrados, nombres exactos que no están en esta carpeta)
+    """
+    entries, missing = await run_blocking(match_entries, root, filenames, patterns)
+    
+    # Los stat (y las fechas) se reparten en trozos que se resuelven a la vez en el
+    # pool de E/S, sin pasar del tamaño real del pool
+    workers = max(1, min(current_settings()["io_workers"], IO_WORKERS))
+    chunks = [entries[i::workers] for i in range(workers) if entries[i::workers]]
+    results = await asyncio.gather(*(run_blocking(_dated_records, chunk) for chunk in chunks))
+    records = [dated for chunk in results for dated in chunk]
+    
+    # Nombres con subcarpeta ("sub/archivo.pdf") no salen en el listado de la raíz
+    nested = [name for name in missing if os.path.dirname(name)]
+    if nested:
+        found = await asyncio.gather(*(run_blocking(_dated_file, root / name) for name in nested))
+        for name, dated in zip(nested, found):
+            if dated is not None:
+                records.append(dated)
+                missing.remove(name)
+    return records, missing
+
+async def get_files_info(
+    filenames: List[str],
+    patterns: List[str],
+    roots: Optional[List[str]] = None
+) -> list[types.TextContent]:
+    """Obtiene en una sola llamada la información de varios archivos, como una tabla"""
+    try:
+        folders = resolve_roots(roots)
+        results = await asyncio.gather(*(_match_root(folder, filenames, patterns) for folder in folders))
+        multiple = len(folders) > 1
+        
+        rows = []
+        missing = None
+        for folder, (records, root_missing) in zip(folders, results):
+            root = os.fspath(folder)
+            rows.extend((_display_path(record.path, root, multiple), record, timestamp) for record, timestamp in records)
+            # Un nombre falta si no está en ninguna carpeta de entrada
+            missing = set(root_missing) if missing is None else missing & set(root_missing)
+        rows.sort(key=lambda row: row[0])
+        missing = [name for name in filenames if name in missing]
+        
+        report = f"[ARCHIVOS] Información de {len(rows)} archivos\n\n"
+        if rows:
+            report += "Nombre | Categoría | Tamaño (MB) | Modificado | Destino sugerido\n"
+            # El destino (relativo a su carpeta de entrada) solo depende de la categoría y el mes
+            targets = {}
+            for name, record, timestamp in rows:
+                target_folder = get_target_folder(
+                    Path(record.path), base_folder=DOWNLOADS_FOLDER, category=record.category,
+                    timestamp=timestamp
+                )
+                if target_folder not in targets:
+                    targets[target_folder] = target_folder.relative_to(DOWNLOADS_FOLDER)
+                modified = datetime.fromtimestamp(record.mtime).strftime('%Y-%m-%d %H:%M')
+                report += (
+                    f"{name} | {record.category} | {record.size / (1024 * 1024):.2f} | "
+                    f"{modified} | {targets[target_folder]}\n"
+                )
+        if missing:
+            report += f"\n[ERROR] No encontrados ({len(missing)}): {', '.join(missing)}\n"
+        
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error obteniendo info de los archivos: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al obtener información: {str(e)}"
+        )]
+
+def _remove_empty_folders(organized_path: Path, dry_run: bool) -> List[Path]:
+    """
+    Busca (y si no es simulación, elimina) las carpetas vacías en una sola pasada
+
+    El recorrido es de abajo arriba: cuando se llega a una carpeta ya se sabe si
+    todas sus subcarpetas se eliminaron, así que una cadena de carpetas que solo
+    contenían carpetas vacías desaparece entera en la misma ejecución
+    """
+    root = os.fspath(organized_path)
+    empty_folders = []
+    # Carpetas eliminadas (o que se eliminarían) pendientes de que las mire su padre
+    removed = set()
+    
+    for folder, dirnames, filenames in walk(root, topdown=False):
+        children = [os.path.join(folder, name) for name in dirnames]
+        is_empty = not filenames and all(child in removed for child in children)
+        removed.difference_update(children)
+        if folder == root or not is_empty:
+            continue
+        if not dry_run:
+            try:
+                os.rmdir(folder)
+            except OSError:
+                # Algo llegó a la carpeta después de listarla
+                continue
+        removed.add(folder)
+        empty_folders.append(Path(folder))
+    return empty_folders
+
+async def cleanup_empty_folders(dry_run: bool, roots: Optional[List[str]] = None) -> list[types.TextContent]:
     """Elimina carpetas vacías"""
     try:
-        organized_path = DOWNLOADS_FOLDER / "Organizados"
+        candidates = [folder / ORGANIZED_FOLDER_NAME for folder in resolve_roots(roots)]
+        exists = await asyncio.gather(*(run_blocking(path.exists) for path in candidates))
+        organized_paths = [path for path, ok in zip(candidates, exists) if ok]
         
-        if not organized_path.exists():
+        if not organized_paths:
             return [types.TextContent(
                 type="text",
-                text="[ERROR] No existe la carpeta 'Organizados'"
+                text=f"[ERROR] No existe la carpeta '{ORGANIZED_FOLDER_NAME}'"
             )]
         
+        # Cada carpeta organizada se limpia a la vez
+        results = await asyncio.gather(*(
+            run_blocking(_remove_empty_folders, path, dry_run) for path in organized_paths
+        ))
+        multiple = len(organized_paths) > 1
         empty_folders = []
-        
-        # Buscar carpetas vacías
-        for folder in organized_path.rglob("*"):
-            if folder.is_dir() and not any(folder.iterdir()):
-                empty_folders.append(folder)
-                if not dry_run:
-                    folder.rmdir()
+        for path, removed in zip(organized_paths, results):
+            for folder in removed:
+                relative = os.path.relpath(folder, path)
+                # Con varias carpetas de entrada se indica de cuál es cada una
+                empty_folders.append(os.path.join(path.parent.name, relative) if multiple else relative)
         
         mode_text = "[SIMULACIÓN]" if dry_run else "[EJECUTADO]"
         report = f"[LIMPIEZA] Carpetas vacías - {mode_text}\n\n"
         
         if empty_folders:
             report += f"Carpetas vacías encontradas: {len(empty_folders)}\n\n"
-            for folder in empty_folders[:10]:  # Mostrar solo las primeras 10
-                relative_path = folder.relative_to(organized_path)
+            for relative_path in empty_folders[:10]:  # Mostrar solo las primeras 10
                 report += f"  • {relative_path}\n"
             if len(empty_folders) > 10:
                 report += f"  ... y {len(empty_folders) - 10} carpetas más\n"
@@ -413,8 +1302,370 @@ async def cleanup_empty_folders(dry_run: bool) -> list[types.TextContent]:
             text=f"[ERROR] Error en limpieza: {str(e)}"
         )]
 
-async def main():
-    """Función principal para ejecutar el servidor"""
+async def find_duplicates(
+    recursive: bool,
+    min_size: int,
+    show_details: bool,
+    roots: Optional[List[str]] = None
+) -> list[types.TextContent]:
+    """Busca archivos duplicados por contenido (también entre distintas carpetas de entrada)"""
+    import duplicates
+    
+    try:
+        folders = await _existing_roots(roots)
+        if not folders:
+            return _missing_roots_error(roots)
+        
+        def scan(folder: Path):
+            return list(scan_tree(folder) if recursive else scan_files(folder))
+        
+        # Cada carpeta se escanea a la vez; el hash se hace sobre todas juntas
+        scanned = await asyncio.gather(*(run_blocking(scan, folder) for folder in folders))
+        records = [record for root_records in scanned for record in root_records]
+        # La lectura y el hash de los archivos van fuera del bucle de eventos
+        groups = await run_blocking(duplicates.find_duplicates, records, min_size)
+        root_names = [os.fspath(folder) for folder in folders]
+        multiple = len(root_names) > 1
+        
+        report = f"[DUPLICADOS] Carpeta de descargas\n\n"
+        if multiple:
+            report += f"Carpetas: {', '.join(root_names)}\n"
+        else:
+            report += f"Carpeta: {root_names[0]}\n"
+        
+        if not groups:
+            report += "[OK] No se encontraron archivos duplicados"
+            return [types.TextContent(type="text", text=report)]
+        
+        by_category = duplicates.reclaimable_by_category(groups)
+        total_reclaimable = sum(by_category.values())
+        report += f"Grupos de duplicados: {len(groups)}\n"
+        report += f"Espacio recuperable: {round(total_reclaimable / (1024 * 1024), 2)} MB\n\n"
+        
+        report += "Espacio recuperable por categoría:\n"
+        for category, size in sorted(by_category.items(), key=lambda x: x[1], reverse=True):
+            report += f"• {category}: {round(size / (1024 * 1024), 2)} MB\n"
+        
+        if show_details:
+            report += "\nGrupos con más espacio recuperable:\n"
+            for group in groups[:10]:  # Mostrar solo los primeros 10
+                report += f"• {len(group.files)} copias de {round(group.size / (1024 * 1024), 2)} MB:\n"
+                for record in group.files:
+                    root = _root_of(record.path, root_names)
+                    report += f"  - {_display_path(record.path, root, multiple)}\n"
+            if len(groups) > 10:
+                report += f"  ... y {len(groups) - 10} grupos más\n"
+        
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error buscando duplicados: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al buscar duplicados: {str(e)}"
+        )]
+
+async def undo_organize(run_id: Optional[str], dry_run: bool) -> list[types.TextContent]:
+    """Deshace un lote de organize_files"""
+    try:
+        if dry_run:
+            original, tasks = await run_blocking(journal.plan_undo, run_id)
+            move_report = None
+        else:
+            await _wait_for_resume()
+            original, move_report = await run_blocking(journal.undo, run_id)
+            tasks = move_report.moved if move_report is not None else []
+        
+        if original is None:
+            target = f"el lote {run_id}" if run_id else "ningún lote"
+            return [types.TextContent(
+                type="text",
+                text=f"[INFO] No hay nada que deshacer para {target}"
+            )]
+        
+        mode_text = "[SIMULACIÓN]" if dry_run else "[EJECUTADO]"
+        report = f"[DESHACER] Lote {original.run_id} - {mode_text}\n\n"
+        report += f"Archivos devueltos a su sitio: {len(tasks)}\n"
+        if move_report is not None:
+            report += (
+                f"Rendimiento: {move_report.files_per_second:.1f} archivos/s, "
+                f"{move_report.mb_per_second:.1f} MB/s\n"
+            )
+        report += "\n"
+        for task in tasks[:5]:  # Mostrar solo los primeros 5
+            report += f"  • {os.path.basename(task.source)} -> {task.target}\n"
+        if len(tasks) > 5:
+            report += f"  ... y {len(tasks) - 5} archivos más\n"
+        
+        if move_report is not None and move_report.errors:
+            report += f"\n[ERRORES] ({len(move_report.errors)}):\n"
+            for error in move_report.errors[:5]:
+                report += f"  • {error}\n"
+            if len(move_report.errors) > 5:
+                report += f"  ... y {len(move_report.errors) - 5} errores más\n"
+        
+        if dry_run and tasks:
+            report += "\n[TIP] Para ejecutar realmente, usa dry_run: false"
+        
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error deshaciendo organización: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al deshacer: {str(e)}"
+        )]
+
+# Vigilancia activa: un DownloadsWatcher (con su propio hilo) por carpeta de entrada
+_watchers: Dict[str, "DownloadsWatcher"] = {}
+
+async def watch_downloads_start(
+    debounce_seconds: Optional[float] = None,
+    roots: Optional[List[str]] = None
+) -> list[types.TextContent]:
+    """Arranca la vigilancia de las carpetas de descargas"""
+    from watcher import DownloadsWatcher
+    
+    try:
+        folders = await _existing_roots(roots)
+        if not folders:
+            return _missing_roots_error(roots)
+        
+        started = []
+        for folder in folders:
+            key = os.fspath(folder)
+            watcher = _watchers.get(key)
+            if watcher is not None and watcher.running:
+                continue
+            watcher = _watchers[key] = DownloadsWatcher(folder, debounce_seconds)
+            await run_blocking(watcher.start)
+            started.append(watcher)
+        
+        if not started:
+            return [types.TextContent(
+                type="text",
+                text="[INFO] La vigilancia de descargas ya está activa"
+            )]
+        
+        report = f"[VIGILANCIA] Activada\n\n"
+        for watcher in started:
+            report += f"Carpeta: {watcher.folder}\n"
+            report += f"Método: {watcher.backend}\n"
+            report += f"Espera antes de mover: {watcher.debounce} s\n\n"
+        report += "[TIP] Los archivos que ya estaban se organizan con organize_files"
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error iniciando vigilancia: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al iniciar la vigilancia: {str(e)}"
+        )]
+
+async def watch_downloads_stop() -> list[types.TextContent]:
+    """Detiene la vigilancia de todas las carpetas de descargas"""
+    try:
+        running = [watcher for watcher in _watchers.values() if watcher.running]
+        if not running:
+            return [types.TextContent(
+                type="text",
+                text="[INFO] La vigilancia de descargas no está activa"
+            )]
+        
+        await asyncio.gather(*(run_blocking(watcher.stop) for watcher in running))
+        
+        report = f"[VIGILANCIA] Detenida\n\n"
+        for watcher in running:
+            report += f"Archivos organizados en {watcher.folder}: {watcher.moved}\n"
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error deteniendo vigilancia: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al detener la vigilancia: {str(e)}"
+        )]
+
+async def watch_downloads_status() -> list[types.TextContent]:
+    """Muestra el estado de la vigilancia de cada carpeta de descargas"""
+    try:
+        if not _watchers:
+            return [types.TextContent(
+                type="text",
+                text="[INFO] La vigilancia de descargas no se ha iniciado"
+            )]
+        
+        report = f"[VIGILANCIA] Estado\n"
+        for watcher in _watchers.values():
+            status = watcher.status()
+            report += "\n"
+            report += f"Carpeta: {status['folder']}\n"
+            report += f"Activa: {'sí' if status['running'] else 'no'}\n"
+            report += f"Método: {status['backend']}\n"
+            report += f"Desde: {datetime.fromtimestamp(status['started_at']).strftime('%Y-%m-%d %H:%M:%S')}\n"
+            report += f"Archivos organizados: {status['moved']}\n"
+            report += f"Pendientes (esperando a que terminen): {status['pending']}\n"
+            report += f"Descargas en curso ignoradas: {status['skipped']}\n"
+            
+            if status["recent"]:
+                report += "Últimos movimientos:\n"
+                for line in status["recent"]:
+                    report += f"  • {line}\n"
+            
+            if status["errors"]:
+                report += f"[ERRORES] ({len(status['errors'])}):\n"
+                for error in status["errors"]:
+                    report += f"  • {error}\n"
+        
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error consultando vigilancia: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al consultar la vigilancia: {str(e)}"
+        )]
+
+# Nombres legibles de los contadores de METRICS en el reporte de server_stats
+COUNTER_LABELS = {
+    "files_scanned": "Archivos escaneados",
+    "stat_calls": "Llamadas stat",
+    "rename_calls": "Movimientos con rename",
+    "copy_calls": "Movimientos con copia",
+    "mkdir_calls": "Llamadas mkdir",
+    "bytes_moved": "Bytes movidos",
+    "bytes_copied": "Bytes copiados entre dispositivos",
+    "copies_resumed": "Copias reanudadas tras un corte",
+    "cache_hits": "Aciertos de la caché de resultados",
+    "cache_misses": "Fallos de la caché de resultados",
+}
+
+async def server_stats(output_format: str = "text") -> list[types.TextContent]:
+    """Muestra las métricas del servidor desde que arrancó"""
+    try:
+        stats = METRICS.snapshot()
+        stats["result_cache"] = {"entries": len(_result_cache), "bytes": _result_cache.bytes}
+        rules = current_rules()
+        stats["rules"] = {
+            "source": rules.source,
+            "fingerprint": rules.fingerprint,
+            "categories": len(rules.organization),
+            "ordered_rules": len(rules.matcher),
+            "reloads": _rules_file.reloads,
+            "last_error": _rules_file.last_error,
+        }
+        if output_format == "json":
+            return _json_content(stats)
+        
+        report = f"[ESTADÍSTICAS] Servidor\n\n"
+        report += f"Activo desde: {datetime.fromtimestamp(stats['started_at']).strftime('%Y-%m-%d %H:%M:%S')}"
+        report += f" ({stats['uptime_seconds']:.0f} s)\n\n"
+        
+        report += "Herramientas:\n"
+        for name, tool in stats["tools"].items():
+            report += (
+                f"• {name}: {tool['calls']} llamadas ({tool['errors']} errores) - "
+                f"p50 {tool['p50_ms']} ms, p95 {tool['p95_ms']} ms, p99 {tool['p99_ms']} ms\n"
+            )
+        
+        report += "\nContadores:\n"
+        for name, value in stats["counters"].items():
+            if name == "bytes_moved":
+                value = f"{round(value / (1024 * 1024), 2)} MB"
+            report += f"• {COUNTER_LABELS.get(name, name)}: {value}\n"
+        report += (
+            f"• Resultados en caché: {stats['result_cache']['entries']} "
+            f"({round(stats['result_cache']['bytes'] / 1024, 1)} KB)\n"
+        )
+        
+        report += f"\nReglas: {rules.source} ({len(rules.organization)} categorías, "
+        report += f"{len(rules.matcher)} reglas ordenadas, "
+        report += f"{_rules_file.reloads} cargas)\n"
+        if _rules_file.last_error:
+            report += f"[ERROR] Último fichero de reglas no válido: {_rules_file.last_error}\n"
+        
+        return [types.TextContent(type="text", text=report)]
+        
+    except Exception as e:
+        logger.error(f"Error consultando estadísticas: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"[ERROR] Error al consultar las estadísticas: {str(e)}"
+        )]
+
+async def _write_metrics_periodically(path: str, interval: float):
+    """Reescribe el fichero de métricas de Prometheus cada `interval` segundos"""
+    while True:
+        try:
+            await run_blocking(METRICS.write_prometheus, path)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir el fichero de métricas {path}: {e}")
+        await asyncio.sleep(interval)
+
+async def _reload_rules_periodically(interval: float):
+    """Comprueba cada `interval` segundos si cambió el fichero de reglas y lo recarga"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # La lectura y la compilación van al pool: el bucle de eventos sigue atendiendo
+            await run_blocking(_rules_file.check)
+        except Exception as e:
+            logger.warning(f"No se pudo comprobar el fichero de reglas: {e}")
+
+# Tarea que termina al arrancar los lotes interrumpidos (la crea main)
+_resume_task: Optional[asyncio.Task] = None
+
+async def _resume_interrupted_runs():
+    """Termina los lotes de organize_files que quedaron a medias y borra los diarios más antiguos"""
+    try:
+        for summary in await run_blocking(journal.resume_interrupted):
+            logger.info(f"Lote reanudado {summary}")
+        removed = await run_blocking(journal.prune_journals)
+        if removed:
+            logger.info(f"Diarios antiguos borrados: {removed}")
+    except Exception as e:
+        logger.error(f"No se pudieron reanudar los lotes interrumpidos: {e}")
+
+async def _wait_for_resume():
+    """Los movimientos nuevos esperan a la reanudación: nunca se mueve el mismo archivo dos veces a la vez"""
+    if _resume_task is not None and not _resume_task.done():
+        await asyncio.shield(_resume_task)
+
+async def main(transport: str = "stdio", host: Optional[str] = None, port: Optional[int] = None):
+    """
+    Función principal para ejecutar el servidor
+
+    Args:
+        transport (str): "stdio" (un proceso por cliente) o "http" (un proceso
+            para todos los clientes, que comparten índice y cachés)
+        host (str): Dirección HTTP en la que escuchar (por defecto SETTINGS["http_host"])
+        port (int): Puerto HTTP (por defecto SETTINGS["http_port"])
+    """
+    global _resume_task
+    # Los lotes que quedaron a medias se terminan en segundo plano: el transporte
+    # arranca a la vez y el cliente no espera a que se lean los diarios
+    _resume_task = asyncio.create_task(_resume_interrupted_runs())
+    
+    if SETTINGS["metrics_file"]:
+        asyncio.create_task(_write_metrics_periodically(
+            SETTINGS["metrics_file"], SETTINGS["metrics_interval_seconds"]
+        ))
+    
+    if SETTINGS["rules_reload_seconds"] > 0:
+        asyncio.create_task(_reload_rules_periodically(SETTINGS["rules_reload_seconds"]))
+    
+    if transport == "http":
+        from http_transport import serve_http
+        
+        await serve_http(
+            server,
+            host or SETTINGS["http_host"],
+            port or SETTINGS["http_port"],
+            SETTINGS["http_json_response"],
+            SETTINGS["http_allowed_hosts"]
+        )
+        return
+    
     # Configurar stdio transport
     from mcp.server.stdio import stdio_server
     
@@ -425,16 +1676,33 @@ async def main():
             server.create_initialization_options()
         )
 
-if __name__ == "__main__":
-    print("[INFO] Iniciando servidor MCP para organización de archivos...")
-    print("[INFO] Conecta desde Claude u otro cliente MCP")
-    print("[INFO] Presiona Ctrl+C para terminar")
+def cli():
+    """Punto de entrada de línea de comandos (lo usan este archivo y main.py)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Servidor MCP para organizar la carpeta de descargas")
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio",
+                        help="stdio (por defecto) o streamable HTTP para varios clientes")
+    parser.add_argument("--host", help="Dirección en la que escuchar con --transport http")
+    parser.add_argument("--port", type=int, help="Puerto en el que escuchar con --transport http")
+    args = parser.parse_args()
+    
+    # Los avisos van a stderr: en modo stdio, stdout es el canal JSON-RPC con el cliente
+    print("[INFO] Iniciando servidor MCP para organización de archivos...", file=sys.stderr)
+    if args.transport == "http":
+        print(f"[INFO] Escuchando en http://{args.host or SETTINGS['http_host']}:{args.port or SETTINGS['http_port']}/mcp", file=sys.stderr)
+    else:
+        print("[INFO] Conecta desde Claude u otro cliente MCP", file=sys.stderr)
+    print("[INFO] Presiona Ctrl+C para terminar", file=sys.stderr)
     
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.transport, args.host, args.port))
     except KeyboardInterrupt:
-        print("\n[INFO] Servidor MCP detenido")
+        print("\n[INFO] Servidor MCP detenido", file=sys.stderr)
     except Exception as e:
-        print(f"[ERROR] Error en servidor MCP: {e}")
+        print(f"[ERROR] Error en servidor MCP: {e}", file=sys.stderr)
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    cli()
\ No newline at end of file
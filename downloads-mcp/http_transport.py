@@ -0,0 +1,126 @@
+"""
+Transporte HTTP (streamable HTTP de MCP) para el servidor de organización
+Un único proceso atiende a varios clientes a la vez y comparte con todos ellos
+el índice de escaneo, las cachés y las métricas, en lugar de arrancar un
+proceso nuevo por cliente como con stdio
+
+starlette y uvicorn llegan como dependencias de `mcp`; se importan aquí dentro
+para que el modo stdio no pague su importación
+"""
+
+import logging
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("file-organizer-mcp")
+
+# Ruta en la que se atienden las peticiones MCP (la misma que usa FastMCP)
+MCP_PATH = "/mcp"
+
+# Nombres con los que se llega siempre a un servidor local
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+# Direcciones de escucha que no son un nombre con el que llegar al servidor
+WILDCARD_HOSTS = {"0.0.0.0", "::", ""}
+
+
+def security_settings(host: str, port: int, extra_hosts=()):
+    """
+    Protección frente a DNS rebinding: solo se aceptan peticiones cuyo Host (y
+    Origin, si lo hay) sea una dirección conocida del servidor
+
+    Sin ella, una página web cualquiera podría resolver su dominio a 127.0.0.1 y
+    llamar desde el navegador a organize_files o undo_organize
+
+    Args:
+        host (str): Dirección de escucha
+        port (int): Puerto de escucha
+        extra_hosts (Iterable[str]): Otros nombres o IPs con los que se llega al
+            servidor (SETTINGS["http_allowed_hosts"])
+
+    Returns:
+        TransportSecuritySettings: Hosts y orígenes permitidos
+    """
+    from mcp.server.transport_security import TransportSecuritySettings
+
+    names = list(LOCAL_HOSTS)
+    for name in (host, *extra_hosts):
+        if ":" in name and not name.startswith("["):
+            # IPv6 en la cabecera Host va entre corchetes
+            name = f"[{name}]"
+        if name not in WILDCARD_HOSTS and name not in names:
+            names.append(name)
+    allowed_hosts = [f"{name}:{port}" for name in names]
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=allowed_hosts,
+        allowed_origins=[f"{scheme}://{allowed}" for allowed in allowed_hosts for scheme in ("http", "https")],
+    )
+
+
+class _MCPEndpoint:
+    """Aplicación ASGI que pasa cada petición al gestor de sesiones"""
+
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send):
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+def create_app(server, host: str, port: int, json_response: bool = False, extra_hosts=()):
+    """
+    Crea la aplicación Starlette que sirve `server` por streamable HTTP
+
+    Args:
+        server (Server): Servidor MCP de bajo nivel
+        host (str): Dirección de escucha (para validar la cabecera Host)
+        port (int): Puerto de escucha
+        json_response (bool): Responder con JSON en lugar de un stream SSE
+        extra_hosts (Iterable[str]): Otros nombres aceptados en la cabecera Host
+
+    Returns:
+        Starlette: Aplicación ASGI lista para uvicorn
+    """
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    session_manager = StreamableHTTPSessionManager(
+        app=server,
+        json_response=json_response,
+        security_settings=security_settings(host, port, extra_hosts),
+    )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # El gestor de sesiones mantiene las tareas de todas las conexiones abiertas
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[Route(MCP_PATH, endpoint=_MCPEndpoint(session_manager))],
+        lifespan=lifespan,
+    )
+
+
+async def serve_http(server, host: str, port: int, json_response: bool = False, extra_hosts=()):
+    """
+    Sirve `server` por HTTP hasta que se detenga el proceso
+
+    Args:
+        server (Server): Servidor MCP de bajo nivel
+        host (str): Dirección en la que escuchar
+        port (int): Puerto en el que escuchar
+        json_response (bool): Responder con JSON en lugar de un stream SSE
+        extra_hosts (Iterable[str]): Otros nombres aceptados en la cabecera Host
+    """
+    import uvicorn
+
+    config = uvicorn.Config(
+        create_app(server, host, port, json_response, extra_hosts),
+        host=host,
+        port=port,
+        log_level="warning",
+    )
+    logger.info(f"Servidor MCP escuchando en http://{host}:{port}{MCP_PATH}")
+    await uvicorn.Server(config).serve()
@@ -0,0 +1,447 @@
+"""
+Diario de operaciones de organize_files
+Registra en un archivo JSONL de solo añadir los movimientos planificados y los
+completados, para poder reanudar un lote interrumpido y deshacer un lote entero
+
+Mientras un diario está abierto para escribir, el proceso que lo escribe lo
+tiene bloqueado (flock en POSIX, msvcrt.locking en Windows): en modo stdio cada
+cliente arranca su propio servidor, y ninguno reanuda el lote en curso de otro
+"""
+
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import JOURNAL_FOLDER, classify_filename, current_settings
+from mover import MoveTask, move_files
+from planner import DestinationPlanner
+from transfer import has_checkpoint
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+# Bytes del final de un diario que se leen para saber si está cerrado
+TAIL_BYTES = 4096
+
+# Última entrada de un diario cuyo lote terminó ("reverted" se añade tras "commit")
+CLOSED_OPS = {"commit", "reverted"}
+
+
+def _lock(file, blocking: bool = False) -> bool:
+    """
+    Bloqueo exclusivo de un diario abierto (se suelta al cerrarlo)
+
+    Returns:
+        bool: False si otro proceso lo tiene bloqueado (solo sin `blocking`)
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            # Se bloquea el primer byte; en modo "a" las escrituras van igualmente al final
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def _unlock(file):
+    """En Windows las regiones bloqueadas se sueltan antes de cerrar; flock se suelta solo"""
+    if fcntl is None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _last_op(path: Path) -> Optional[str]:
+    """
+    Operación de la última entrada de un diario, leyendo solo su final
+
+    Returns:
+        str: "op" de la última línea, o None si no se puede saber (línea
+            incompleta tras un corte, más larga que TAIL_BYTES o diario ilegible)
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - TAIL_BYTES))
+            tail = f.read()
+    except OSError:
+        return None
+    if not tail.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(tail[:-1].rsplit(b"\n", 1)[-1]).get("op")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _header(path: Path) -> Optional[dict]:
+    """Primera entrada ("run": tipo de lote y lote que deshace) leyendo solo la primera línea"""
+    try:
+        with open(path, "rb") as f:
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def _is_closed(path: Path) -> bool:
+    """Si el lote de un diario terminó, sin leer el diario entero"""
+    return _last_op(path) in CLOSED_OPS
+
+
+class OrganizeJournal:
+    """Diario de un lote de movimientos (una ejecución de organize_files o undo_organize)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.run_id = self.path.stem
+        self.kind = "organize"
+        self.created = None
+        self.reverts = None
+        self.tasks: List[MoveTask] = []
+        self.done: set = set()
+        self.committed = False
+        self.reverted = False
+        self._file = None
+        self._index: Dict[str, int] = {}
+        self._unsynced = 0
+        self._last_sync = 0.0
+
+    # Escritura
+
+    @classmethod
+    def create(cls, tasks: List[MoveTask], kind: str = "organize", reverts: Optional[str] = None) -> "OrganizeJournal":
+        """
+        Crea un diario nuevo con todos los movimientos planificados
+
+        El plan se sincroniza a disco (fsync) antes de devolver, así que ningún
+        archivo se mueve sin que su movimiento quede registrado
+        """
+        folder = Path(JOURNAL_FOLDER)
+        folder.mkdir(parents=True, exist_ok=True)
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        journal = cls(folder / f"{run_id}.jsonl")
+        journal.kind = kind
+        journal.reverts = reverts
+        journal.created = time.time()
+        journal.tasks = list(tasks)
+        journal._index = {task.source: i for i, task in enumerate(journal.tasks)}
+        journal._file = open(journal.path, "a", encoding="utf-8")
+        # Nombre nuevo: nadie más puede tenerlo bloqueado
+        _lock(journal._file, blocking=True)
+        journal._append({
+            "op": "run", "kind": kind, "created": journal.created, "reverts": reverts
+        })
+        for task in journal.tasks:
+            journal._append({"op": "plan", **task._asdict()})
+        journal.sync()
+        return journal
+
+    def _append(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+
+    def sync(self):
+        """Vuelca el diario a disco"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _maybe_sync(self):
+        # fsync por lotes: un fallo puede perder las últimas marcas "done", pero
+        # al reanudar se comprueba en disco si esos archivos ya se movieron
+        settings = current_settings()
+        if (self._unsynced >= settings["journal_sync_every"]
+                or time.monotonic() - self._last_sync >= settings["journal_sync_seconds"]):
+            self.sync()
+
+    def mark_done(self, task: MoveTask):
+        """Registra que un movimiento se completó"""
+        i = self._index[task.source]
+        self.done.add(i)
+        self._append({"op": "done", "i": i})
+        self._maybe_sync()
+
+    def commit(self):
+        """Marca el lote como terminado y cierra el diario"""
+        self._append({"op": "commit"})
+        self.committed = True
+        self.close()
+
+    def mark_reverted(self, undo_run_id: str):
+        """Marca en un diario ya cerrado que su lote se deshizo"""
+        try:
+            # "r+" y no "a": un diario que ya se borró (prune_journals) no se vuelve a crear
+            f = open(self.path, "r+", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            _lock(f, blocking=True)
+            f.seek(0, os.SEEK_END)
+            f.write(json.dumps({"op": "reverted", "by": undo_run_id}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            _unlock(f)
+        self.reverted = True
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            _unlock(self._file)
+            self._file.close()
+            self._file = None
+
+    # Lectura
+
+    @classmethod
+    def load(cls, path: Path) -> "OrganizeJournal":
+        """Lee un diario existente; una última línea incompleta (corte a medias) se ignora"""
+        journal = cls(path)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                op = entry.pop("op")
+                if op == "run":
+                    journal.kind = entry["kind"]
+                    journal.created = entry["created"]
+                    journal.reverts = entry.get("reverts")
+                elif op == "plan":
+                    journal.tasks.append(MoveTask(**entry))
+                elif op == "done":
+                    journal.done.add(entry["i"])
+                elif op == "commit":
+                    journal.committed = True
+                elif op == "reverted":
+                    journal.reverted = True
+        journal._index = {task.source: i for i, task in enumerate(journal.tasks)}
+        return journal
+
+    @classmethod
+    def open_locked(cls, path: Path) -> Optional["OrganizeJournal"]:
+        """
+        Abre un diario para seguir añadiendo entradas, con su bloqueo
+
+        Se lee después de bloquearlo: lo que diga ya no puede cambiar por debajo
+
+        Returns:
+            OrganizeJournal: El diario, o None si otro proceso lo está escribiendo
+        """
+        file = open(path, "a", encoding="utf-8")
+        if not _lock(file):
+            file.close()
+            return None
+        try:
+            journal = cls.load(path)
+        except BaseException:
+            _unlock(file)
+            file.close()
+            raise
+        journal._file = file
+        return journal
+
+
+def journal_paths() -> List[Path]:
+    """Rutas de todos los diarios, del más antiguo al más reciente (el nombre empieza por la fecha)"""
+    folder = Path(JOURNAL_FOLDER)
+    if not folder.exists():
+        return []
+    return sorted(folder.glob("*.jsonl"))
+
+
+def prune_journals(keep: Optional[int] = None) -> int:
+    """
+    Borra los diarios de lotes terminados más antiguos
+
+    Solo se conservan los `keep` más recientes (SETTINGS["journal_keep_runs"];
+    0 = todos). Los lotes sin terminar no se borran nunca: son los que se
+    reanudan. Un lote cuyo diario se borró ya no se puede deshacer
+
+    Returns:
+        int: Diarios borrados
+    """
+    keep = current_settings()["journal_keep_runs"] if keep is None else keep
+    if keep <= 0:
+        return 0
+    closed = [path for path in journal_paths() if _is_closed(path)]
+    removed = 0
+    for path in closed[:-keep]:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                # Un deshacer puede estar añadiendo "reverted" justo ahora
+                if not _lock(f):
+                    continue
+                if fcntl is not None:
+                    os.remove(path)
+                _unlock(f)
+            if fcntl is None:
+                # Windows no borra archivos abiertos
+                os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+def load_run(run_id: str) -> Optional[OrganizeJournal]:
+    """Devuelve el diario de un lote concreto, o None si no existe"""
+    path = Path(JOURNAL_FOLDER) / f"{os.path.basename(run_id)}.jsonl"
+    if not path.exists():
+        return None
+    return OrganizeJournal.load(path)
+
+
+def run_journaled(tasks: List[MoveTask], kind: str = "organize", reverts: Optional[str] = None):
+    """
+    Ejecuta un lote de movimientos registrándolo en un diario
+
+    Returns:
+        tuple: (MoveReport, identificador del lote)
+    """
+    journal = OrganizeJournal.create(tasks, kind, reverts)
+    try:
+        report = move_files(journal.tasks, on_moved=journal.mark_done)
+        journal.commit()
+    finally:
+        journal.close()
+    if reverts is None:
+        # Un deshacer limpia después de marcar el lote original (ver undo)
+        prune_journals()
+    return report, journal.run_id
+
+
+def resume_interrupted() -> List[str]:
+    """
+    Termina los lotes que quedaron a medias (por ejemplo, si el servidor se cerró)
+
+    Para cada movimiento sin marca "done": si el origen sigue ahí y el destino no,
+    se mueve (una copia entre dispositivos sigue desde su último punto de control);
+    si ya está en destino, solo se marca como hecho. Si están los dos y queda el
+    punto de control de una copia terminada, falta borrar el original
+
+    Los diarios terminados se reconocen por su última línea, sin leerlos enteros,
+    y los bloqueados son lotes en curso de otro proceso: no se tocan
+
+    Returns:
+        List[str]: Resumen de cada lote reanudado
+    """
+    summaries = []
+    for path in journal_paths():
+        if _is_closed(path):
+            continue
+        try:
+            journal = OrganizeJournal.open_locked(path)
+        except OSError:
+            continue
+        if journal is None:
+            continue
+        if journal.committed:
+            # Terminó entre la comprobación y el bloqueo
+            journal.close()
+            continue
+        remaining = []
+        try:
+            for i, task in enumerate(journal.tasks):
+                if i in journal.done:
+                    continue
+                if os.path.exists(task.source) and (
+                    not os.path.exists(task.target) or has_checkpoint(task.target)
+                ):
+                    remaining.append(task)
+                elif os.path.exists(task.target) and not os.path.exists(task.source):
+                    journal.mark_done(task)
+            report = move_files(remaining, on_moved=journal.mark_done)
+            journal.commit()
+        finally:
+            journal.close()
+        summaries.append(
+            f"{journal.run_id}: {len(report.moved)} movidos al reanudar, {len(report.errors)} errores"
+        )
+        if journal.kind == "undo" and journal.reverts:
+            _mark_reverted(journal.reverts, journal.run_id)
+    return summaries
+
+
+def _mark_reverted(run_id: str, undo_run_id: str):
+    original = load_run(run_id)
+    if original is not None:
+        original.mark_reverted(undo_run_id)
+
+
+def plan_undo(run_id: Optional[str] = None):
+    """
+    Prepara los movimientos inversos de un lote de organize_files
+
+    Args:
+        run_id (str): Lote a deshacer (por defecto el último que no se haya deshecho)
+
+    Returns:
+        tuple: (diario del lote original, lista de MoveTask inversos), o (None, []) si no hay lote
+    """
+    # Se elige el lote mirando solo la primera y la última línea de cada diario,
+    # del más reciente al más antiguo (un deshacer siempre es posterior a su lote),
+    # y solo se lee entero el elegido
+    undone = set()
+    journal = None
+    for path in reversed(journal_paths()):
+        last_op = _last_op(path)
+        header = _header(path) if last_op == "commit" else None
+        if header is None:
+            # Sin terminar, ya deshecho ("reverted") o ilegible
+            continue
+        if header.get("kind") == "undo":
+            # Un deshacer ya confirmado cuenta aunque no llegara a marcar el lote original
+            undone.add(header.get("reverts"))
+        elif header.get("kind") == "organize" and path.stem not in undone and run_id in (None, path.stem):
+            try:
+                journal = OrganizeJournal.load(path)
+            except OSError:
+                # Borrado por la limpieza de otro proceso
+                continue
+            break
+    if journal is None:
+        return None, []
+
+    planner = DestinationPlanner()
+    tasks = []
+    for i in sorted(journal.done):
+        task = journal.tasks[i]
+        try:
+            device = os.stat(task.target).st_dev
+        except OSError:
+            # Ya no está donde se dejó: no hay nada que devolver
+            continue
+        source_folder, name = os.path.split(task.source)
+        # Si en el sitio original ya hay otro archivo con ese nombre, se usa uno libre
+        original = planner.reserve(source_folder, name, classify_filename(name)[1])
+        tasks.append(MoveTask(task.target, str(original), task.size, device, task.category))
+    return journal, tasks
+
+
+def undo(run_id: Optional[str] = None):
+    """
+    Deshace un lote de organize_files moviendo en paralelo cada archivo a su sitio original
+
+    Returns:
+        tuple: (diario del lote deshecho, MoveReport), o (None, None) si no hay lote
+    """
+    journal, tasks = plan_undo(run_id)
+    if journal is None:
+        return None, None
+    report, undo_run_id = run_journaled(tasks, kind="undo", reverts=journal.run_id)
+    journal.mark_reverted(undo_run_id)
+    prune_journals()
+    return journal, report
@@ -1,6 +1,13 @@
-def main():
-    print("Hello from github-mcp!")
+"""
+Arranque rápido del servidor MCP (mismos argumentos que file_organizer_server.py)
+
+Python nunca guarda en caché el bytecode del script que se ejecuta directamente:
+con `python file_organizer_server.py` el servidor entero se compila en cada
+arranque. Desde aquí se importa como módulo y se carga su .pyc de __pycache__
+"""
+
+from file_organizer_server import cli
 
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,163 @@
+"""
+Métricas del servidor: latencia por herramienta y contadores de trabajo con el disco
+Los histogramas usan cubetas fijas (memoria constante sin importar cuántas
+llamadas haya) y se pueden volcar en formato de texto de Prometheus
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List
+
+# Límites superiores (segundos) de las cubetas de latencia
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+# Contadores conocidos: nombre -> descripción (también la ayuda de Prometheus)
+COUNTERS = {
+    "files_scanned": "Archivos leídos en los escaneos",
+    "stat_calls": "Llamadas stat() al sistema de archivos",
+    "rename_calls": "Movimientos hechos con os.rename",
+    "copy_calls": "Movimientos que necesitaron copiar entre dispositivos",
+    "mkdir_calls": "Llamadas mkdir (aunque la carpeta ya exista)",
+    "bytes_moved": "Bytes movidos por organize_files, undo_organize y la vigilancia",
+    "bytes_copied": "Bytes copiados entre dispositivos (sin lo ya copiado antes de un corte)",
+    "copies_resumed": "Copias entre dispositivos reanudadas desde un punto de control",
+    "cache_hits": "Resultados servidos desde la caché de herramientas",
+    "cache_misses": "Llamadas cacheables que hubo que calcular",
+}
+
+
+class Histogram:
+    """Histograma de cubetas fijas con percentiles aproximados"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # Una cubeta más para lo que supera el último límite (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction: float) -> float:
+        """Percentil interpolando linealmente dentro de la cubeta en la que cae"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+
+class ToolStats:
+    """Llamadas, errores y latencia de una herramienta"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+
+class Metrics:
+    """Registro de métricas del proceso (seguro entre hilos)"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.tools: Dict[str, ToolStats] = {}
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1):
+        """Suma `amount` a un contador"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_tool(self, name: str, seconds: float, error: bool = False):
+        """Registra una llamada a una herramienta"""
+        with self._lock:
+            stats = self.tools.get(name)
+            if stats is None:
+                stats = self.tools[name] = ToolStats()
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            stats.latency.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Copia de las métricas actuales, lista para mostrar o serializar"""
+        with self._lock:
+            tools = {
+                name: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "p50_ms": round(stats.latency.percentile(0.50) * 1000, 2),
+                    "p95_ms": round(stats.latency.percentile(0.95) * 1000, 2),
+                    "p99_ms": round(stats.latency.percentile(0.99) * 1000, 2),
+                    "max_ms": round(stats.latency.max * 1000, 2),
+                }
+                for name, stats in sorted(self.tools.items())
+            }
+            return {
+                "started_at": self.started_at,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "tools": tools,
+                "counters": dict(self.counters),
+            }
+
+    def render_prometheus(self) -> str:
+        """Métricas en formato de texto de Prometheus (para el textfile collector)"""
+        lines: List[str] = []
+        with self._lock:
+            lines.append("# HELP file_organizer_tool_calls_total Llamadas por herramienta")
+            lines.append("# TYPE file_organizer_tool_calls_total counter")
+            for name, stats in sorted(self.tools.items()):
+                lines.append(f'file_organizer_tool_calls_total{{tool="{name}"}} {stats.calls}')
+            lines.append("# HELP file_organizer_tool_errors_total Llamadas que terminaron en error")
+            lines.append("# TYPE file_organizer_tool_errors_total counter")
+            for name, stats in sorted(self.tools.items()):
+                lines.append(f'file_organizer_tool_errors_total{{tool="{name}"}} {stats.errors}')
+            lines.append("# HELP file_organizer_tool_duration_seconds Latencia por herramienta")
+            lines.append("# TYPE file_organizer_tool_duration_seconds histogram")
+            for name, stats in sorted(self.tools.items()):
+                histogram = stats.latency
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(
+                        f'file_organizer_tool_duration_seconds_bucket{{tool="{name}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'file_organizer_tool_duration_seconds_bucket{{tool="{name}",le="+Inf"}} {histogram.count}'
+                )
+                lines.append(f'file_organizer_tool_duration_seconds_sum{{tool="{name}"}} {histogram.total}')
+                lines.append(f'file_organizer_tool_duration_seconds_count{{tool="{name}"}} {histogram.count}')
+            for name, value in self.counters.items():
+                metric = f"file_organizer_{name}_total"
+                lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Escribe el fichero de Prometheus de forma atómica (nunca queda a medio escribir)"""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(temporary, path)
+
+
+# Registro compartido por todo el proceso
+METRICS = Metrics()
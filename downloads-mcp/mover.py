@@ -0,0 +1,245 @@
+"""
+Motor de movimiento de archivos para organize_files
+Crea primero, una sola vez, las carpetas de destino distintas del lote y después
+mueve en paralelo con un número limitado de hilos: os.rename atómico cuando
+origen y destino están en el mismo dispositivo, y copia solo entre dispositivos
+(transfer.copy_move: copia en el kernel, verificada y reanudable)
+"""
+
+import contextvars
+import errno
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from config import current_settings
+from metrics import METRICS
+from transfer import copy_move
+
+
+class MoveTask(NamedTuple):
+    """Un movimiento planificado"""
+    source: str
+    target: str
+    size: int
+    device: int
+    category: str
+
+
+@dataclass
+class MoveReport:
+    """Resultado de un lote de movimientos"""
+    moved: List[MoveTask] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    bytes_moved: int = 0
+    renamed: int = 0
+    copied: int = 0
+    folders: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.moved) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes_moved / (1024 * 1024) / self.elapsed if self.elapsed else 0.0
+
+
+class DeviceCache:
+    """Dispositivo de cada carpeta de destino, consultado una vez por carpeta"""
+
+    def __init__(self):
+        self._devices: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def device_of(self, folder: str) -> int:
+        with self._lock:
+            device = self._devices.get(folder)
+        if device is None:
+            device = os.stat(folder).st_dev
+            METRICS.incr("stat_calls")
+            with self._lock:
+                self._devices[folder] = device
+        return device
+
+    def forget(self, folder: str):
+        """Olvida una carpeta (se borró: la que se cree en su lugar puede estar en otro montaje)"""
+        with self._lock:
+            self._devices.pop(folder, None)
+
+
+def _try_mkdir(folder: str) -> bool:
+    """
+    Un único os.mkdir
+
+    Returns:
+        bool: False si falta la carpeta de encima; True si la carpeta quedó creada,
+            ya existía o falló por otro motivo (el error saldrá al mover cada archivo)
+    """
+    METRICS.incr("mkdir_calls")
+    try:
+        os.mkdir(folder)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _make_tree(folder: str):
+    """Crea una carpeta y las que falten por encima, de arriba abajo"""
+    if _try_mkdir(folder):
+        return
+    parent = os.path.dirname(folder)
+    if parent and parent != folder:
+        _make_tree(parent)
+        _try_mkdir(folder)
+
+
+def create_folders(folders: Iterable[str], executor: ThreadPoolExecutor) -> int:
+    """
+    Crea de antemano las carpetas de destino distintas de un lote
+
+    Se prueba primero cada carpeta final con un solo mkdir (lo normal es que
+    ya exista o que solo falte ella). Solo para las que no tienen carpeta de
+    encima se crean después las superiores, una vez cada una, y se reintenta.
+    Las carpetas de cada fase son independientes y se crean en paralelo
+
+    Args:
+        folders (Iterable[str]): Carpetas de destino (con repeticiones)
+        executor (ThreadPoolExecutor): Pool de hilos del lote
+
+    Returns:
+        int: Carpetas distintas
+    """
+    folders = sorted(set(folders))
+    missing = [folder for folder, done in zip(folders, executor.map(_try_mkdir, folders)) if not done]
+    if missing:
+        parents = sorted({os.path.dirname(folder) for folder in missing})
+        list(executor.map(_make_tree, parents))
+        list(executor.map(_try_mkdir, missing))
+    return len(folders)
+
+
+def ensure_folder(folder: str) -> bool:
+    """
+    Crea una carpeta de destino (y las de encima) si no existe, con un solo mkdir si ya está
+
+    Returns:
+        bool: True si hubo que crearla
+    """
+    METRICS.incr("mkdir_calls")
+    try:
+        os.mkdir(folder)
+    except FileExistsError:
+        return False
+    except FileNotFoundError:
+        os.makedirs(folder, exist_ok=True)
+    return True
+
+
+def move_one(task: MoveTask, devices: DeviceCache) -> bool:
+    """
+    Mueve un archivo eligiendo el camino más barato
+
+    Las carpetas de destino se crean antes de mover, así que cleanup_empty_folders
+    o undo_organize pueden borrarlas mientras siguen vacías. Si falta la carpeta,
+    se vuelve a crear y se reintenta una vez
+
+    Returns:
+        bool: True si se usó os.rename, False si hubo que copiar
+    """
+    try:
+        return _move_one(task, devices)
+    except FileNotFoundError:
+        target_folder = os.path.dirname(task.target)
+        if os.path.isdir(target_folder) or not os.path.exists(task.source):
+            # Lo que falta es el origen, no la carpeta de destino
+            raise
+        devices.forget(target_folder)
+        ensure_folder(target_folder)
+        return _move_one(task, devices)
+
+
+def _move_one(task: MoveTask, devices: DeviceCache) -> bool:
+    target_folder = os.path.dirname(task.target)
+    if devices.device_of(target_folder) == task.device:
+        try:
+            os.rename(task.source, task.target)
+            METRICS.incr("rename_calls")
+            METRICS.incr("bytes_moved", task.size)
+            return True
+        except OSError as e:
+            # Mismo st_dev pero distinto montaje (bind mounts, subvolúmenes)
+            if e.errno != errno.EXDEV:
+                raise
+    copy_move(task.source, task.target)
+    METRICS.incr("copy_calls")
+    METRICS.incr("bytes_moved", task.size)
+    return False
+
+
+def move_files(
+    tasks: Iterable[MoveTask],
+    max_workers: int = None,
+    on_moved: Optional[Callable[[MoveTask], None]] = None
+) -> MoveReport:
+    """
+    Ejecuta un lote de movimientos con un pool de hilos acotado
+
+    Antes de mover se crean las carpetas de destino distintas (create_folders):
+    el trabajo por archivo es solo el rename. Los errores se recogen por archivo
+    y no detienen el resto del lote
+
+    Args:
+        tasks (Iterable[MoveTask]): Movimientos a realizar
+        max_workers (int): Hilos del pool (por defecto SETTINGS["move_workers"])
+        on_moved (Callable): Se llama con cada MoveTask completado, siempre desde
+            el hilo que llamó a move_files (por ejemplo, para el diario)
+
+    Returns:
+        MoveReport: Archivos movidos, errores y rendimiento
+    """
+    max_workers = max_workers or current_settings()["move_workers"]
+    tasks = list(tasks)
+    report = MoveReport()
+    devices = DeviceCache()
+    start = time.perf_counter()
+
+    def record(future, task):
+        try:
+            renamed = future.result()
+        except Exception as e:
+            report.errors.append(f"Error con {os.path.basename(task.source)}: {str(e)}")
+            return
+        report.moved.append(task)
+        report.bytes_moved += task.size
+        if on_moved is not None:
+            on_moved(task)
+        if renamed:
+            report.renamed += 1
+        else:
+            report.copied += 1
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mover") as executor:
+        report.folders = create_folders((os.path.dirname(task.target) for task in tasks), executor)
+        # Nunca más de unas pocas tareas por hilo en vuelo: 50k movimientos no
+        # se convierten en 50k futures en memoria
+        max_pending = max_workers * 4
+        pending = {}
+        for task in tasks:
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future, pending.pop(future))
+            # Con el contexto de quien llama: las copias usan sus mismas opciones (pinned_rules)
+            pending[executor.submit(contextvars.copy_context().run, move_one, task, devices)] = task
+        for future in list(pending):
+            record(future, pending.pop(future))
+
+    report.elapsed = time.perf_counter() - start
+    return report
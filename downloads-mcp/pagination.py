@@ -0,0 +1,72 @@
+"""
+Paginación de los resultados de las herramientas en formato JSON
+Los cursores son opacos para el cliente (JSON en base64) y los resultados que no
+se pueden volver a consultar en disco se guardan en un almacén acotado en memoria
+"""
+
+import base64
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Tamaño de página por defecto y máximo de los listados JSON
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Convierte el estado de la siguiente página en un cursor opaco"""
+    data = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Recupera el estado guardado en un cursor
+
+    Raises:
+        ValueError: Si el cursor no es uno generado por el servidor
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError(f"Cursor no válido: {cursor}")
+    if not isinstance(state, dict):
+        raise ValueError(f"Cursor no válido: {cursor}")
+    return state
+
+
+def page_size(requested: Optional[int]) -> int:
+    """Tamaño de página pedido, acotado a [1, MAX_PAGE_SIZE]"""
+    if not requested:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(requested), MAX_PAGE_SIZE))
+
+
+class ResultStore:
+    """Resultados recientes por identificador; se descartan los más antiguos"""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, List[Any]]" = OrderedDict()
+        # Se usa desde el bucle de eventos y desde los hilos de E/S
+        self._lock = threading.Lock()
+
+    def put(self, items: List[Any], prefix: str = "plan", result_id: Optional[str] = None) -> str:
+        """Guarda un resultado (con un identificador nuevo si no se da uno) y devuelve su identificador"""
+        result_id = result_id or f"{prefix}-{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            self._results[result_id] = items
+            self._results.move_to_end(result_id)
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str) -> Optional[List[Any]]:
+        with self._lock:
+            items = self._results.get(result_id)
+            if items is not None:
+                self._results.move_to_end(result_id)
+        return items
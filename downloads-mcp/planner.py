@@ -0,0 +1,68 @@
+"""
+Planificador de nombres de destino para organize_files
+Lista cada carpeta de destino una sola vez y resuelve las colisiones en memoria,
+teniendo en cuenta también los nombres ya reservados en el mismo lote
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Set, Tuple
+
+from scanner import list_names
+
+
+class DestinationPlanner:
+    """Reserva nombres únicos en las carpetas de destino"""
+
+    def __init__(self):
+        # Nombres ocupados por carpeta (existentes + reservados en este lote)
+        self._taken: Dict[str, Set[str]] = {}
+        # Siguiente contador a probar por (carpeta, raíz, extensión)
+        self._counters: Dict[Tuple[str, str, str], int] = {}
+
+    def _names(self, folder: str) -> Set[str]:
+        names = self._taken.get(folder)
+        if names is None:
+            # En sistemas sin distinción de mayúsculas se compara normalizado
+            names = {os.path.normcase(name) for name in list_names(folder)}
+            self._taken[folder] = names
+        return names
+
+    def reserve(self, folder: Path, name: str, suffix: str = "") -> Path:
+        """
+        Reserva un nombre libre en la carpeta de destino
+
+        Si `name` está ocupado se prueba nombre_1, nombre_2, ... manteniendo la
+        extensión completa (copia.tar.gz -> copia_1.tar.gz)
+
+        Args:
+            folder (Path): Carpeta de destino
+            name (str): Nombre original del archivo
+            suffix (str): Extensión del archivo tal y como aparece en el nombre
+
+        Returns:
+            Path: Ruta de destino reservada
+        """
+        key = os.fspath(folder)
+        names = self._names(key)
+        if os.path.normcase(name) not in names:
+            names.add(os.path.normcase(name))
+            return Path(key) / name
+
+        stem = name[:len(name) - len(suffix)] if suffix else name
+        counter_key = (key, stem, suffix)
+        counter = self._counters.get(counter_key, 1)
+        candidate = f"{stem}_{counter}{suffix}"
+        while os.path.normcase(candidate) in names:
+            counter += 1
+            candidate = f"{stem}_{counter}{suffix}"
+        self._counters[counter_key] = counter + 1
+        names.add(os.path.normcase(candidate))
+        return Path(key) / candidate
+
+    def forget(self, folder: Path):
+        """Olvida lo sabido de una carpeta (se borró y se volvió a crear vacía)"""
+        key = os.fspath(folder)
+        self._taken.pop(key, None)
+        for counter_key in [counter_key for counter_key in self._counters if counter_key[0] == key]:
+            del self._counters[counter_key]
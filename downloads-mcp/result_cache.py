@@ -0,0 +1,82 @@
+"""
+Caché de resultados de las herramientas de solo lectura
+Cada resultado se guarda junto a la huella (inode y mtime) de las carpetas de
+las que depende: si alguna cambia, la clave ya no coincide y se recalcula
+"""
+
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+
+from metrics import METRICS
+
+
+def folder_fingerprint(folders: Iterable[str]) -> Optional[Tuple[Tuple[int, int], ...]]:
+    """
+    Huella de un conjunto de carpetas: (inode, mtime_ns) de cada una
+
+    Returns:
+        tuple: La huella, o None si alguna carpeta no existe o cambió hace tan
+            poco que otro cambio en el mismo instante no alteraría su mtime
+    """
+    # Importación diferida: scan_index arrastra sqlite3 y no hace falta para arrancar
+    from scan_index import RACY_WINDOW_NS
+    
+    fingerprint = []
+    now = time.time_ns()
+    for folder in sorted(folders):
+        try:
+            stat = os.stat(folder)
+        except OSError:
+            return None
+        if now - stat.st_mtime_ns < RACY_WINDOW_NS:
+            return None
+        fingerprint.append((stat.st_ino, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+class ResultCache:
+    """LRU acotado por número de entradas y por tamaño aproximado de los resultados"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[tuple, Tuple[List[Any], int]]" = OrderedDict()
+
+    @staticmethod
+    def key(tool: str, arguments: dict, fingerprint: tuple) -> tuple:
+        return tool, json.dumps(arguments, sort_keys=True, ensure_ascii=False), fingerprint
+
+    def get(self, key: tuple) -> Optional[List[Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            METRICS.incr("cache_misses")
+            return None
+        self._entries.move_to_end(key)
+        METRICS.incr("cache_hits")
+        return entry[0]
+
+    def put(self, key: tuple, result: List[Any]):
+        size = sum(sys.getsizeof(content.text) for content in result)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        self._entries[key] = (result, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def clear(self):
+        """Vacía la caché (después de operaciones que mueven o borran archivos)"""
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
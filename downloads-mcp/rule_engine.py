@@ -0,0 +1,305 @@
+"""
+Reglas de clasificación ordenadas (más allá de la extensión)
+Cada regla combina condiciones sobre la extensión, el tamaño, la antigüedad
+(mtime) y un patrón de nombre; gana la primera regla que cumple el archivo.
+Se evalúan con el stat que el escáner ya tiene, sin llamadas extra
+
+Formato de cada regla (lista CLASSIFICATION_RULES en config.py o [[rules]] en
+el fichero de reglas):
+
+    {"category": "Comprimidos/Grandes", "extensions": [".zip"], "min_size": "1 GB"}
+    {"category": "Documentos/Facturas", "name": ["factura_*", "invoice_*"]}
+    {"category": "Antiguos", "min_age_days": 365}
+
+Para que el coste no crezca con el número de reglas:
+
+- Las reglas con extensión se buscan en un diccionario extensión -> reglas
+- Los patrones de nombre se buscan por su prefijo fijo en otro diccionario, y
+  los que empiezan por un comodín se combinan en una única expresión regular
+  con un grupo por regla (ver RuleMatcher)
+"""
+
+import fnmatch
+import heapq
+import re
+import time
+from operator import attrgetter
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+SECONDS_PER_DAY = 86400
+
+# Unidades de tamaño aceptadas en min_size / max_size (potencias de 1024)
+SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+SIZE_PATTERN = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?b)?\s*", re.IGNORECASE)
+
+_rule_index = attrgetter("index")
+
+RULE_KEYS = {"category", "extensions", "name", "min_size", "max_size", "min_age_days", "max_age_days"}
+
+
+class Rule(NamedTuple):
+    """Regla compilada (index es su posición: menor = más prioridad)"""
+    index: int
+    category: str
+    extensions: Optional[FrozenSet[str]]
+    names: Tuple[str, ...]
+    pattern: Optional["re.Pattern[str]"]
+    min_size: Optional[int]
+    max_size: Optional[int]
+    min_age: Optional[float]
+    max_age: Optional[float]
+
+    def accepts(self, size: int, age: float) -> bool:
+        """Si el tamaño (bytes) y la antigüedad (segundos) están dentro de los rangos de la regla"""
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.min_age is not None and age < self.min_age:
+            return False
+        if self.max_age is not None and age > self.max_age:
+            return False
+        return True
+
+
+def parse_size(value, field: str) -> int:
+    """Convierte 1073741824, "1 GB" o "500MB" en bytes"""
+    if isinstance(value, bool):
+        raise ValueError(f"'{field}' debe ser un número de bytes o un texto como \"1 GB\"")
+    if isinstance(value, int) and value >= 0:
+        return value
+    if isinstance(value, str):
+        match = SIZE_PATTERN.fullmatch(value)
+        if match:
+            number, unit = match.groups()
+            return int(float(number) * SIZE_UNITS[(unit or "b").lower()])
+    raise ValueError(f"'{field}' debe ser un número de bytes o un texto como \"1 GB\"")
+
+
+def _parse_days(value, field: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"'{field}' debe ser un número de días")
+    return float(value) * SECONDS_PER_DAY
+
+
+def _parse_category(value) -> str:
+    """Categoría de destino; admite subcarpetas ("Documentos/Facturas") pero no salir de 'organizados'"""
+    if not isinstance(value, str):
+        raise ValueError("'category' es obligatoria y debe ser un texto")
+    parts = value.replace("\\", "/").split("/")
+    if any(part in ("", ".", "..") or ":" in part for part in parts):
+        raise ValueError(f"'category' no válida: {value!r} (usa nombres como \"Documentos/Facturas\")")
+    return "/".join(parts)
+
+
+def _as_list(value, field: str) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value or not all(isinstance(item, str) and item for item in value):
+        raise ValueError(f"'{field}' debe ser un texto o una lista de textos")
+    return value
+
+
+def compile_rule(index: int, spec: dict) -> Rule:
+    """
+    Valida y compila una regla
+
+    Raises:
+        ValueError: Si la regla tiene claves desconocidas, valores no válidos o ninguna condición
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Regla {index + 1}: debe ser una tabla")
+    unknown = set(spec) - RULE_KEYS
+    if unknown:
+        raise ValueError(f"Regla {index + 1}: claves desconocidas: {', '.join(sorted(unknown))}")
+    if not spec.keys() - {"category"}:
+        raise ValueError(f"Regla {index + 1}: necesita al menos una condición")
+    try:
+        extensions = None
+        if "extensions" in spec:
+            extensions = _as_list(spec["extensions"], "extensions")
+            if not all(extension.startswith(".") for extension in extensions):
+                raise ValueError("'extensions' debe ser una lista de extensiones (\".zip\")")
+            extensions = frozenset(extension.lower() for extension in extensions)
+        names = tuple(_as_list(spec["name"], "name")) if "name" in spec else ()
+        pattern = "|".join(f"(?:{fnmatch.translate(glob)})" for glob in names)
+        rule = Rule(
+            index=index,
+            category=_parse_category(spec.get("category")),
+            extensions=extensions,
+            names=names,
+            pattern=re.compile(pattern, re.IGNORECASE) if pattern else None,
+            min_size=parse_size(spec["min_size"], "min_size") if "min_size" in spec else None,
+            max_size=parse_size(spec["max_size"], "max_size") if "max_size" in spec else None,
+            min_age=_parse_days(spec["min_age_days"], "min_age_days") if "min_age_days" in spec else None,
+            max_age=_parse_days(spec["max_age_days"], "max_age_days") if "max_age_days" in spec else None,
+        )
+    except ValueError as e:
+        raise ValueError(f"Regla {index + 1}: {e}") from None
+    return rule
+
+
+def _literal_prefix(glob: str) -> str:
+    """Parte fija del principio de un patrón glob ("factura_" en "factura_*.pdf")"""
+    end = len(glob)
+    for wildcard in "*?[":
+        position = glob.find(wildcard)
+        if position != -1:
+            end = min(end, position)
+    return glob[:end]
+
+
+def _combine(pattern_rules: List[Rule], positions: Iterable[int]) -> Optional["re.Pattern[str]"]:
+    """Une los patrones de varias reglas en una expresión con un grupo r<posición> por regla"""
+    alternatives = [f"(?P<r{position}>{pattern_rules[position].pattern.pattern})" for position in positions]
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
+
+class RuleMatcher:
+    """
+    Conjunto ordenado de reglas compilado para buscar la primera que encaja
+
+    Las reglas se reparten en tres grupos: con patrón de nombre, solo con
+    extensión (diccionario por extensión) y sin condiciones de nombre (se
+    prueban siempre; suelen ser pocas)
+
+    Los patrones con una parte fija al principio ("factura_*") se buscan por
+    ese prefijo en un diccionario: una consulta por cada longitud de prefijo
+    distinta, no una comparación por patrón. Los que empiezan por un comodín
+    ("*_final.pdf") van juntos en una única expresión regular con un grupo por
+    regla, que dice de una vez cuál es la primera que encaja
+    """
+
+    def __init__(self, specs: Iterable[dict] = ()):
+        self.rules = tuple(compile_rule(index, spec) for index, spec in enumerate(specs))
+        self.uses_age = any(rule.min_age is not None or rule.max_age is not None for rule in self.rules)
+
+        # Reglas con patrón, en orden; en las expresiones combinadas, el grupo r<i> es la i-ésima
+        self._pattern_rules = [rule for rule in self.rules if rule.pattern is not None]
+        self._by_prefix: Dict[str, List[int]] = {}
+        unprefixed = set()
+        for position, rule in enumerate(self._pattern_rules):
+            for glob in rule.names:
+                prefix = _literal_prefix(glob)
+                if prefix and prefix.isascii():
+                    self._by_prefix.setdefault(prefix.lower(), []).append(position)
+                else:
+                    unprefixed.add(position)
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._by_prefix})
+        self._unprefixed = _combine(self._pattern_rules, sorted(unprefixed))
+        # Todos los patrones juntos, para nombres no ASCII (donde cambiar a minúsculas
+        # puede alterar la longitud y el prefijo ya no se compara bien)
+        self._names = _combine(self._pattern_rules, range(len(self._pattern_rules)))
+
+        self._open_rules = [rule for rule in self.rules if rule.pattern is None and rule.extensions is None]
+        keyed: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            if rule.pattern is None and rule.extensions is not None:
+                for extension in rule.extensions:
+                    keyed.setdefault(extension, []).append(rule)
+        # Las reglas sin condiciones de nombre entran en todas las listas por extensión
+        # (ya mezcladas en orden) para no tener que unirlas en cada archivo
+        self._by_suffix = {
+            extension: sorted(rules + self._open_rules, key=_rule_index)
+            for extension, rules in keyed.items()
+        }
+        extensions = [extension for rule in self.rules if rule.extensions for extension in rule.extensions]
+        self._max_suffix_parts = max((extension.count(".") for extension in extensions), default=0)
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _suffixes(self, lowered: str) -> List[str]:
+        """Extensiones del nombre (".gz", ".tar.gz"...) hasta la más larga que usan las reglas"""
+        suffixes = []
+        start = len(lowered)
+        for _ in range(self._max_suffix_parts):
+            # Un punto inicial (".bashrc") no marca una extensión
+            start = lowered.rfind(".", 1, start)
+            if start <= 0:
+                break
+            suffixes.append(lowered[start:])
+        return suffixes
+
+    def _first_pattern(self, filename: str) -> Optional[int]:
+        """Posición de la primera regla con patrón cuyo patrón encaja con el nombre, o None"""
+        if not filename.isascii():
+            match = self._names.match(filename)
+            return int(match.lastgroup[1:]) if match else None
+        first = None
+        if self._unprefixed is not None:
+            match = self._unprefixed.match(filename)
+            if match:
+                first = int(match.lastgroup[1:])
+        positions = []
+        for length in self._prefix_lengths:
+            found = self._by_prefix.get(filename[:length].lower())
+            if found:
+                positions.extend(found)
+        for position in sorted(positions):
+            if first is not None and position >= first:
+                break
+            if self._pattern_rules[position].pattern.match(filename):
+                return position
+        return first
+
+    def _pattern_candidates(self, filename: str, suffixes: List[str], first: int) -> Iterator[Rule]:
+        """Reglas con patrón que encajan con el nombre, en orden y solo según se piden"""
+        for position in range(first, len(self._pattern_rules)):
+            rule = self._pattern_rules[position]
+            # La primera ya se comprobó; las siguientes solo hacen falta si esa falla
+            # por tamaño o antigüedad, y se prueban de una en una
+            if position > first and not rule.pattern.match(filename):
+                continue
+            if rule.extensions is None or not rule.extensions.isdisjoint(suffixes):
+                yield rule
+
+    def candidates(self, filename: str) -> Iterator[Rule]:
+        """
+        Reglas cuyas condiciones de nombre (extensión y patrón) cumple el archivo, en orden
+
+        Faltan por comprobar el tamaño y la antigüedad, que dependen del stat
+        """
+        suffixes = self._suffixes(filename.lower())
+        pools = [self._by_suffix[suffix] for suffix in suffixes if suffix in self._by_suffix]
+        if not pools:
+            pool = self._open_rules
+        elif len(pools) == 1:
+            pool = pools[0]
+        else:
+            # Varias extensiones con reglas (".gz" y ".tar.gz"): sin repetir las comunes
+            pool = sorted({rule.index: rule for rules in pools for rule in rules}.values(), key=_rule_index)
+        first = self._first_pattern(filename) if self._pattern_rules else None
+        if first is None:
+            return iter(pool)
+        return heapq.merge(pool, self._pattern_candidates(filename, suffixes, first), key=_rule_index)
+
+    def may_match(self, filename: str, categories: Iterable[str]) -> bool:
+        """Si alguna regla podría llevar el archivo a una de `categories` (sin mirar el stat)"""
+        return any(rule.category in categories for rule in self.candidates(filename))
+
+    def match(self, filename: str, size: int, mtime: float, now: Optional[float] = None) -> Optional[str]:
+        """
+        Categoría de la primera regla que cumple el archivo
+
+        Args:
+            filename (str): Nombre del archivo
+            size (int): Tamaño en bytes (del stat ya hecho)
+            mtime (float): Fecha de modificación (del stat ya hecho)
+            now (float): Momento de referencia para la antigüedad (por defecto, ahora)
+
+        Returns:
+            str: Categoría de destino, o None si ninguna regla encaja
+        """
+        age = 0.0
+        if self.uses_age:
+            age = (time.time() if now is None else now) - mtime
+        for rule in self.candidates(filename):
+            if rule.accepts(size, age):
+                return rule.category
+        return None
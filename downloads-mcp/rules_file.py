@@ -0,0 +1,208 @@
+"""
+Fichero externo de reglas (TOML o JSON) con recarga en caliente
+Si el fichero cambia, se vuelve a leer, se compila en un objeto Rules nuevo y
+se sustituye el anterior en una sola asignación, sin reiniciar el servidor ni
+perder el índice ni las cachés. Si el fichero tiene errores se siguen usando
+las reglas anteriores
+
+Formato (TOML; en JSON, las mismas claves):
+
+    [categories.Documentos]
+    extensions = [".pdf", ".docx", ".txt"]
+    description = "Archivos de documentos y textos"
+
+    [mime]
+    "application/pdf" = "Documentos"
+
+    [settings]
+    create_date_folders = false
+
+    [[rules]]
+    category = "Comprimidos/Grandes"
+    extensions = [".zip", ".7z"]
+    min_size = "1 GB"
+
+    [[rules]]
+    category = "Documentos/Facturas"
+    name = ["factura_*", "invoice_*"]
+
+`categories` sustituye entero a FILE_ORGANIZATION, `mime` a MIME_CATEGORIES y
+`rules` (reglas ordenadas, ver rule_engine.py) a CLASSIFICATION_RULES; lo que
+no aparece en el fichero se queda como en config.py
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from config import (
+    CLASSIFICATION_RULES, DEFAULT_RULES, FILE_ORGANIZATION, MIME_CATEGORIES, RULES_PATH, SETTINGS, Rules,
+    active_rules, set_rules
+)
+
+logger = logging.getLogger("file-organizer-mcp")
+
+# Valores de SETTINGS antes de aplicar ningún fichero (para restaurarlos si
+# una clave desaparece del fichero)
+_DEFAULT_SETTINGS = dict(SETTINGS)
+
+# Claves de SETTINGS que se leen al arrancar: en el fichero se aceptan, pero solo
+# tienen efecto en el siguiente arranque
+STARTUP_SETTINGS = {
+    "io_workers", "result_cache_entries", "result_cache_bytes", "metrics_file", "metrics_interval_seconds",
+    "http_host", "http_port", "http_json_response", "http_allowed_hosts", "rules_reload_seconds",
+}
+
+# Opciones que solo admiten unos valores concretos: un valor mal escrito se
+# rechaza al cargar el fichero, no al mover el primer archivo
+SETTING_CHOICES = {
+    "date_folder_source": ("mtime", "created", "exif", "today"),
+    "verify_copies": ("size", "checksum"),
+}
+
+
+def _same_type(value, default) -> bool:
+    """Si `value` vale para una opción cuyo valor por defecto es `default`"""
+    if default is None:
+        return True
+    # bool es subclase de int: se comprueba aparte para no aceptar 1 por True
+    if isinstance(default, bool) or isinstance(value, bool):
+        return isinstance(default, bool) and isinstance(value, bool)
+    if isinstance(default, (int, float)):
+        return isinstance(value, (int, float))
+    return isinstance(value, type(default))
+
+
+def parse_rules(data: dict, source: str = "") -> Rules:
+    """
+    Valida el contenido de un fichero de reglas y lo compila
+
+    Raises:
+        ValueError: Si falta algún campo, tiene un tipo incorrecto o un valor no admitido
+    """
+    unknown = set(data) - {"categories", "mime", "settings", "rules"}
+    if unknown:
+        raise ValueError(f"Secciones desconocidas: {', '.join(sorted(unknown))}")
+
+    organization = data.get("categories", FILE_ORGANIZATION)
+    if not isinstance(organization, dict) or not organization:
+        raise ValueError("'categories' debe ser una tabla con al menos una categoría")
+    for category, config in organization.items():
+        extensions = config.get("extensions") if isinstance(config, dict) else None
+        if not isinstance(extensions, list) or not all(
+            isinstance(extension, str) and extension.startswith(".") for extension in extensions
+        ):
+            raise ValueError(f"'{category}': 'extensions' debe ser una lista de extensiones (\".pdf\")")
+
+    mime_categories = data.get("mime", MIME_CATEGORIES)
+    if not isinstance(mime_categories, dict) or not all(
+        isinstance(category, str) for category in mime_categories.values()
+    ):
+        raise ValueError("'mime' debe ser una tabla de tipo MIME -> categoría")
+
+    settings = data.get("settings", {})
+    if not isinstance(settings, dict):
+        raise ValueError("'settings' debe ser una tabla")
+    for key, value in settings.items():
+        if key not in _DEFAULT_SETTINGS:
+            raise ValueError(f"Opción desconocida en 'settings': {key}")
+        if not _same_type(value, _DEFAULT_SETTINGS[key]):
+            raise ValueError(f"'settings.{key}' debe ser de tipo {type(_DEFAULT_SETTINGS[key]).__name__}")
+        if key in SETTING_CHOICES and value not in SETTING_CHOICES[key]:
+            choices = ", ".join(f'"{choice}"' for choice in SETTING_CHOICES[key])
+            raise ValueError(f"'settings.{key}' debe ser uno de {choices} (no {value!r})")
+
+    ordered_rules = data.get("rules", CLASSIFICATION_RULES)
+    if not isinstance(ordered_rules, list):
+        raise ValueError("'rules' debe ser una lista de reglas ([[rules]] en TOML)")
+
+    # Rules compila las reglas ordenadas y lanza ValueError si alguna no es válida
+    return Rules(organization, mime_categories, settings, source, ordered_rules)
+
+
+def load_rules(path: Path) -> Rules:
+    """Lee y compila un fichero de reglas (.json en JSON, cualquier otro en TOML)"""
+    path = Path(path)
+    raw = path.read_bytes()
+    if path.suffix.lower() == ".json":
+        data = json.loads(raw.decode("utf-8"))
+    else:
+        import tomllib
+
+        data = tomllib.loads(raw.decode("utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("El fichero de reglas debe contener una tabla")
+    return parse_rules(data, os.fspath(path))
+
+
+def apply_rules(rules: Rules):
+    """
+    Pone en vigor unas reglas con una sola asignación
+
+    Las opciones del fichero viajan dentro del objeto Rules (current_settings()),
+    así que una llamada en curso conserva las suyas. Solo las que se leen al
+    arrancar se copian en SETTINGS
+    """
+    for key in STARTUP_SETTINGS:
+        SETTINGS[key] = rules.overrides.get(key, _DEFAULT_SETTINGS[key])
+    set_rules(rules)
+
+
+class RulesFile:
+    """Fichero de reglas vigilado por su firma (inode, mtime y tamaño)"""
+
+    def __init__(self, path: Path = RULES_PATH):
+        self.path = Path(path)
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """
+        Recarga las reglas si el fichero cambió desde la última comprobación
+
+        Sin fichero se usan las reglas de config.py. Con un fichero no válido se
+        mantienen las reglas en vigor y el error queda en `last_error`
+
+        Returns:
+            bool: True si se pusieron en vigor reglas nuevas
+        """
+        with self._lock:
+            signature = self._stat_signature()
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            if signature is None:
+                if active_rules() is DEFAULT_RULES:
+                    return False
+                rules = DEFAULT_RULES
+            else:
+                try:
+                    rules = load_rules(self.path)
+                except (OSError, ValueError, UnicodeDecodeError) as e:
+                    # tomllib.TOMLDecodeError y json.JSONDecodeError son ValueError
+                    self.last_error = f"{self.path}: {e}"
+                    logger.warning(f"Fichero de reglas no válido, se mantienen las anteriores: {self.last_error}")
+                    return False
+            ignored = STARTUP_SETTINGS & rules.overrides.keys()
+            if ignored and self.reloads:
+                logger.info(f"Opciones que se aplicarán en el próximo arranque: {', '.join(sorted(ignored))}")
+            apply_rules(rules)
+            self.last_error = None
+            self.reloads += 1
+            logger.info(
+                f"Reglas cargadas desde {rules.source} "
+                f"({len(rules.organization)} categorías, {len(rules.matcher)} reglas ordenadas)"
+            )
+            return True
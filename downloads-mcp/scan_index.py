@@ -0,0 +1,314 @@
+"""
+Índice persistente del escaneo de la carpeta de descargas
+Guarda en SQLite (modo WAL) los archivos de cada carpeta y los totales por categoría,
+de forma que solo se vuelve a leer una carpeta cuando cambia su fecha de modificación
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import INDEX_PATH, Rules, active_rules, classify_filename, pinned_rules, rule_category
+from metrics import METRICS
+from scanner import list_entries
+from sniffer import sniff_category
+
+# Se incrementa al cambiar el esquema: el índice se reconstruye desde cero
+SCHEMA_VERSION = 2
+
+# Si la carpeta se modificó hace menos de esto, su mtime no es fiable
+# (otro cambio en el mismo instante no la alteraría) y se reescanea la próxima vez
+RACY_WINDOW_NS = 2_000_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    scanned_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (dir, name)
+);
+CREATE INDEX IF NOT EXISTS files_by_category ON files (dir, category, size);
+CREATE TABLE IF NOT EXISTS subdirs (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (dir, name)
+);
+CREATE TABLE IF NOT EXISTS category_totals (
+    dir TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (dir, category)
+);
+"""
+
+
+class StaleRules(Exception):
+    """Las reglas de la llamada ya no son las del índice (se recargaron a mitad)"""
+
+
+def rules_fingerprint(rules: Rules) -> str:
+    """Huella de las reglas de clasificación: si cambian, las categorías guardadas no valen"""
+    return f"{SCHEMA_VERSION}:{rules.classification_version()}:{int(bool(rules.settings['sniff_content']))}"
+
+
+def _subtree_bounds(folder: str) -> Tuple[str, str]:
+    """Rango [low, high) de rutas que cuelgan de `folder`, para consultas por prefijo con índice"""
+    return folder + os.sep, folder + chr(ord(os.sep) + 1)
+
+
+class ScanIndex:
+    """Índice SQLite de archivos por carpeta con totales por categoría precalculados"""
+
+    def __init__(self, db_path: Path = INDEX_PATH):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Huella de las reglas con las que están clasificados los archivos guardados
+        self._fingerprint = None
+        self._check_rules(rules_fingerprint(active_rules()))
+
+    def _check_rules(self, fingerprint: str):
+        """Vacía el índice si las reglas de categorías o el esquema cambiaron desde la última vez"""
+        with self._lock, self._conn:
+            if fingerprint == self._fingerprint:
+                return
+            self._fingerprint = fingerprint
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+            if row is not None and row[0] == fingerprint:
+                return
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM subdirs")
+            self._conn.execute("DELETE FROM category_totals")
+            self._conn.execute("DELETE FROM dirs")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('rules', ?)",
+                (fingerprint,)
+            )
+
+    def refresh_dir(self, folder: Path, force: bool = False) -> bool:
+        """
+        Reconcilia una carpeta con el índice si su mtime cambió
+
+        Cada archivo de una carpeta cambiada se compara por (inode, tamaño, mtime)
+        con su fila: solo se reclasifican y reescriben los nuevos o modificados,
+        también los reescritos en el mismo sitio. Un archivo reescrito sin que
+        cambie la carpeta no se ve hasta el siguiente cambio de esta; para eso
+        está force=True
+
+        Args:
+            folder (Path): Carpeta a reconciliar
+            force (bool): Reescanear aunque el mtime no haya cambiado
+
+        Returns:
+            bool: True si la carpeta se volvió a leer
+
+        Raises:
+            StaleRules: Si las reglas de la llamada se sustituyeron por otras; el
+                índice no guarda categorías de reglas que ya no están en vigor
+        """
+        with pinned_rules() as rules:
+            return self._refresh_dir(os.fspath(folder), force, rules)
+
+    def _refresh_dir(self, key: str, force: bool, rules: Rules) -> bool:
+        fingerprint = rules_fingerprint(rules)
+        if fingerprint != self._fingerprint:
+            if rules is not active_rules():
+                raise StaleRules(rules.source)
+            self._check_rules(fingerprint)
+        
+        # stat de la carpeta ANTES de listarla: un cambio durante el listado
+        # deja un mtime distinto al guardado y se recoge en la siguiente llamada
+        dir_stat = os.stat(key)
+
+        with self._lock:
+            row = self._conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (key,)).fetchone()
+            if not force and row is not None and row[0] == dir_stat.st_mtime_ns:
+                return False
+            known = {
+                name: (inode, size, mtime_ns) for name, inode, size, mtime_ns in self._conn.execute(
+                    "SELECT name, inode, size, mtime_ns FROM files WHERE dir = ?", (key,)
+                )
+            }
+            known_subdirs = {
+                name for name, in self._conn.execute("SELECT name FROM subdirs WHERE dir = ?", (key,))
+            }
+
+        scan_started = time.time_ns()
+        seen = set()
+        upserts = []
+        stats = 0
+        entries, subdirs = list_entries(key)
+        for entry in entries:
+            seen.add(entry.name)
+            stats += 1
+            try:
+                stat = entry.stat()
+            except OSError:
+                # El archivo desapareció o no es accesible: se trata como ausente
+                seen.discard(entry.name)
+                continue
+            if not force and known.get(entry.name) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+                continue
+            category = rule_category(entry.name, stat.st_size, stat.st_mtime) or classify_filename(entry.name)[0]
+            if category == "Otros" and rules.settings["sniff_content"]:
+                category = sniff_category(entry.path, stat) or category
+            upserts.append((key, entry.name, stat.st_ino, stat.st_size, stat.st_mtime_ns, category))
+
+        # El stat de la carpeta más uno por archivo
+        METRICS.incr("stat_calls", stats + 1)
+        METRICS.incr("files_scanned", len(entries))
+        removed = [(key, name) for name in known.keys() - seen]
+        mtime_ns = dir_stat.st_mtime_ns
+        if scan_started - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = -1
+
+        with self._lock, self._conn:
+            if self._fingerprint != fingerprint:
+                # Las reglas cambiaron mientras se leía la carpeta: no se mezclan categorías
+                raise StaleRules(rules.source)
+            # Las subcarpetas que ya no existen se olvidan con todo su contenido
+            for name in known_subdirs.difference(subdirs):
+                self._forget_tree(os.path.join(key, name))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (dir, name, inode, size, mtime_ns, category) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                upserts
+            )
+            self._conn.executemany("DELETE FROM files WHERE dir = ? AND name = ?", removed)
+            self._conn.execute("DELETE FROM subdirs WHERE dir = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO subdirs (dir, name) VALUES (?, ?)",
+                [(key, name) for name in subdirs]
+            )
+            self._conn.execute("DELETE FROM category_totals WHERE dir = ?", (key,))
+            self._conn.execute(
+                "INSERT INTO category_totals (dir, category, count, size) "
+                "SELECT dir, category, COUNT(*), SUM(size) FROM files WHERE dir = ? GROUP BY category",
+                (key,)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns, scanned_ns) VALUES (?, ?, ?)",
+                (key, mtime_ns, scan_started)
+            )
+        return True
+
+    def _forget_tree(self, folder: str):
+        """Borra del índice una carpeta y todo lo que cuelga de ella (con el lock tomado)"""
+        low, high = _subtree_bounds(folder)
+        for table, column in (("dirs", "path"), ("files", "dir"), ("subdirs", "dir"), ("category_totals", "dir")):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE {column} = ? OR ({column} >= ? AND {column} < ?)",
+                (folder, low, high)
+            )
+
+    def has_rules(self, rules: Rules) -> bool:
+        """Si los archivos guardados están clasificados con `rules`"""
+        return self._fingerprint == rules_fingerprint(rules)
+
+    def files_page(
+        self,
+        root: Path,
+        after: Optional[Tuple[str, str]],
+        limit: int,
+        max_depth: Optional[int] = None
+    ) -> List[Tuple[str, str, int, int, str]]:
+        """
+        Página de archivos de un árbol ya reconciliado, ordenada por (carpeta, nombre)
+
+        La paginación es por clave (keyset): cada página empieza justo después de la
+        última fila de la anterior usando la clave primaria, sin OFFSET ni ordenar
+        todo el árbol en cada llamada
+
+        Args:
+            root (Path): Carpeta raíz
+            after (tuple): (carpeta, nombre) de la última fila ya entregada, o None
+            limit (int): Filas por página
+            max_depth (int): Niveles de subcarpetas a incluir (None = sin límite)
+
+        Returns:
+            list: Filas (carpeta, nombre, bytes, mtime_ns, categoría)
+        """
+        key = os.fspath(root)
+        low, high = _subtree_bounds(key)
+        max_separators = key.count(os.sep) + (max_depth if max_depth is not None else 1 << 20)
+        after_dir, after_name = after or ("", "")
+        with self._lock:
+            return self._conn.execute(
+                "SELECT dir, name, size, mtime_ns, category FROM files "
+                "WHERE (dir = ? OR (dir >= ? AND dir < ?)) AND (dir, name) > (?, ?) "
+                "AND length(dir) - length(replace(dir, ?, '')) <= ? "
+                "ORDER BY dir, name LIMIT ?",
+                (key, low, high, after_dir, after_name, os.sep, max_separators, limit)
+            ).fetchall()
+
+    def category_totals(self, folder: Path) -> Dict[str, Tuple[int, int]]:
+        """Devuelve {categoría: (número de archivos, bytes)} de una carpeta ya reconciliada"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, count, size FROM category_totals WHERE dir = ?",
+                (os.fspath(folder),)
+            ).fetchall()
+        return {category: (count, size) for category, count, size in rows}
+
+    def largest_by_category(self, folder: Path, limit: int) -> Dict[str, List[Tuple[str, int]]]:
+        """Devuelve {categoría: [(nombre, bytes), ...]} con los `limit` archivos más grandes de cada una"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, name, size FROM ("
+                "  SELECT category, name, size, ROW_NUMBER() OVER ("
+                "    PARTITION BY category ORDER BY size DESC) AS position"
+                "  FROM files WHERE dir = ?"
+                ") WHERE position <= ? ORDER BY category, size DESC",
+                (os.fspath(folder), limit)
+            ).fetchall()
+        largest: Dict[str, List[Tuple[str, int]]] = {}
+        for category, name, size in rows:
+            largest.setdefault(category, []).append((name, size))
+        return largest
+
+    def subdirs(self, folder: Path) -> List[str]:
+        """Devuelve los nombres de las subcarpetas de una carpeta ya reconciliada"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM subdirs WHERE dir = ?", (os.fspath(folder),)
+            ).fetchall()
+        return [name for name, in rows]
+
+    def close(self):
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+
+_index: Optional[ScanIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_scan_index() -> ScanIndex:
+    """Devuelve el índice compartido del proceso, abriéndolo la primera vez"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ScanIndex()
+        return _index
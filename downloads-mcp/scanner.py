@@ -0,0 +1,306 @@
+"""
+Escáner de carpetas compartido por todas las herramientas del organizador
+Recorre cada carpeta una sola vez con os.scandir y reutiliza el stat que
+guarda cada DirEntry, de modo que cada archivo cuesta como mucho un stat()
+"""
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+from stat import S_ISREG
+from typing import Collection, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from config import classify_filename, current_rules, current_settings, rule_category
+from metrics import METRICS
+from sniffer import sniff_category
+
+
+class FileRecord(NamedTuple):
+    """Datos de un archivo obtenidos con un único stat()"""
+    path: str
+    name: str
+    suffix: str
+    category: str
+    size: int
+    mtime: float
+    inode: int
+    device: int
+    created: float
+
+
+def _record(path: str, name: str, category: str, suffix: str, stat: os.stat_result) -> FileRecord:
+    METRICS.incr("files_scanned")
+    METRICS.incr("stat_calls")
+    # Las reglas ordenadas (tamaño, antigüedad, patrón) van antes que la extensión
+    category = rule_category(name, stat.st_size, stat.st_mtime) or category
+    if category == "Otros" and current_settings()["sniff_content"]:
+        # Sin extensión conocida: se mira el contenido (con caché por stat)
+        category = sniff_category(path, stat) or category
+    # st_birthtime solo existe donde el sistema guarda la fecha de creación (Windows, macOS)
+    created = getattr(stat, "st_birthtime", stat.st_mtime)
+    return FileRecord(path, name, suffix, category, stat.st_size, stat.st_mtime, stat.st_ino, stat.st_dev, created)
+
+
+def _excluded(name: str, category: str, categories: Optional[Collection[str]]) -> bool:
+    """True si el nombre ya basta para descartar el archivo sin hacer stat()"""
+    if not categories or category in categories:
+        return False
+    matcher = current_rules().matcher
+    if matcher and matcher.may_match(name, categories):
+        # Según el tamaño o la antigüedad, una regla puede llevarlo a una categoría pedida
+        return False
+    # Un archivo en 'Otros' aún puede acabar en otra categoría por su contenido
+    return not (category == "Otros" and current_settings()["sniff_content"])
+
+
+def scan_entries(folder: Path) -> Iterator[os.DirEntry]:
+    """
+    Itera las entradas de archivo de una carpeta sin hacer stat()
+
+    is_file() usa el tipo que devuelve el propio listado (d_type), así que
+    solo cuesta una llamada extra en enlaces simbólicos o sistemas sin d_type
+
+    Args:
+        folder (Path): Carpeta a recorrer
+
+    Yields:
+        os.DirEntry: Entradas que son archivos
+    """
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+
+
+def list_entries(folder: Path) -> Tuple[List[os.DirEntry], List[str]]:
+    """
+    Lista una carpeta una sola vez separando archivos y subcarpetas, sin hacer stat()
+
+    Returns:
+        tuple: (entradas de archivo, nombres de subcarpetas)
+    """
+    files, subdirs = [], []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry)
+            except OSError:
+                continue
+    return files, subdirs
+
+
+def scan_folder(folder: Path) -> Tuple[List[FileRecord], List[str]]:
+    """
+    Devuelve los archivos de una carpeta como FileRecord y los nombres de sus subcarpetas
+
+    Returns:
+        tuple: (registros de archivo, nombres de subcarpetas)
+    """
+    entries, subdirs = list_entries(folder)
+    records = []
+    for entry in entries:
+        category, suffix = classify_filename(entry.name)
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        records.append(_record(entry.path, entry.name, category, suffix, stat))
+    return records, subdirs
+
+
+def scan_files(folder: Path, categories: Optional[Collection[str]] = None) -> Iterator[FileRecord]:
+    """
+    Itera los archivos de una carpeta como FileRecord
+
+    La categoría por extensión se calcula solo con el nombre, así que los archivos
+    fuera de `categories` se descartan antes de hacer ningún stat() (salvo que una
+    regla ordenada pueda llevarlos a una categoría pedida según su stat)
+
+    Args:
+        folder (Path): Carpeta a recorrer
+        categories (list): Categorías a incluir (opcional, por defecto todas)
+
+    Yields:
+        FileRecord: Un registro por archivo, con un único stat()
+    """
+    for entry in scan_entries(folder):
+        category, suffix = classify_filename(entry.name)
+        if _excluded(entry.name, category, categories):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            # Desapareció entre el listado y el stat
+            continue
+        record = _record(entry.path, entry.name, category, suffix, stat)
+        if not categories or record.category in categories:
+            yield record
+
+
+def scan_tree(
+    root: Path,
+    max_depth: Optional[int] = None,
+    categories: Optional[Collection[str]] = None
+) -> Iterator[FileRecord]:
+    """
+    Itera los archivos de un árbol de carpetas como FileRecord
+
+    Args:
+        root (Path): Carpeta raíz
+        max_depth (int): Niveles de subcarpetas a bajar (0 = solo la raíz, None = sin límite)
+        categories (list): Categorías a incluir (opcional, por defecto todas)
+
+    Yields:
+        FileRecord: Un registro por archivo, con un único stat()
+    """
+    pending = [(os.fspath(root), 0)]
+    while pending:
+        folder, depth = pending.pop()
+        try:
+            entries = os.scandir(folder)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if max_depth is None or depth < max_depth:
+                            pending.append((entry.path, depth + 1))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    category, suffix = classify_filename(entry.name)
+                    if _excluded(entry.name, category, categories):
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                record = _record(entry.path, entry.name, category, suffix, stat)
+                if not categories or record.category in categories:
+                    yield record
+
+
+def stat_file(path: Path) -> Optional[FileRecord]:
+    """Devuelve el FileRecord de un archivo concreto, o None si no existe o no es un archivo"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if not S_ISREG(stat.st_mode):
+        return None
+    path = os.fspath(path)
+    name = os.path.basename(path)
+    category, suffix = classify_filename(name)
+    return _record(path, name, category, suffix, stat)
+
+
+def match_entries(
+    folder: Path,
+    names: Iterable[str] = (),
+    patterns: Iterable[str] = ()
+) -> Tuple[List[os.DirEntry], List[str]]:
+    """
+    Busca en una sola pasada los archivos de una carpeta por nombre exacto o patrón glob
+
+    Todos los patrones se combinan en una única expresión regular, así que cada
+    nombre del listado se compara una vez sin importar cuántos patrones haya
+
+    Args:
+        folder (Path): Carpeta a recorrer
+        names (list): Nombres exactos a buscar
+        patterns (list): Patrones glob, por ejemplo, *.pdf o factura_2024*
+
+    Returns:
+        tuple: (entradas encontradas, nombres exactos que no existen)
+    """
+    wanted = {os.path.normcase(name): name for name in names}
+    combined = None
+    patterns = [os.path.normcase(pattern) for pattern in patterns]
+    if patterns:
+        combined = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+    found, matches = set(), []
+    for entry in scan_entries(folder):
+        key = os.path.normcase(entry.name)
+        if key in wanted:
+            found.add(key)
+            matches.append(entry)
+        elif combined is not None and combined.match(key):
+            matches.append(entry)
+    missing = [name for key, name in wanted.items() if key not in found]
+    return matches, missing
+
+
+def entry_records(entries: Iterable[os.DirEntry]) -> List[FileRecord]:
+    """Convierte entradas de scandir en FileRecord (un stat por archivo; se omiten las que ya no existen)"""
+    records = []
+    for entry in entries:
+        category, suffix = classify_filename(entry.name)
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        records.append(_record(entry.path, entry.name, category, suffix, stat))
+    return records
+
+
+def list_names(folder: Path) -> Set[str]:
+    """Devuelve los nombres de todas las entradas de una carpeta (vacío si no existe)"""
+    try:
+        with os.scandir(folder) as entries:
+            return {entry.name for entry in entries}
+    except FileNotFoundError:
+        return set()
+
+
+def _list_dir(folder: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Lista una carpeta separando subcarpetas y archivos (None si no se puede leer)"""
+    dirnames, filenames = [], []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                (dirnames if is_dir else filenames).append(entry.name)
+    except OSError:
+        return None
+    return dirnames, filenames
+
+
+def walk(root: Path, topdown: bool = True) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """
+    Recorre un árbol de carpetas listando cada carpeta una sola vez
+
+    Args:
+        root (Path): Carpeta raíz
+        topdown (bool): Si es False, cada carpeta sale después de todas sus
+            subcarpetas (para borrar de abajo arriba)
+
+    Yields:
+        tuple: (ruta de la carpeta, subcarpetas, archivos), como os.walk
+    """
+    # Cada elemento es (carpeta, listado); el listado es None hasta que se lee
+    pending = [(os.fspath(root), None)]
+    while pending:
+        folder, listing = pending.pop()
+        if listing is not None:
+            yield folder, listing[0], listing[1]
+            continue
+        listing = _list_dir(folder)
+        if listing is None:
+            continue
+        dirnames = listing[0]
+        if topdown:
+            yield folder, dirnames, listing[1]
+        else:
+            # La carpeta vuelve a la pila debajo de sus subcarpetas: sale después
+            pending.append((folder, listing))
+        pending.extend((os.path.join(folder, name), None) for name in reversed(dirnames))
@@ -0,0 +1,134 @@
+"""
+Clasificación por contenido (magic bytes) para archivos sin extensión conocida
+Lee solo la cabecera de cada archivo sobre un buffer reutilizado por hilo y
+guarda el resultado por (dispositivo, inode, mtime, tamaño) para no releerla
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from config import current_rules, current_settings
+
+# Bytes de cabecera que se leen de cada archivo
+SNIFF_BYTES = 8192
+
+# Firmas básicas para cuando libmagic no está disponible: (posición, bytes, MIME)
+SIGNATURES = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"{\\rtf", "application/rtf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"BM", "image/bmp"),
+    (8, b"WEBP", "image/webp"),
+    (8, b"WAVE", "audio/x-wav"),
+    (8, b"AVI ", "video/x-msvideo"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1aE\xdf\xa3", "video/x-matroska"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\xff\xfb", "audio/mpeg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"Rar!\x1a\x07", "application/x-rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (257, b"ustar", "application/x-tar"),
+    (0, b"MZ", "application/x-dosexec"),
+    (0, b"\x7fELF", "application/x-executable"),
+    (0, b"!<arch>\ndebian", "application/vnd.debian.binary-package"),
+    (0, b"\xed\xab\xee\xdb", "application/x-rpm"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+]
+
+_local = threading.local()
+_cache: "OrderedDict[Tuple[int, int, int, int], str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _buffer() -> memoryview:
+    """Buffer de lectura del hilo actual (se crea una vez por hilo)"""
+    view = getattr(_local, "view", None)
+    if view is None:
+        view = _local.view = memoryview(bytearray(SNIFF_BYTES))
+    return view
+
+
+@lru_cache(maxsize=None)
+def _magic():
+    """
+    Módulo python-magic (o python-magic-bin), o None si no está instalado
+
+    Se importa la primera vez que se analiza un archivo: cargar libmagic cuesta
+    y con sniff_content desactivado no hace falta nunca
+    """
+    try:
+        import magic
+    except ImportError:  # pragma: no cover - depende de la instalación
+        return None
+    return magic
+
+
+def detect_mime(header: bytes) -> Optional[str]:
+    """Tipo MIME de una cabecera, con libmagic si está instalado o con las firmas básicas"""
+    magic = _magic()
+    if magic is not None:
+        try:
+            return magic.from_buffer(header, mime=True)
+        except Exception:
+            pass
+    for offset, signature, mime in SIGNATURES:
+        if header.startswith(signature, offset):
+            return mime
+    return None
+
+
+def category_for_mime(mime: Optional[str]) -> Optional[str]:
+    """Traduce un MIME a una categoría con las reglas en vigor (exacto o por tipo, p. ej. 'image/')"""
+    if not mime:
+        return None
+    mime_categories = current_rules().mime_categories
+    category = mime_categories.get(mime)
+    if category is None:
+        category = mime_categories.get(mime.split("/", 1)[0] + "/")
+    return category
+
+
+def sniff_category(path: str, stat: os.stat_result) -> Optional[str]:
+    """
+    Categoría de un archivo según su contenido
+
+    Args:
+        path (str): Ruta del archivo
+        stat (os.stat_result): stat ya obtenido (forma la clave de la caché)
+
+    Returns:
+        str: Categoría, o None si el contenido no se reconoce
+    """
+    key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return category_for_mime(_cache[key])
+
+    view = _buffer()
+    try:
+        with open(path, "rb", buffering=0) as f:
+            read = f.readinto(view)
+    except OSError:
+        return None
+    mime = detect_mime(view[:read].tobytes()) if read else None
+
+    with _cache_lock:
+        # Se guarda el MIME (no la categoría) para que valga tras recargar las reglas;
+        # "" marca "ya mirado, sin tipo reconocido" para no volver a leerlo
+        _cache[key] = mime or ""
+        if len(_cache) > current_settings()["sniff_cache_size"]:
+            _cache.popitem(last=False)
+    return category_for_mime(mime)
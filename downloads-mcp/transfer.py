@@ -0,0 +1,251 @@
+"""
+Copia entre dispositivos para organize_files (cuando 'organizados' está en otro montaje)
+Copia en el kernel por bloques grandes (os.copy_file_range y, si no se puede,
+os.sendfile; como último recurso, lectura y escritura normales) sobre un nombre
+temporal, verifica la copia y la pone en su sitio con un rename atómico: en el
+destino nunca aparece un archivo a medias
+
+Los archivos de más de un bloque guardan junto al temporal un punto de control
+con lo ya copiado y sincronizado en disco. Si el proceso se corta, la siguiente
+copia del mismo archivo (al reanudar el lote) sigue desde ahí en lugar de
+empezar de cero
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+from typing import List, Optional
+
+from config import current_settings
+from metrics import METRICS
+
+# Sufijos del archivo temporal y de su punto de control (junto al destino, ocultos)
+PART_SUFFIX = ".organizer-part"
+CHECKPOINT_SUFFIX = PART_SUFFIX + ".json"
+
+# Buffer de la copia en espacio de usuario y de la verificación por checksum
+BUFFER_BYTES = 1024 * 1024
+
+# Errores con los que una llamada de copia en el kernel "no se puede usar aquí"
+# (kernel antiguo, sistemas de archivos distintos, sendfile que solo admite sockets...)
+UNSUPPORTED_ERRNOS = {
+    getattr(errno, name) for name in ("EXDEV", "ENOSYS", "EOPNOTSUPP", "ENOTSUP", "EINVAL", "ENOTSOCK")
+    if hasattr(errno, name)
+}
+
+# En Windows los descriptores se abren en modo texto si no se pide binario
+_BINARY = getattr(os, "O_BINARY", 0)
+
+
+def part_paths(target: str):
+    """(archivo temporal, punto de control) de un destino"""
+    folder, name = os.path.split(target)
+    return (
+        os.path.join(folder, f".{name}{PART_SUFFIX}"),
+        os.path.join(folder, f".{name}{CHECKPOINT_SUFFIX}"),
+    )
+
+
+def has_checkpoint(target: str) -> bool:
+    """Si hay una copia a medias (o terminada pero sin borrar el original) hacia `target`"""
+    return os.path.exists(part_paths(target)[1])
+
+
+def _signature(stat: os.stat_result) -> List[int]:
+    """Identidad del origen: si cambia, lo ya copiado no vale"""
+    return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def _load_checkpoint(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    """Escribe el punto de control de forma atómica (temporal + os.replace)"""
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sync_folder(folder: str):
+    """fsync de una carpeta para que el rename sobreviva a un corte (no existe en Windows)"""
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _RangeCopier:
+    """Copia rangos de un descriptor a otro con la llamada más barata que funcione"""
+
+    def __init__(self, source_fd: int, target_fd: int):
+        self.source_fd = source_fd
+        self.target_fd = target_fd
+        # Se descartan en orden a la primera vez que el sistema no las admite
+        self.methods = [
+            method for method, available in (
+                (self._copy_file_range, hasattr(os, "copy_file_range")),
+                (self._sendfile, hasattr(os, "sendfile")),
+            ) if available
+        ]
+
+    def _copy_file_range(self, offset: int, count: int) -> int:
+        return os.copy_file_range(self.source_fd, self.target_fd, count, offset, offset)
+
+    def _sendfile(self, offset: int, count: int) -> int:
+        # sendfile escribe en la posición actual del destino
+        os.lseek(self.target_fd, offset, os.SEEK_SET)
+        return os.sendfile(self.target_fd, self.source_fd, offset, count)
+
+    def _read_write(self, offset: int, count: int) -> int:
+        os.lseek(self.source_fd, offset, os.SEEK_SET)
+        data = os.read(self.source_fd, min(count, BUFFER_BYTES))
+        if data:
+            os.lseek(self.target_fd, offset, os.SEEK_SET)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.target_fd, view):]
+        return len(data)
+
+    def copy(self, offset: int, end: int):
+        """Copia [offset, end) del origen a las mismas posiciones del destino"""
+        while offset < end:
+            copied = None
+            while copied is None and self.methods:
+                try:
+                    copied = self.methods[0](offset, end - offset)
+                except OSError as e:
+                    if e.errno not in UNSUPPORTED_ERRNOS:
+                        raise
+                    self.methods.pop(0)
+            if copied is None:
+                copied = self._read_write(offset, end - offset)
+            if copied == 0:
+                raise OSError(errno.EIO, "El origen se acortó durante la copia")
+            offset += copied
+
+
+def _checksum(path: str) -> bytes:
+    digest = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(BUFFER_BYTES)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.digest()
+
+
+def copy_move(source: str, target: str) -> int:
+    """
+    Mueve un archivo a otro dispositivo: copia verificada y rename atómico
+
+    1. Copia por bloques de SETTINGS["copy_chunk_mb"] a un temporal oculto junto
+       al destino, con fsync y punto de control tras cada bloque
+    2. Verifica el tamaño (o el checksum, con SETTINGS["verify_copies"] = "checksum")
+       y que el origen no cambió durante la copia
+    3. Copia fechas y permisos, renombra el temporal al destino y borra el original
+
+    Args:
+        source (str): Archivo de origen
+        target (str): Ruta final (en otro dispositivo)
+
+    Returns:
+        int: Bytes copiados en esta llamada (menos que el tamaño si se reanudó)
+
+    Raises:
+        OSError: Si la copia falla o no pasa la verificación (el temporal se
+            conserva si el fallo no es de verificación, para reanudar)
+    """
+    part, checkpoint_path = part_paths(target)
+    signature = _signature(os.stat(source))
+    size = signature[2]
+    settings = current_settings()
+    chunk = max(1, int(settings["copy_chunk_mb"] * 1024 * 1024))
+    # Solo compensa guardar puntos de control si hay más de un bloque
+    checkpoints = size > chunk
+
+    offset = 0
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint.get("source") == signature:
+        if checkpoint.get("complete") and os.path.exists(target) and not os.path.exists(part):
+            # Se cortó después del rename: solo falta borrar el original
+            os.unlink(source)
+            _remove(checkpoint_path)
+            METRICS.incr("copies_resumed")
+            return 0
+        try:
+            offset = min(checkpoint["offset"], os.path.getsize(part))
+        except (OSError, KeyError, TypeError):
+            offset = 0
+        if offset:
+            METRICS.incr("copies_resumed")
+    elif checkpoint is not None:
+        # El origen cambió desde el corte: lo copiado no vale
+        _remove(checkpoint_path)
+
+    copied_from = offset
+    source_fd = os.open(source, os.O_RDONLY | _BINARY)
+    try:
+        target_fd = os.open(part, os.O_WRONLY | os.O_CREAT | _BINARY, 0o644)
+        try:
+            # Lo que haya después del último punto de control no está verificado
+            os.ftruncate(target_fd, offset)
+            copier = _RangeCopier(source_fd, target_fd)
+            while offset < size:
+                end = min(offset + chunk, size)
+                copier.copy(offset, end)
+                offset = end
+                if checkpoints:
+                    os.fsync(target_fd)
+                    _save_checkpoint(checkpoint_path, {"source": signature, "offset": offset})
+            os.fsync(target_fd)
+            copied_size = os.fstat(target_fd).st_size
+        finally:
+            os.close(target_fd)
+        changed = _signature(os.fstat(source_fd)) != signature
+    finally:
+        os.close(source_fd)
+
+    if changed or copied_size != size or (
+        settings["verify_copies"] == "checksum" and _checksum(source) != _checksum(part)
+    ):
+        _remove(part)
+        _remove(checkpoint_path)
+        raise OSError(errno.EIO, f"La copia de {os.path.basename(source)} no coincide con el original")
+
+    shutil.copystat(source, part)
+    if checkpoints:
+        _save_checkpoint(checkpoint_path, {"source": signature, "offset": size, "complete": True})
+    os.replace(part, target)
+    _sync_folder(os.path.dirname(target))
+    os.unlink(source)
+    if checkpoints:
+        _remove(checkpoint_path)
+
+    METRICS.incr("bytes_copied", size - copied_from)
+    return size - copied_from
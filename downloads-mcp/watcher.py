@@ -0,0 +1,238 @@
+"""
+Modo vigilancia de la carpeta de descargas
+Recibe los eventos del sistema de archivos (inotify en Linux, sondeo en el resto),
+espera a que cada archivo nuevo deje de cambiar y lo mueve a su carpeta de destino
+sin volver a recorrer la carpeta
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from config import current_settings, get_target_folder
+from dates import file_date
+from mover import DeviceCache, MoveTask, ensure_folder, move_one
+from planner import DestinationPlanner
+from scanner import list_names, stat_file
+
+logger = logging.getLogger("file-organizer-mcp")
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Cada cuánto se revisan los archivos pendientes (segundos)
+TICK = 0.5
+
+
+class _Inotify:
+    """Acceso mínimo a inotify mediante ctypes"""
+
+    def __init__(self, folder: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch falló para {folder}")
+
+    def read(self, timeout: float) -> Tuple[Set[str], bool]:
+        """
+        Espera eventos como mucho `timeout` segundos
+
+        Returns:
+            tuple: (nombres de archivo afectados, True si la cola del kernel se desbordó)
+        """
+        names, overflow = set(), False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return names, overflow
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflow
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif name and not mask & IN_ISDIR:
+                names.add(os.fsdecode(name))
+        return names, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Polling:
+    """Alternativa sin inotify: compara el listado de la carpeta en cada vuelta"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.known = list_names(folder)
+
+    def read(self, timeout: float) -> Tuple[Set[str], bool]:
+        time.sleep(timeout)
+        current = list_names(self.folder)
+        new_names = current - self.known
+        self.known = current
+        return new_names, False
+
+    def close(self):
+        pass
+
+
+class DownloadsWatcher:
+    """Organiza de forma continua los archivos que llegan a una carpeta"""
+
+    def __init__(self, folder: Path, debounce_seconds: Optional[float] = None):
+        self.folder = os.fspath(folder)
+        self.debounce = (
+            debounce_seconds if debounce_seconds is not None else current_settings()["watch_debounce_seconds"]
+        )
+        self.ignored_suffixes = tuple(s.lower() for s in current_settings()["watch_ignore_suffixes"])
+        self.backend = None
+        self.started_at = None
+        self.moved = 0
+        self.skipped = 0
+        self.recent = deque(maxlen=10)
+        self.errors = deque(maxlen=10)
+        # nombre -> (momento en que toca revisarlo, última firma (tamaño, mtime))
+        self._pending: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}
+        self._planner = DestinationPlanner()
+        self._devices = DeviceCache()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Arranca el hilo de vigilancia"""
+        if self.running:
+            return
+        if sys.platform.startswith("linux"):
+            try:
+                source = _Inotify(self.folder)
+                self.backend = "inotify"
+            except OSError as e:
+                logger.warning(f"inotify no disponible ({e}), se usa sondeo")
+                source = _Polling(self.folder)
+                self.backend = "sondeo"
+        else:
+            source = _Polling(self.folder)
+            self.backend = "sondeo"
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, args=(source,), name="downloads-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene el hilo de vigilancia y espera a que termine"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> dict:
+        """Estado actual para la herramienta watch_downloads_status"""
+        return {
+            "running": self.running,
+            "backend": self.backend,
+            "folder": self.folder,
+            "started_at": self.started_at,
+            "debounce_seconds": self.debounce,
+            "pending": len(self._pending),
+            "moved": self.moved,
+            "skipped": self.skipped,
+            "recent": list(self.recent),
+            "errors": list(self.errors),
+        }
+
+    def _run(self, source):
+        try:
+            while not self._stop.is_set():
+                names, overflow = source.read(TICK)
+                if overflow:
+                    # Se perdieron eventos: se revisa lo que haya en la carpeta
+                    logger.warning("Cola de inotify desbordada, revisando la carpeta")
+                    names |= list_names(self.folder)
+                now = time.monotonic()
+                for name in names:
+                    if name.lower().endswith(self.ignored_suffixes):
+                        # Descarga en curso: llegará otro evento con el nombre final
+                        self.skipped += 1
+                        continue
+                    # Cada evento nuevo reinicia la espera del archivo
+                    self._pending[name] = (now + self.debounce, None)
+                self._process_pending(now)
+        except Exception as e:
+            logger.error(f"Error en la vigilancia de descargas: {e}")
+            self.errors.append(str(e))
+        finally:
+            source.close()
+
+    def _process_pending(self, now: float):
+        for name, (due, last_signature) in list(self._pending.items()):
+            if due > now:
+                continue
+            record = stat_file(os.path.join(self.folder, name))
+            if record is None:
+                # Ya no está (o es una carpeta): nada que hacer
+                del self._pending[name]
+                continue
+            signature = (record.size, record.mtime)
+            if signature != last_signature:
+                # Sigue cambiando (descarga en curso): se vuelve a esperar
+                self._pending[name] = (now + self.debounce, signature)
+                continue
+            del self._pending[name]
+            self._organize(record)
+
+    def _organize(self, record):
+        try:
+            target_folder = get_target_folder(
+                Path(record.path), base_folder=Path(self.folder), category=record.category,
+                timestamp=file_date(record)
+            )
+            # Un mkdir por archivo en lugar de recordar las carpetas creadas:
+            # cleanup_empty_folders o undo_organize pueden borrarlas entre dos archivos
+            if ensure_folder(os.fspath(target_folder)):
+                # Carpeta nueva (o recreada): lo que sabían el planificador y la
+                # caché de dispositivos de ella ya no vale
+                self._planner.forget(target_folder)
+                self._devices.forget(os.fspath(target_folder))
+            target_path = self._planner.reserve(target_folder, record.name, record.suffix)
+            # El planificador vive mientras dure la vigilancia: si otro proceso creó
+            # ese nombre desde entonces, se reserva el siguiente
+            while target_path.exists():
+                target_path = self._planner.reserve(target_folder, record.name, record.suffix)
+            move_one(
+                MoveTask(record.path, str(target_path), record.size, record.device, record.category),
+                self._devices
+            )
+            self.moved += 1
+            self.recent.append(f"{record.name} -> {target_path}")
+        except Exception as e:
+            self.errors.append(f"Error con {record.name}: {str(e)}")